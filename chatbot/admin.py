@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ChatSession, ChatMessage, ChatIntent, ProductQuery
+from .models import ChatSession, ChatMessage, ChatIntent, ProductQuery, ChatArchive, ChatAnalyticsRollup
 
 @admin.register(ChatSession)
 class ChatSessionAdmin(admin.ModelAdmin):
@@ -27,11 +27,24 @@ class ChatIntentAdmin(admin.ModelAdmin):
 
 @admin.register(ProductQuery)
 class ProductQueryAdmin(admin.ModelAdmin):
-    list_display = ['session', 'query_text_preview', 'results_count', 'timestamp']
-    list_filter = ['timestamp', 'results_count']
+    list_display = ['session', 'query_text_preview', 'intent', 'results_count', 'latency_ms', 'clicked_product', 'timestamp']
+    list_filter = ['timestamp', 'intent', 'results_count']
     search_fields = ['query_text', 'session__session_id']
     readonly_fields = ['timestamp']
     
     def query_text_preview(self, obj):
         return obj.query_text[:50] + "..." if len(obj.query_text) > 50 else obj.query_text
     query_text_preview.short_description = "Query"
+
+@admin.register(ChatArchive)
+class ChatArchiveAdmin(admin.ModelAdmin):
+    list_display = ['session', 'message_count', 'codec', 'last_message_at', 'archived_at']
+    list_filter = ['codec', 'archived_at']
+    search_fields = ['session__session_id']
+    exclude = ['data']
+    readonly_fields = ['session', 'codec', 'message_count', 'first_message_at', 'last_message_at', 'archived_at']
+
+@admin.register(ChatAnalyticsRollup)
+class ChatAnalyticsRollupAdmin(admin.ModelAdmin):
+    list_display = ['hour', 'intent', 'result_bucket', 'queries', 'clicks', 'total_latency_ms']
+    list_filter = ['intent', 'result_bucket', 'hour']
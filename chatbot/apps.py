@@ -1,6 +1,21 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ChatbotConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "chatbot"
+
+    def ready(self):
+        import chatbot.signals  # noqa: F401
+
+        # Optionally load the chat services before the first message. Only the spaCy
+        # pipeline is loaded here: it needs no database, so `migrate` still works on an
+        # empty one, and with `gunicorn --preload` the workers share it via fork. The
+        # components that read the database are loaded by each worker on its first request.
+        if getattr(settings, 'CHATBOT_WARMUP', False):
+            from django.core.signals import request_started
+            from chatbot.services.registry import get_spacy_pipeline, warm_up_on_first_request
+
+            get_spacy_pipeline()
+            request_started.connect(warm_up_on_first_request, dispatch_uid='chatbot_warm_up')
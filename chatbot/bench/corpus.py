@@ -0,0 +1,90 @@
+import random
+from typing import Any, Dict, List, Tuple
+
+# Message templates per intent of IntentEngine.BUILTIN_INTENTS (plus the default,
+# general_inquiry). Placeholders are filled from `data.catalog_sample`. The label
+# is what the message is meant to ask; the pipeline may still classify it
+# differently (e.g. a price question naming a product counts as a product search).
+TEMPLATES: Dict[str, List[str]] = {
+    'order_inquiry': [
+        "Where is my order ORD{oid}?",
+        "Can you track order {oid} for me",
+        "status of #{order_sku}",
+        "has #{tracking} shipped yet?",
+        "My delivery {oid} is late",
+    ],
+    'product_search': [
+        "show me {color} {category}",
+        "I'm looking for {product}",
+        "find {product} please",
+        "do you sell {category}? I want something {color}",
+        "search {category}",
+    ],
+    'stock_inquiry': [
+        "is the {product} in stock?",
+        "{category} available in {color}?",
+        "what's in stock in {category}",
+    ],
+    'price_inquiry': [
+        "how much is the {product}",
+        "price of {category}",
+        "what are your cheap {category}",
+    ],
+    'category_browse': [
+        "browse categories",
+        "what departments do you have?",
+        "which section has {category}",
+    ],
+    'help_request': [
+        "help",
+        "I have a question for support",
+        "can someone assist me",
+    ],
+    'return_policy': [
+        "how do I return an item?",
+        "can I get a refund",
+        "what is your return policy",
+    ],
+    'general_inquiry': [
+        "hi there",
+        "do you deliver to Lahore?",  # 'deliver' is not an order keyword, 'delivery' is
+        "what payment methods do you accept",
+        "thanks, that's all",
+    ],
+}
+
+# Rough mix of a storefront chat: mostly searches and order tracking
+INTENT_WEIGHTS = {
+    'product_search': 30,
+    'order_inquiry': 20,
+    'general_inquiry': 12,
+    'price_inquiry': 10,
+    'stock_inquiry': 8,
+    'category_browse': 8,
+    'help_request': 6,
+    'return_policy': 6,
+}
+
+
+def build_corpus(catalog: Dict[str, Any], size: int, seed: int = 0) -> List[Tuple[str, str]]:
+    """`size` (intent label, message) pairs drawn with INTENT_WEIGHTS; the same seed and catalog give the same corpus"""
+    rng = random.Random(seed)
+    intents = sorted(INTENT_WEIGHTS)
+    weights = [INTENT_WEIGHTS[intent] for intent in intents]
+    if not catalog['orders']:
+        weights[intents.index('order_inquiry')] = 0
+
+    corpus = []
+    for intent in rng.choices(intents, weights=weights, k=size):
+        template = rng.choice(TEMPLATES[intent])
+        oid, order_sku, tracking = rng.choice(catalog['orders']) if catalog['orders'] else ('', '', '')
+        message = template.format(
+            product=rng.choice(catalog['products']) if catalog['products'] else 'shoes',
+            category=rng.choice(catalog['categories']).lower(),
+            color=rng.choice(catalog['colors']),
+            oid=oid,
+            order_sku=order_sku,
+            tracking=tracking,
+        )
+        corpus.append((intent, message))
+    return corpus
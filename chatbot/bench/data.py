@@ -0,0 +1,128 @@
+import random
+from decimal import Decimal
+from typing import Any, Dict, List
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from chatbot.models import OrderLookup
+from chatbot.services.order_lookup import lookup_entries
+from core.models import CartOrder, CartOrderProducts, Category, Product
+
+BENCH_USER_EMAIL = 'chat-bench@example.com'
+
+CATEGORY_PRODUCTS = {
+    'Shoes': ['Runner', 'Sneaker', 'Loafer', 'Boot', 'Sandal'],
+    'Shirts': ['Oxford Shirt', 'Polo', 'Henley', 'Tee'],
+    'Dresses': ['Maxi Dress', 'Wrap Dress', 'Shift Dress'],
+    'Phones': ['Smartphone', 'Phone Case', 'Charger'],
+    'Laptops': ['Ultrabook', 'Gaming Laptop', 'Laptop Sleeve'],
+    'Watches': ['Smartwatch', 'Chronograph', 'Dive Watch'],
+    'Headphones': ['Earbuds', 'Headset', 'Over-Ear Headphones'],
+    'Bags': ['Backpack', 'Tote', 'Duffel'],
+    'Kitchen': ['Kettle', 'Blender', 'Chef Knife', 'Skillet'],
+    'Grocery': ['Green Tea', 'Basmati Rice', 'Olive Oil', 'Honey'],
+}
+BRANDS = ['Nestify', 'Urbano', 'Kora', 'Zeal', 'Alpine', 'Noor', 'Vertex', 'Lumen']
+COLORS = ['red', 'blue', 'green', 'black', 'white', 'grey', 'silver', 'gold']
+
+
+def _rng(seed: int, kind: str, i: int) -> random.Random:
+    # One generator per row, so row i is the same whatever sizes were generated before it
+    return random.Random(f"{seed}:{kind}:{i}")
+
+
+def product_fields(i: int, seed: int = 0) -> Dict[str, Any]:
+    rng = _rng(seed, 'product', i)
+    category = rng.choice(sorted(CATEGORY_PRODUCTS))
+    noun = rng.choice(CATEGORY_PRODUCTS[category])
+    brand = rng.choice(BRANDS)
+    color = rng.choice(COLORS)
+    price = Decimal(rng.randrange(299, 49999)) / 100
+    return {
+        'category': category,
+        'pid': f"bench{i:07d}",
+        'sku': f"sku{i:07d}",
+        'title': f"{brand} {color.title()} {noun}",
+        'description': f"{color.title()} {noun.lower()} by {brand}, part of our {category.lower()} range.",
+        'price': price,
+        'old_price': (price * Decimal('1.2')).quantize(Decimal('0.01')),
+        'base_price': price,
+        'max_price': (price * Decimal('1.5')).quantize(Decimal('0.01')),
+        'selling_price': price,
+        'stock_count': str(rng.randrange(0, 50)),
+        'in_stock': rng.random() > 0.1,
+        'weekly_sales': rng.randrange(0, 40),
+        'product_status': 'published',
+    }
+
+
+def order_fields(i: int, seed: int = 0) -> Dict[str, Any]:
+    rng = _rng(seed, 'order', i)
+    return {
+        'oid': f"{70000000 + i}",
+        'sku': f"SKU{i:07d}",
+        'tracking_id': f"TRK{i:09d}",
+        'full_name': rng.choice(['Ayesha Khan', 'Bilal Ahmed', 'Sara Malik', 'Usman Ali']),
+        'product_status': rng.choice(['processing', 'shipped', 'delivered']),
+        'paid_status': True,
+        'price': Decimal(rng.randrange(500, 90000)) / 100,
+    }
+
+
+def grow_catalog(products: int, orders: int, seed: int = 0, batch_size: int = 1000) -> Dict[str, Any]:
+    """Add synthetic products/orders until the database holds `products` and `orders` of them.
+
+    Rows are created with `bulk_create`, so no signals fire: order lookups are
+    written here, and callers rebuild the in-memory indexes afterwards.
+    """
+    User = get_user_model()
+    user, _ = User.objects.get_or_create(email=BENCH_USER_EMAIL, defaults={'username': 'chat-bench'})
+    categories = {title: Category.objects.get_or_create(title=title)[0] for title in sorted(CATEGORY_PRODUCTS)}
+
+    existing_products = Product.objects.filter(pid__startswith='bench').count()
+    for start in range(existing_products, products, batch_size):
+        rows = []
+        for i in range(start, min(start + batch_size, products)):
+            fields = product_fields(i, seed)
+            rows.append(Product(user=user, category=categories[fields.pop('category')], **fields))
+        Product.objects.bulk_create(rows)
+
+    product_rows = list(Product.objects.filter(pid__startswith='bench').order_by('pid').values_list('title', 'price')[:products])
+    existing_orders = CartOrder.objects.filter(user=user).count()
+    for start in range(existing_orders, orders, batch_size):
+        with transaction.atomic():
+            new_orders = [CartOrder(user=user, **order_fields(i, seed)) for i in range(start, min(start + batch_size, orders))]
+            CartOrder.objects.bulk_create(new_orders)
+            created = list(CartOrder.objects.filter(user=user, oid__in=[order.oid for order in new_orders]))
+
+            items, lookups = [], []
+            for order in created:
+                rng = _rng(seed, 'items', int(order.oid))
+                for title, price in rng.sample(product_rows, k=min(len(product_rows), rng.randint(1, 3))):
+                    qty = rng.randint(1, 3)
+                    items.append(CartOrderProducts(
+                        order=order, invoice_no=f"INV-{order.oid}", product_status=order.product_status,
+                        item=title, image='product.jpg', qty=qty, price=price, total=price * qty,
+                    ))
+                lookups.extend(
+                    OrderLookup(order=order, reference=reference, kind=kind)
+                    for reference, kind in lookup_entries(order.oid, order.tracking_id, order.sku)
+                )
+            CartOrderProducts.objects.bulk_create(items)
+            OrderLookup.objects.bulk_create(lookups)
+
+    return catalog_sample(seed)
+
+
+def catalog_sample(seed: int = 0, size: int = 200) -> Dict[str, List[str]]:
+    """Product titles, categories and order references for the message corpus to mention"""
+    rng = random.Random(seed)
+    titles = list(Product.objects.filter(pid__startswith='bench').order_by('title').values_list('title', flat=True).distinct()[:size * 5])
+    orders = list(CartOrder.objects.filter(user__email=BENCH_USER_EMAIL).order_by('pk').values_list('oid', 'sku', 'tracking_id')[:size * 5])
+    return {
+        'products': rng.sample(titles, k=min(size, len(titles))),
+        'categories': sorted(CATEGORY_PRODUCTS),
+        'colors': COLORS,
+        'orders': rng.sample(orders, k=min(size, len(orders))),
+    }
@@ -0,0 +1,140 @@
+import json
+import math
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from django.db import connections
+from django.test import Client
+
+# send(message, session_id) -> (session_id, intent); raises on a failed request
+Sender = Callable[[str, Optional[str]], Tuple[str, str]]
+
+
+class RequestFailed(Exception):
+    """A chat request answered with an error status"""
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted values"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def latency_summary(latencies_ms: List[float]) -> Dict[str, float]:
+    values = sorted(latencies_ms)
+    return {
+        'p50': round(percentile(values, 50), 2),
+        'p95': round(percentile(values, 95), 2),
+        'p99': round(percentile(values, 99), 2),
+        'mean': round(sum(values) / len(values), 2) if values else 0.0,
+        'max': round(values[-1], 2) if values else 0.0,
+    }
+
+
+def service_sender() -> Sender:
+    """Call ChatService.process_message in-process"""
+    from chatbot.services.registry import get_chat_service
+
+    chat_service = get_chat_service()
+
+    def send(message, session_id):
+        response = chat_service.process_message(message, session_id)
+        return response['session_id'], response['intent']
+    return send
+
+
+def http_sender(path: str = '/chatbot/chat/') -> Sender:
+    """POST to the chat endpoint through the full Django request/response stack (no network)"""
+    local = threading.local()
+
+    def send(message, session_id):
+        if not hasattr(local, 'client'):
+            local.client = Client()
+        payload = {'message': message}
+        if session_id:
+            payload['session_id'] = session_id
+        response = local.client.post(path, data=json.dumps(payload), content_type='application/json')
+        if response.status_code != 200:
+            raise RequestFailed(f"HTTP {response.status_code}")
+        body = response.json()
+        return body['session_id'], body.get('intent', '')
+    return send
+
+
+def run_load(send: Sender, corpus: List[Tuple[str, str]], concurrency: int, turns_per_session: int = 5) -> Dict[str, Any]:
+    """Replay `corpus` with `concurrency` simulated users, each chatting in sessions of `turns_per_session` messages"""
+    conversations = [corpus[i::concurrency] for i in range(concurrency)]
+    samples: List[Tuple[str, float]] = []
+    errors: Dict[str, int] = defaultdict(int)
+    lock = threading.Lock()
+
+    def user(messages):
+        session_id = None
+        try:
+            for turn, (_, message) in enumerate(messages):
+                if turn % turns_per_session == 0:
+                    session_id = None
+                started = time.perf_counter()
+                try:
+                    session_id, intent = send(message, session_id)
+                except Exception as e:
+                    with lock:
+                        errors[str(e) if isinstance(e, RequestFailed) else type(e).__name__] += 1
+                    continue
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                with lock:
+                    samples.append((intent, elapsed_ms))
+        finally:
+            connections.close_all()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='chat-bench') as pool:
+        list(pool.map(user, conversations))
+    wall = time.perf_counter() - started
+
+    by_intent = defaultdict(list)
+    for intent, elapsed_ms in samples:
+        by_intent[intent].append(elapsed_ms)
+
+    return {
+        'concurrency': concurrency,
+        'requests': len(corpus),
+        'completed': len(samples),
+        'errors': dict(errors),
+        'wall_seconds': round(wall, 3),
+        'throughput_rps': round(len(samples) / wall, 2) if wall else 0.0,
+        'latency_ms': latency_summary([elapsed_ms for _, elapsed_ms in samples]),
+        'intents': {
+            intent: dict(count=len(values), **latency_summary(values))
+            for intent, values in sorted(by_intent.items())
+        },
+    }
+
+
+def run_key(run: Dict[str, Any]) -> Tuple:
+    return run['target'], run['catalog_size'], run['concurrency']
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = 0.2) -> List[str]:
+    """Regressions of `current` against `baseline`: p95 latency up, or throughput down, by more than `tolerance`"""
+    previous = {run_key(run): run for run in baseline.get('runs', [])}
+    regressions = []
+    for run in current.get('runs', []):
+        before = previous.get(run_key(run))
+        if before is None:
+            continue
+        label = "{} catalog={} concurrency={}".format(*run_key(run))
+        p95_before, p95_now = before['latency_ms']['p95'], run['latency_ms']['p95']
+        if p95_before and p95_now > p95_before * (1 + tolerance):
+            regressions.append(f"{label}: p95 {p95_before} ms -> {p95_now} ms")
+        rps_before, rps_now = before['throughput_rps'], run['throughput_rps']
+        if rps_before and rps_now < rps_before * (1 - tolerance):
+            regressions.append(f"{label}: throughput {rps_before} -> {rps_now} req/s")
+        if sum(run['errors'].values()) > sum(before['errors'].values()):
+            regressions.append(f"{label}: errors {before['errors']} -> {run['errors']}")
+    return regressions
@@ -0,0 +1,80 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = "🛍️ Sure! Here's what I found for you in our store. Let me know if you'd like more details."
+
+
+def start_llm_stub(host: str = '127.0.0.1', port: int = 0, **handler_options) -> ThreadingHTTPServer:
+    """Serve the stub from a daemon thread; port 0 picks a free one (see `server.server_address`)"""
+    server = ThreadingHTTPServer((host, port), make_handler(**handler_options))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='llm-stub', daemon=True).start()
+    return server
+
+
+def stub_base_url(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/v1"
+
+
+def make_handler(reply: str = DEFAULT_REPLY, latency: float = 0.2, token_delay: float = 0.05):
+    """Request handler for an OpenAI-compatible /v1 API that answers every chat completion with `reply`"""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, payload, status=200):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip('/').endswith('/models'):
+                self._send_json({'object': 'list', 'data': [{'id': 'local-model', 'object': 'model'}]})
+            else:
+                self._send_json({'error': 'not found'}, status=404)
+
+        def do_POST(self):
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self._send_json({'error': 'not found'}, status=404)
+                return
+
+            length = int(self.headers.get('Content-Length') or 0)
+            request = json.loads(self.rfile.read(length) or b'{}')
+            time.sleep(latency)
+
+            if not request.get('stream'):
+                self._send_json({
+                    'object': 'chat.completion',
+                    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': reply}, 'finish_reason': 'stop'}],
+                })
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+
+            words = reply.split(' ')
+            for i, word in enumerate(words):
+                chunk = {
+                    'object': 'chat.completion.chunk',
+                    'choices': [{'index': 0, 'delta': {'content': word if i == 0 else ' ' + word}, 'finish_reason': None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+                time.sleep(token_delay)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+
+    return StubHandler
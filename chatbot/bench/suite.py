@@ -0,0 +1,48 @@
+from typing import Any, Callable, Dict, List, Sequence
+
+from chatbot.bench.corpus import build_corpus
+from chatbot.bench.data import grow_catalog
+from chatbot.bench.driver import http_sender, run_load, service_sender
+from chatbot.services import registry
+
+SENDERS = {
+    'service': service_sender,
+    'http': http_sender,
+}
+
+
+def refresh_indexes():
+    """Rebuild the in-memory indexes after `grow_catalog` (bulk inserts send no signals)"""
+    from core.search import get_search_backend
+
+    registry.get_catalog_index().rebuild()
+    backend = get_search_backend()
+    if hasattr(backend, 'rebuild'):
+        backend.rebuild()
+
+
+def run_suite(catalog_sizes: Sequence[int], concurrency_levels: Sequence[int], requests: int,
+              targets: Sequence[str] = ('service', 'http'), seed: int = 0, orders_per_product: float = 0.5,
+              warmup: int = 20, log: Callable[[str], None] = print) -> List[Dict[str, Any]]:
+    """Every target x catalog size x concurrency level, smallest catalog first (the catalog only grows)"""
+    runs = []
+    for size in sorted(catalog_sizes):
+        log(f"Generating catalog: {size} products")
+        catalog = grow_catalog(size, int(size * orders_per_product), seed=seed)
+        refresh_indexes()
+        corpus = build_corpus(catalog, requests, seed=seed)
+
+        for target in targets:
+            send = SENDERS[target]()
+            # Untimed pass so lazily loaded components and cold caches don't skew the first level
+            run_load(send, corpus[:warmup], 1)
+            for concurrency in concurrency_levels:
+                run = run_load(send, corpus, concurrency)
+                run.update(target=target, catalog_size=size)
+                log(
+                    f"  {target:<8} concurrency={concurrency:<3} {run['throughput_rps']:>8} req/s  "
+                    f"p50={run['latency_ms']['p50']} p95={run['latency_ms']['p95']} p99={run['latency_ms']['p99']} ms"
+                    + (f"  errors={run['errors']}" if run['errors'] else '')
+                )
+                runs.append(run)
+    return runs
@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from chatbot.services.archive import archive_expired_sessions
+from chatbot.services.registry import get_transcript_queue
+
+
+class Command(BaseCommand):
+    help = 'Deactivate idle chat sessions and move their messages into compressed ChatArchive rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=None, help='Idle time before a session expires; defaults to CHATBOT_SESSION_TTL_HOURS')
+        parser.add_argument('--batch-size', type=int, default=500, help='Sessions archived per transaction')
+        parser.add_argument('--limit', type=int, default=None, help='Stop after this many sessions')
+        parser.add_argument('--loop', action='store_true', help='Keep archiving as sessions expire')
+        parser.add_argument('--interval', type=float, default=15 * 60, help='Seconds between runs with --loop')
+
+    def handle(self, *args, **options):
+        hours = options['hours'] or getattr(settings, 'CHATBOT_SESSION_TTL_HOURS', 24)
+
+        while True:
+            # Turns still queued in this process must reach ChatMessage before their session is archived
+            transcript_queue = get_transcript_queue()
+            if transcript_queue is not None:
+                transcript_queue.flush()
+
+            started = time.perf_counter()
+            totals = archive_expired_sessions(hours=hours, batch_size=options['batch_size'], limit=options['limit'])
+            if totals['sessions'] or not options['loop']:
+                ratio = totals['raw_bytes'] / totals['archived_bytes'] if totals['archived_bytes'] else 0
+                self.stdout.write(self.style.SUCCESS(
+                    f"Archived {totals['sessions']} sessions ({totals['messages']} messages, "
+                    f"{totals['raw_bytes']} -> {totals['archived_bytes']} bytes, {ratio:.1f}x) "
+                    f"in {time.perf_counter() - started:.1f}s"
+                ))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
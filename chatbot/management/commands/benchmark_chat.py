@@ -0,0 +1,127 @@
+import json
+import os
+import platform
+import sys
+import tempfile
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+from django.utils import timezone
+
+from chatbot.bench.driver import compare_results
+from chatbot.bench.llm_stub import start_llm_stub, stub_base_url
+from chatbot.bench.suite import SENDERS, run_suite
+from chatbot.services import registry
+
+
+def _int_list(value):
+    return [int(part) for part in value.split(',') if part.strip()]
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the chatbot: throughput and p50/p95/p99 latency of ChatService.process_message and '
+        '/chatbot/chat/ at several catalog sizes and concurrency levels, against a synthetic catalog in a '
+        'throwaway test database and a local LLM stub. Results are written as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--catalog-sizes', type=_int_list, default=[100, 1000, 5000], help='Comma-separated product counts')
+        parser.add_argument('--concurrency', type=_int_list, default=[1, 4, 16], help='Comma-separated numbers of simulated users')
+        parser.add_argument('--requests', type=int, default=200, help='Messages sent per run')
+        parser.add_argument('--targets', default='service,http', help=f"Comma-separated, from: {', '.join(SENDERS)}")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--orders-per-product', type=float, default=0.5)
+        parser.add_argument('--llm-latency', type=float, default=0.05, help='Seconds the LLM stub takes per reply')
+        parser.add_argument('--no-llm', action='store_true', help='No LLM endpoint; handlers use their fallback replies')
+        parser.add_argument('--response-cache', action='store_true', help='Keep the LLM response cache on (off by default)')
+        parser.add_argument('--keepdb', action='store_true', help='Reuse the test database between runs')
+        parser.add_argument('--output', default='chat-benchmark.json')
+        parser.add_argument('--baseline', default=None, help='Earlier results to compare against')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed p95/throughput change vs --baseline')
+
+    def handle(self, *args, **options):
+        targets = [target.strip() for target in options['targets'].split(',') if target.strip()]
+        unknown = set(targets) - set(SENDERS)
+        if unknown:
+            raise CommandError(f"Unknown targets: {', '.join(sorted(unknown))}")
+
+        stub = None
+        overrides = {
+            'OPENAI_API_KEY': '',
+            'LM_STUDIO_BASE_URL': None,
+            'CHATBOT_THROTTLE_RATES': {},
+        }
+        if not options['response_cache']:
+            overrides['CHATBOT_RESPONSE_CACHE_SECONDS'] = 0
+        if not options['no_llm']:
+            stub = start_llm_stub(latency=options['llm_latency'], token_delay=0)
+            overrides['LM_STUDIO_BASE_URL'] = stub_base_url(stub)
+
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+            # The default in-memory test database locks whole tables under concurrent writers
+            test_settings['NAME'] = os.path.join(tempfile.gettempdir(), 'chat_benchmark.sqlite3')
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'], aliases={DEFAULT_DB_ALIAS})
+        try:
+            with override_settings(**overrides):
+                # Services read these settings when they are built
+                registry.reset()
+                runs = run_suite(
+                    catalog_sizes=options['catalog_sizes'],
+                    concurrency_levels=options['concurrency'],
+                    requests=options['requests'],
+                    targets=targets,
+                    seed=options['seed'],
+                    orders_per_product=options['orders_per_product'],
+                    log=self.stdout.write,
+                )
+                sink = registry.get_analytics_sink()
+                if sink is not None:
+                    sink.flush()
+                vendor = connection.vendor
+        finally:
+            registry.reset()
+            if stub is not None:
+                stub.shutdown()
+            teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        results = {
+            'generated_at': timezone.now().isoformat(),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+                'database': vendor,
+                'argv': sys.argv[1:],
+            },
+            'config': {
+                'catalog_sizes': options['catalog_sizes'],
+                'concurrency': options['concurrency'],
+                'requests': options['requests'],
+                'targets': targets,
+                'seed': options['seed'],
+                'orders_per_product': options['orders_per_product'],
+                'llm_latency': None if options['no_llm'] else options['llm_latency'],
+                'response_cache': options['response_cache'],
+            },
+            'runs': runs,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(runs)} runs to {options['output']}"))
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                regressions = compare_results(json.load(f), results, tolerance=options['tolerance'])
+            if regressions:
+                raise CommandError("Regressions against {}:\n  {}".format(options['baseline'], '\n  '.join(regressions)))
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['baseline']}"))
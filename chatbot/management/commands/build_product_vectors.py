@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot.services.vector_store import build_vector_store
+
+
+class Command(BaseCommand):
+    help = 'Embed every product (TF-IDF + SVD) into the memory-mapped vector store used to ground chatbot answers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', default=None, help='Defaults to CHATBOT_VECTOR_STORE_DIR')
+        parser.add_argument('--dim', type=int, default=128, help='Embedding dimensions')
+        parser.add_argument('--max-features', type=int, default=50000, help='TF-IDF vocabulary size')
+        parser.add_argument('--keep-versions', type=int, default=2, help='Older builds to keep on disk')
+
+    def handle(self, *args, **options):
+        directory = options['output_dir'] or settings.CHATBOT_VECTOR_STORE_DIR
+
+        started = time.perf_counter()
+        try:
+            meta = build_vector_store(
+                directory,
+                dim=options['dim'],
+                max_features=options['max_features'],
+                keep_versions=options['keep_versions'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Embedded {meta['count']} products ({meta['dim']} dims) as version {meta['version']} "
+            f"in {time.perf_counter() - started:.1f}s"
+        ))
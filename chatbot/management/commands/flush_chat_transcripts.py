@@ -0,0 +1,26 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from chatbot.services.transcript_queue import recover_spools
+
+
+class Command(BaseCommand):
+    help = 'Write chat turns left in transcript spool files by stopped or crashed processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--spool-dir', default=None, help='Defaults to CHATBOT_TRANSCRIPT_SPOOL_DIR')
+        parser.add_argument('--loop', action='store_true', help='Keep checking for orphaned spools')
+        parser.add_argument('--interval', type=float, default=30, help='Seconds between checks with --loop')
+
+    def handle(self, *args, **options):
+        spool_dir = options['spool_dir'] or settings.CHATBOT_TRANSCRIPT_SPOOL_DIR
+
+        while True:
+            recovered = recover_spools(spool_dir)
+            if recovered or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f"Wrote {recovered} chat turns from {spool_dir}"))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from chatbot.services.order_lookup import rebuild_order_lookups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the order reference index used by chat order tracking (needed after bulk CartOrder updates)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        created = rebuild_order_lookups(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {created} order references"))
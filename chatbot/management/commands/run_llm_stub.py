@@ -0,0 +1,29 @@
+from http.server import ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+from chatbot.bench.llm_stub import DEFAULT_REPLY, make_handler
+
+
+class Command(BaseCommand):
+    help = 'Run a local OpenAI-compatible stub that stands in for LM Studio (supports stream: true)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=1234)
+        parser.add_argument('--latency', type=float, default=0.2, help='Seconds before the first token')
+        parser.add_argument('--token-delay', type=float, default=0.05, help='Seconds between streamed tokens')
+        parser.add_argument('--reply', default=DEFAULT_REPLY)
+
+    def handle(self, *args, **options):
+        server = ThreadingHTTPServer((options['host'], options['port']), make_handler(options['reply'], options['latency'], options['token_delay']))
+        self.stdout.write(self.style.SUCCESS(
+            f"LLM stub listening on http://{options['host']}:{options['port']}/v1 "
+            f"(latency {options['latency']}s, token delay {options['token_delay']}s)"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,67 @@
+import time
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot.models import ChatMessage
+from chatbot.services.intent_engine import HashedIntentClassifier
+
+
+class Command(BaseCommand):
+    help = (
+        "Train the chatbot's hashed n-gram intent classifier from labelled user messages. "
+        "A message's label is metadata['intent_label'] (a manual correction) if set, else metadata['intent']."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None, help='Defaults to CHATBOT_INTENT_MODEL_PATH')
+        parser.add_argument('--dim', type=int, default=2 ** 18, help='Number of hashed feature buckets')
+        parser.add_argument('--epochs', type=int, default=10)
+        parser.add_argument('--learning-rate', type=float, default=0.5)
+        parser.add_argument('--min-examples', type=int, default=5, help='Skip intents with fewer labelled messages')
+        parser.add_argument('--holdout', type=float, default=0.1, help='Share of messages kept back for accuracy')
+
+    def handle(self, *args, **options):
+        texts, labels = [], []
+        for content, metadata in ChatMessage.objects.filter(message_type='user').values_list('content', 'metadata').iterator():
+            metadata = metadata or {}
+            label = metadata.get('intent_label') or metadata.get('intent')
+            if label and content:
+                texts.append(content)
+                labels.append(label)
+
+        counts = Counter(labels)
+        keep = [i for i, label in enumerate(labels) if counts[label] >= options['min_examples']]
+        texts = [texts[i] for i in keep]
+        labels = [labels[i] for i in keep]
+        if len(set(labels)) < 2:
+            raise CommandError(f"Need labelled messages for at least two intents, found {dict(counts)}")
+
+        order = np.random.default_rng(0).permutation(len(texts))
+        holdout = int(len(order) * options['holdout'])
+        test, train = order[:holdout], order[holdout:]
+
+        started = time.perf_counter()
+        model = HashedIntentClassifier.fit(
+            [texts[i] for i in train], [labels[i] for i in train],
+            dim=options['dim'], epochs=options['epochs'], learning_rate=options['learning_rate'],
+        )
+        self.stdout.write(f"Trained on {len(train)} messages, {len(model.labels)} intents in {time.perf_counter() - started:.1f}s")
+
+        if len(test):
+            test_texts = [texts[i] for i in test]
+            started = time.perf_counter()
+            probs = model.predict_proba(test_texts)
+            elapsed = time.perf_counter() - started
+            predicted = [model.labels[i] for i in probs.argmax(axis=1)]
+            accuracy = np.mean([p == labels[i] for p, i in zip(predicted, test)])
+            self.stdout.write(
+                f"Holdout accuracy {accuracy:.3f} on {len(test)} messages "
+                f"({len(test) / elapsed:.0f} messages/s)"
+            )
+
+        output = options['output'] or settings.CHATBOT_INTENT_MODEL_PATH
+        model.save(output)
+        self.stdout.write(self.style.SUCCESS(f"Saved intent classifier to {output}"))
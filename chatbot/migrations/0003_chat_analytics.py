@@ -0,0 +1,50 @@
+# Generated by Django 4.2.2 on 2026-10-17 01:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0002_chatarchive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productquery',
+            name='intent',
+            field=models.CharField(blank=True, db_index=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='productquery',
+            name='latency_ms',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='productquery',
+            name='reference',
+            field=models.CharField(blank=True, db_index=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='productquery',
+            name='timings',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.CreateModel(
+            name='ChatAnalyticsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('intent', models.CharField(max_length=100)),
+                ('result_bucket', models.CharField(max_length=10)),
+                ('queries', models.IntegerField(default=0)),
+                ('clicks', models.IntegerField(default=0)),
+                ('total_latency_ms', models.FloatField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Chat Analytics Rollups',
+                'ordering': ['-hour'],
+                'unique_together': {('hour', 'intent', 'result_bucket')},
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.2 on 2026-10-17 01:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_order_lookups(apps, schema_editor):
+    # Mirrors chatbot.services.order_lookup.lookup_entries as of this migration
+    CartOrder = apps.get_model('core', 'CartOrder')
+    OrderLookup = apps.get_model('chatbot', 'OrderLookup')
+
+    rows = []
+    for pk, oid, tracking_id, sku in CartOrder.objects.values_list('pk', 'oid', 'tracking_id', 'sku').iterator(chunk_size=2000):
+        for kind, value in (('oid', oid), ('tracking_id', tracking_id), ('sku', sku)):
+            reference = (value or '').strip().lstrip('#').strip().upper()
+            if reference:
+                rows.append(OrderLookup(order_id=pk, reference=reference[:100], kind=kind))
+        if len(rows) >= 2000:
+            OrderLookup.objects.bulk_create(rows)
+            rows = []
+    OrderLookup.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_cartorder_payment_method'),
+        ('chatbot', '0003_chat_analytics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderLookup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reference', models.CharField(max_length=100)),
+                ('kind', models.CharField(choices=[('oid', 'Order ID'), ('sku', 'SKU'), ('tracking_id', 'Tracking ID')], max_length=20)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lookups', to='core.cartorder')),
+            ],
+            options={
+                'verbose_name_plural': 'Order Lookups',
+                'indexes': [models.Index(fields=['reference', 'kind'], name='chatbot_order_ref_kind_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_order_lookups, migrations.RunPython.noop),
+    ]
@@ -58,11 +58,77 @@ class ChatIntent(models.Model):
 class ProductQuery(models.Model):
     """Track product search queries for analytics"""
     session = models.ForeignKey(ChatSession, on_delete=models.CASCADE)
+    reference = models.CharField(max_length=32, blank=True, db_index=True)  # `query_id` given to the client for click tracking
     query_text = models.TextField()
+    intent = models.CharField(max_length=100, blank=True, db_index=True)
     extracted_entities = models.JSONField(default=dict)
     results_count = models.IntegerField(default=0)
+    latency_ms = models.FloatField(default=0)
+    timings = models.JSONField(default=dict, blank=True)  # milliseconds per pipeline stage
     clicked_product = models.ForeignKey('core.Product', on_delete=models.SET_NULL, null=True, blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
     
     class Meta:
-        verbose_name_plural = "Product Queries"
\ No newline at end of file
+        verbose_name_plural = "Product Queries"
+
+class ChatAnalyticsRollup(models.Model):
+    """Chat queries pre-aggregated per hour x intent x result-count bucket, for the analytics dashboard"""
+    hour = models.DateTimeField()
+    intent = models.CharField(max_length=100)
+    result_bucket = models.CharField(max_length=10)
+    queries = models.IntegerField(default=0)
+    clicks = models.IntegerField(default=0)
+    total_latency_ms = models.FloatField(default=0)
+
+    class Meta:
+        verbose_name_plural = "Chat Analytics Rollups"
+        unique_together = ('hour', 'intent', 'result_bucket')
+        ordering = ['-hour']
+
+    def __str__(self):
+        return f"{self.hour:%Y-%m-%d %H:00} {self.intent} [{self.result_bucket}]"
+
+class ChatArchive(models.Model):
+    """Transcript of an expired session, compressed into one row (see `manage.py archive_chat_sessions`)"""
+    CODECS = (
+        ('zlib', 'zlib'),
+        ('zstd', 'Zstandard'),
+    )
+
+    session = models.OneToOneField(ChatSession, on_delete=models.CASCADE, related_name='archive')
+    codec = models.CharField(max_length=10, choices=CODECS)
+    data = models.BinaryField()  # compressed JSON lines, one message per line
+    message_count = models.IntegerField(default=0)
+    first_message_at = models.DateTimeField(null=True, blank=True)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = "Chat Archives"
+
+    def __str__(self):
+        return f"Archive of {self.session.session_id}"
+
+class OrderLookup(models.Model):
+    """Normalized order references (oid, tracking id, SKU) with exact-match indexes, for chat order tracking.
+
+    Kept in sync by a CartOrder post_save signal; see chatbot/services/order_lookup.py.
+    """
+    KINDS = (
+        ('oid', 'Order ID'),
+        ('sku', 'SKU'),
+        ('tracking_id', 'Tracking ID'),
+    )
+
+    order = models.ForeignKey('core.CartOrder', on_delete=models.CASCADE, related_name='lookups')
+    reference = models.CharField(max_length=100)  # upper-cased, without a leading '#'
+    kind = models.CharField(max_length=20, choices=KINDS)
+
+    class Meta:
+        verbose_name_plural = "Order Lookups"
+        indexes = [
+            models.Index(fields=['reference', 'kind'], name='chatbot_order_ref_kind_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.reference}"
@@ -0,0 +1,145 @@
+import asyncio
+import hashlib
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Dict
+
+from chatbot.services.response_cache import context_fingerprint, normalize_message
+
+
+def coalesce_key(message: str, context: Dict[str, Any]) -> str:
+    """Requests with the same key would get the same LLM reply"""
+    return hashlib.sha1(f"{context_fingerprint(context)}|{normalize_message(message)}".encode('utf-8')).hexdigest()
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse identical concurrent calls: the first caller for a key runs it, the others wait and share its result"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+
+class AdmissionGate:
+    """Bounded concurrency for LLM calls.
+
+    At most `max_concurrency` calls run at once. Up to `max_queue` more callers
+    wait, each for at most `timeout` seconds; anyone beyond that, or still
+    waiting when the timeout expires, is turned away so the caller can answer
+    with a "busy" reply instead of piling more work on the model.
+    """
+
+    def __init__(self, max_concurrency: int = 4, max_queue: int = 16, timeout: float = 5.0):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.running = 0
+        self.rejected = 0
+
+    def _enqueue(self) -> bool:
+        with self._lock:
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                return False
+            self.waiting += 1
+            return True
+
+    def _dequeue(self, admitted: bool):
+        with self._lock:
+            self.waiting -= 1
+            if admitted:
+                self.running += 1
+            else:
+                self.rejected += 1
+
+    def _release(self):
+        with self._lock:
+            self.running -= 1
+        self._slots.release()
+
+    @contextmanager
+    def admit(self):
+        """Yields True once a slot is free, or False if the caller should back off"""
+        if self._slots.acquire(blocking=False):
+            with self._lock:
+                self.running += 1
+            admitted = True
+        elif not self._enqueue():
+            admitted = False
+        else:
+            admitted = self._slots.acquire(timeout=self.timeout)
+            self._dequeue(admitted)
+
+        try:
+            yield admitted
+        finally:
+            if admitted:
+                self._release()
+
+    @asynccontextmanager
+    async def aadmit(self):
+        """`admit` for the event loop: polls for a slot instead of blocking the thread"""
+        admitted = self._slots.acquire(blocking=False)
+        if admitted:
+            with self._lock:
+                self.running += 1
+        elif self._enqueue():
+            deadline = time.monotonic() + self.timeout
+            while not admitted and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+                admitted = self._slots.acquire(blocking=False)
+            self._dequeue(admitted)
+
+        try:
+            yield admitted
+        finally:
+            if admitted:
+                self._release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'max_concurrency': self.max_concurrency,
+            'running': self.running,
+            'waiting': self.waiting,
+            'rejected': self.rejected,
+        }
@@ -0,0 +1,180 @@
+import os
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from chatbot.models import ChatAnalyticsRollup, ChatSession, ProductQuery
+from chatbot.services.background_flush import BackgroundFlusher
+
+# (upper bound inclusive, label); counts above the last bound fall in the last bucket
+RESULT_BUCKETS = [(0, '0'), (4, '1-4'), (19, '5-19'), (None, '20+')]
+
+
+def result_bucket(count: int) -> str:
+    for bound, label in RESULT_BUCKETS:
+        if bound is None or count <= bound:
+            return label
+    return RESULT_BUCKETS[-1][1]
+
+
+def rollup_hour(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+class AnalyticsSink(BackgroundFlusher):
+    """Buffered writer for chat analytics.
+
+    `record` and `record_click` only append to an in-memory buffer; a background
+    thread writes it every `flush_size` events or `flush_interval` seconds with
+    one `bulk_create` of ProductQuery rows plus one increment per touched
+    ChatAnalyticsRollup row. Analytics are best effort: a batch that fails to
+    write, or is still buffered when the process is killed, is dropped.
+
+    A click can reach a worker before the worker that answered the query has
+    flushed it; such clicks are kept for up to `CLICK_RETRIES` more flushes and
+    then counted in `dropped_clicks`.
+    """
+
+    name = 'Analytics'
+    thread_name = 'chat-analytics-flush'
+    CLICK_RETRIES = 5
+
+    def __init__(self, flush_size: int = 200, flush_interval: float = 2.0):
+        super().__init__(flush_size, flush_interval)
+        self._queries: List[Dict[str, Any]] = []
+        self._clicks: List[Tuple[str, int, int]] = []  # (reference, product id, flushes tried)
+        self.dropped_clicks = 0
+
+    def record(self, session_id: str, query_text: str, intent: str, entities: Dict[str, Any],
+               results_count: int = 0, timings: Optional[Dict[str, float]] = None) -> str:
+        """Buffer one chat query; returns its reference (the `query_id` clicks are reported against)"""
+        reference = uuid.uuid4().hex
+        timings = timings or {}
+        self._append('_queries', {
+            'reference': reference,
+            'session_id': session_id,
+            'query_text': query_text,
+            'intent': intent or '',
+            'extracted_entities': entities or {},
+            'results_count': results_count,
+            'timings': timings,
+            'latency_ms': timings.get('total', sum(timings.values())),
+        })
+        return reference
+
+    def record_click(self, reference: str, product_id: int):
+        self._append('_clicks', (reference, product_id, 0))
+
+    def _append(self, buffer: str, item):
+        with self._lock:
+            self._ensure_started()
+            getattr(self, buffer).append(item)
+            full = len(self._queries) + len(self._clicks) >= self.flush_size
+        if full:
+            self._wake()
+
+    def _reset(self):
+        self._queries, self._clicks = [], []
+
+    def flush(self) -> int:
+        """Write everything buffered; returns the number of events written"""
+        with self._flush_lock:
+            with self._lock:
+                if self._pid != os.getpid() or not (self._queries or self._clicks):
+                    return 0
+                queries, self._queries = self._queries, []
+                clicks, self._clicks = self._clicks, []
+
+            unmatched = set(write_events(queries, [(reference, product_id) for reference, product_id, _ in clicks]))
+
+            retry = []
+            for reference, product_id, tries in clicks:
+                if (reference, product_id) not in unmatched:
+                    continue
+                if tries < self.CLICK_RETRIES:
+                    retry.append((reference, product_id, tries + 1))
+                else:
+                    self.dropped_clicks += 1
+            if retry:
+                with self._lock:
+                    self._clicks = retry + self._clicks
+            return len(queries) + len(clicks) - len(retry)
+
+
+def write_events(queries: List[Dict[str, Any]], clicks: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
+    """Insert buffered queries, apply clicks and bump the matching rollup rows.
+
+    Returns the clicks whose query isn't in the database (yet).
+    """
+    session_pks = dict(
+        ChatSession.objects.filter(session_id__in={q['session_id'] for q in queries})
+        .values_list('session_id', 'pk')
+    )
+    rows = [
+        ProductQuery(session_id=session_pks[q['session_id']], **{k: v for k, v in q.items() if k != 'session_id'})
+        for q in queries if q['session_id'] in session_pks
+    ]
+
+    rollups = defaultdict(lambda: {'queries': 0, 'clicks': 0, 'total_latency_ms': 0.0})
+    with transaction.atomic():
+        ProductQuery.objects.bulk_create(rows)
+        # `timestamp` is auto_now_add, so rows are bucketed by when they were written
+        for row in rows:
+            key = (rollup_hour(row.timestamp), row.intent, result_bucket(row.results_count))
+            rollups[key]['queries'] += 1
+            rollups[key]['total_latency_ms'] += row.latency_ms
+
+        # Only the first click on a query counts; later ones would overwrite it
+        clicked = {}
+        for reference, product_id in clicks:
+            clicked.setdefault(reference, product_id)
+        found = set()
+        if clicked:
+            matched = ProductQuery.objects.filter(reference__in=list(clicked))
+            by_product = defaultdict(list)
+            for pk, reference, timestamp, intent, results_count, clicked_product_id in matched.values_list(
+                'pk', 'reference', 'timestamp', 'intent', 'results_count', 'clicked_product_id'
+            ):
+                found.add(reference)
+                if clicked_product_id is not None:
+                    continue
+                by_product[clicked[reference]].append(pk)
+                rollups[(rollup_hour(timestamp), intent, result_bucket(results_count))]['clicks'] += 1
+            for product_id, pks in by_product.items():
+                ProductQuery.objects.filter(pk__in=pks).update(clicked_product_id=product_id)
+
+        for (hour, intent, bucket), counts in rollups.items():
+            increment_rollup(hour, intent, bucket, **counts)
+
+    return [(reference, product_id) for reference, product_id in clicks if reference not in found]
+
+
+def increment_rollup(hour: datetime, intent: str, bucket: str, queries: int = 0, clicks: int = 0, total_latency_ms: float = 0.0):
+    lookup = {'hour': hour, 'intent': intent, 'result_bucket': bucket}
+    changes = {
+        'queries': F('queries') + queries,
+        'clicks': F('clicks') + clicks,
+        'total_latency_ms': F('total_latency_ms') + total_latency_ms,
+    }
+    if ChatAnalyticsRollup.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            ChatAnalyticsRollup.objects.create(**lookup, queries=queries, clicks=clicks, total_latency_ms=total_latency_ms)
+    except IntegrityError:
+        # Another process created the row first
+        ChatAnalyticsRollup.objects.filter(**lookup).update(**changes)
+
+
+def create_analytics_sink() -> Optional[AnalyticsSink]:
+    if not getattr(settings, 'CHATBOT_ANALYTICS_ENABLED', True):
+        return None
+    return AnalyticsSink(
+        flush_size=getattr(settings, 'CHATBOT_ANALYTICS_FLUSH_SIZE', 200),
+        flush_interval=getattr(settings, 'CHATBOT_ANALYTICS_FLUSH_MS', 2000) / 1000,
+    )
@@ -0,0 +1,117 @@
+import json
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from chatbot.models import ChatArchive, ChatMessage, ChatSession
+from chatbot.utils import session_expiry_cutoff
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional; zlib compresses chat JSON almost as well, only slower
+    zstandard = None
+
+MESSAGE_FIELDS = ('id', 'message_type', 'content', 'metadata', 'timestamp')
+
+
+def compress(payload: bytes) -> Tuple[str, bytes]:
+    if zstandard is not None:
+        return 'zstd', zstandard.ZstdCompressor(level=10).compress(payload)
+    return 'zlib', zlib.compress(payload, 9)
+
+
+def decompress(codec: str, data: bytes) -> bytes:
+    data = bytes(data)
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Archive is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def encode_messages(messages: List[Dict]) -> bytes:
+    """JSON lines, one message per line"""
+    return '\n'.join(
+        json.dumps({**message, 'timestamp': message['timestamp'].isoformat()}, ensure_ascii=False, default=str)
+        for message in messages
+    ).encode('utf-8')
+
+
+def archive_expired_sessions(hours: int = 24, batch_size: int = 500, limit: Optional[int] = None) -> Dict[str, int]:
+    """Deactivate sessions idle for `hours` and move their messages into ChatArchive.
+
+    Works in batches of `batch_size` sessions. Each batch reads its messages with
+    one query and then, in one transaction, inserts one compressed archive row per
+    session, deletes the messages and marks the sessions inactive. An interrupted
+    run therefore leaves every session either fully archived or untouched. Only
+    messages older than the cutoff are moved: a turn that lands while a batch is
+    being archived stays in ChatMessage, and the history view shows both.
+    """
+    cutoff = session_expiry_cutoff(hours)
+    totals = {'sessions': 0, 'messages': 0, 'raw_bytes': 0, 'archived_bytes': 0}
+
+    while limit is None or totals['sessions'] < limit:
+        size = batch_size if limit is None else min(batch_size, limit - totals['sessions'])
+        session_ids = list(
+            ChatSession.objects.filter(is_active=True, updated_at__lt=cutoff)
+            .order_by('id').values_list('id', flat=True)[:size]
+        )
+        if not session_ids:
+            break
+
+        by_session = defaultdict(list)
+        messages = ChatMessage.objects.filter(session_id__in=session_ids, timestamp__lt=cutoff)
+        for row in messages.order_by('session_id', 'timestamp', 'id').values('session_id', *MESSAGE_FIELDS).iterator():
+            by_session[row.pop('session_id')].append(row)
+
+        archives = []
+        for session_id in session_ids:
+            rows = by_session.get(session_id)
+            if not rows:
+                continue
+            payload = encode_messages(rows)
+            codec, data = compress(payload)
+            archives.append(ChatArchive(
+                session_id=session_id,
+                codec=codec,
+                data=data,
+                message_count=len(rows),
+                first_message_at=rows[0]['timestamp'],
+                last_message_at=rows[-1]['timestamp'],
+            ))
+            totals['messages'] += len(rows)
+            totals['raw_bytes'] += len(payload)
+            totals['archived_bytes'] += len(data)
+
+        with transaction.atomic():
+            ChatArchive.objects.bulk_create(archives)
+            messages.delete()
+            ChatSession.objects.filter(id__in=session_ids).update(is_active=False)
+
+        totals['sessions'] += len(session_ids)
+
+    return totals
+
+
+def archived_messages(session: ChatSession) -> List[ChatMessage]:
+    """Unsaved ChatMessage objects rebuilt from the session's archive (empty if it has none)"""
+    try:
+        archive = session.archive
+    except ChatArchive.DoesNotExist:
+        return []
+
+    messages = []
+    for line in decompress(archive.codec, archive.data).decode('utf-8').splitlines():
+        row = json.loads(line)
+        messages.append(ChatMessage(
+            id=row['id'],
+            session=session,
+            message_type=row['message_type'],
+            content=row['content'],
+            metadata=row['metadata'],
+            timestamp=parse_datetime(row['timestamp']),
+        ))
+    return messages
@@ -0,0 +1,55 @@
+import atexit
+import os
+import threading
+
+
+class BackgroundFlusher:
+    """Base for write-behind buffers drained by a per-process daemon thread.
+
+    Producers append under `_lock` after `_ensure_started()` and call `_wake()`
+    once `flush_size` items are waiting; otherwise the thread flushes every
+    `flush_interval` seconds. `flush` also runs at interpreter exit. After a
+    fork the child starts its own thread and `_reset` clears the buffers it
+    inherited, which belong to the parent.
+    """
+
+    name = 'Flusher'
+    thread_name = 'background-flush'
+
+    def __init__(self, flush_size: int, flush_interval: float):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pid = None
+
+        atexit.register(self.flush)
+
+    def _ensure_started(self):
+        """Start the flush thread in this process; call with `_lock` held"""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._reset()
+        threading.Thread(target=self._run, name=self.thread_name, daemon=True).start()
+
+    def _reset(self):
+        pass
+
+    def _wake(self):
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[{self.name}] Flush failed:", e)
+
+    def flush(self) -> int:
+        """Write what is buffered; returns the number of items written"""
+        raise NotImplementedError
@@ -0,0 +1,268 @@
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from django.core.cache import cache
+
+from core.search import stem
+from core.versioned_index import VersionedIndex
+
+try:
+    from rapidfuzz import fuzz
+except ImportError:  # rapidfuzz is optional; fuzzywuzzy gives the same scores, only slower
+    from fuzzywuzzy import fuzz
+
+TOKEN_RE = re.compile(r'\w+')
+
+# Cache key bumped on every catalog change so other worker processes know to rebuild
+CATALOG_VERSION_KEY = 'chatbot:catalog_index:version'
+
+_END = '__end__'
+
+
+def _tokenize(text: str) -> List[str]:
+    # Plurals are folded so "shoes" finds the "Shoe" category and vice versa
+    return [stem(token) for token in TOKEN_RE.findall(text.lower())]
+
+
+def _trigrams(token: str) -> Set[str]:
+    padded = f" {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CatalogIndex(VersionedIndex):
+    """In-memory index of category and product titles for entity extraction.
+
+    Exact category/product mentions are found with a token trie in a single pass
+    over the message. Fuzzy product matches go through a token prefilter: message
+    words are mapped onto the title vocabulary (exactly, or via trigram lookup for
+    typos), and only titles sharing enough of those words are scored with
+    `fuzz.partial_ratio`, instead of scoring every title in the catalog.
+    """
+
+    version_key = CATALOG_VERSION_KEY
+    refresh_setting = 'CHATBOT_CATALOG_REFRESH_SECONDS'
+    name = 'CatalogIndex'
+
+    FUZZY_THRESHOLD = 85          # same cut-off the per-title loop used
+    TYPO_THRESHOLD = 80           # fuzz.ratio needed to treat a message word as a misspelt title word
+    MIN_TOKEN_OVERLAP = 0.5       # share of the shorter side's words that must match
+    MAX_TYPO_VARIANTS = 3
+    FREQUENT_WORD_POSTINGS = 1000  # words in more titles than this are not enumerated
+    MAX_FUZZY_CANDIDATES = 50
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.RLock()
+        self._trie: Dict = {}
+        self._categories: Dict[int, str] = {}
+        self._products: Dict[int, Tuple[str, str, int]] = {}  # id -> (title, normalized title, word count)
+        self._token_postings: Dict[str, Set[int]] = defaultdict(set)
+        self._vocab_trigrams: Dict[str, Set[str]] = defaultdict(set)
+        self._pending: Optional[List[Tuple[str, tuple]]] = None  # patches made while a rebuild runs
+
+    # ----------------- Building -----------------
+    def rebuild(self):
+        """Load every category and product title from the database"""
+        from core.models import Category, Product
+
+        # Patches applied while the snapshot is read may be missing from it; they
+        # are recorded and applied again on top of the new snapshot
+        with self._lock:
+            self._pending = []
+        try:
+            version = cache.get(CATALOG_VERSION_KEY)
+            index = CatalogIndex()
+            for category_id, title in Category.objects.values_list('id', 'title').iterator():
+                index.upsert_category(category_id, title)
+            for product_id, title in Product.objects.values_list('id', 'title').iterator():
+                index.upsert_product(product_id, title)
+        except BaseException:
+            with self._lock:
+                self._pending = None
+            raise
+
+        with self._lock:
+            self._trie = index._trie
+            self._categories = index._categories
+            self._products = index._products
+            self._token_postings = index._token_postings
+            self._vocab_trigrams = index._vocab_trigrams
+            self._version = version
+            self._checked_at = time.monotonic()
+            pending, self._pending = self._pending, None
+            for method, args in pending:
+                getattr(self, method)(*args)
+
+    def _record(self, method: str, *args):
+        if self._pending is not None:
+            self._pending.append((method, args))
+
+    def _add_phrase(self, title: str, kind: str, obj_id: int):
+        node = self._trie
+        for token in _tokenize(title):
+            node = node.setdefault(token, {})
+        node.setdefault(_END, set()).add((kind, obj_id))
+
+    def _remove_phrase(self, title: str, kind: str, obj_id: int):
+        node = self._trie
+        for token in _tokenize(title):
+            node = node.get(token)
+            if node is None:
+                return
+        node.get(_END, set()).discard((kind, obj_id))
+
+    def upsert_category(self, category_id: int, title: str):
+        with self._lock:
+            self._record('upsert_category', category_id, title)
+            self._remove_category(category_id)
+            if title:
+                self._categories[category_id] = title
+                self._add_phrase(title, 'category', category_id)
+
+    def remove_category(self, category_id: int):
+        with self._lock:
+            self._record('remove_category', category_id)
+            self._remove_category(category_id)
+
+    def _remove_category(self, category_id: int):
+        title = self._categories.pop(category_id, None)
+        if title:
+            self._remove_phrase(title, 'category', category_id)
+
+    def upsert_product(self, product_id: int, title: str):
+        with self._lock:
+            self._record('upsert_product', product_id, title)
+            self._remove_product(product_id)
+            if not title:
+                return
+            words = set(_tokenize(title))
+            self._products[product_id] = (title, ' '.join(title.lower().split()), len(words))
+            self._add_phrase(title, 'product', product_id)
+            for word in words:
+                if word not in self._token_postings:
+                    for gram in _trigrams(word):
+                        self._vocab_trigrams[gram].add(word)
+                self._token_postings[word].add(product_id)
+
+    def remove_product(self, product_id: int):
+        with self._lock:
+            self._record('remove_product', product_id)
+            self._remove_product(product_id)
+
+    def _remove_product(self, product_id: int):
+        entry = self._products.pop(product_id, None)
+        if not entry:
+            return
+        title = entry[0]
+        self._remove_phrase(title, 'product', product_id)
+        for word in set(_tokenize(title)):
+            postings = self._token_postings.get(word)
+            if postings is None:
+                continue
+            postings.discard(product_id)
+            if not postings:
+                del self._token_postings[word]
+                for gram in _trigrams(word):
+                    self._vocab_trigrams[gram].discard(word)
+
+    # ----------------- Matching -----------------
+    def match(self, text: str) -> Dict[str, List[str]]:
+        """Return the category and product titles mentioned in `text`"""
+        tokens = _tokenize(text)
+        normalized = ' '.join(text.lower().split())
+
+        with self._lock:
+            categories: List[str] = []
+            product_scores: Dict[int, int] = {}
+
+            # Exact phrase hits: walk the trie from every token position
+            for start in range(len(tokens)):
+                node = self._trie
+                for token in tokens[start:]:
+                    node = node.get(token)
+                    if node is None:
+                        break
+                    for kind, obj_id in node.get(_END, ()):
+                        if kind == 'category':
+                            title = self._categories[obj_id]
+                            if title not in categories:
+                                categories.append(title)
+                        else:
+                            product_scores[obj_id] = 100
+
+            # Fuzzy hits: word-overlap prefilter, then verify the few survivors
+            for product_id in self._fuzzy_candidates(tokens):
+                if product_id in product_scores:
+                    continue
+                score = fuzz.partial_ratio(self._products[product_id][1], normalized)
+                if score >= self.FUZZY_THRESHOLD:
+                    product_scores[product_id] = score
+
+            ranked = sorted(product_scores.items(), key=lambda item: item[1], reverse=True)
+            products: List[str] = []
+            for product_id, _ in ranked:
+                title = self._products[product_id][0]
+                if title not in products:
+                    products.append(title)
+
+        return {'categories': categories, 'products': products}
+
+    def _vocabulary_matches(self, token: str) -> List[str]:
+        """Title words that `token` could stand for (itself, or close misspellings)"""
+        if token in self._token_postings:
+            return [token]
+        if len(token) < 4:
+            return []
+
+        grams = _trigrams(token)
+        overlap: Counter = Counter()
+        for gram in grams:
+            words = self._vocab_trigrams.get(gram)
+            if words:
+                overlap.update(words)
+
+        variants = [
+            word for word, hits in overlap.most_common(self.MAX_TYPO_VARIANTS * 4)
+            if hits >= len(grams) / 2 and fuzz.ratio(word, token) >= self.TYPO_THRESHOLD
+        ]
+        return variants[:self.MAX_TYPO_VARIANTS]
+
+    def _fuzzy_candidates(self, tokens: List[str]) -> List[int]:
+        message_words = set(tokens)
+        if not message_words:
+            return []
+
+        postings = [
+            self._token_postings[word]
+            for token in message_words
+            for word in self._vocabulary_matches(token)
+        ]
+        rare = [p for p in postings if len(p) <= self.FREQUENT_WORD_POSTINGS]
+        frequent = [p for p in postings if len(p) > self.FREQUENT_WORD_POSTINGS]
+
+        # Only rare words are enumerated; very common words ("shirt" in a clothing
+        # store) just add hits to titles the rare words already found, so a message
+        # costs O(rare postings) however large the catalog gets.
+        counts: Counter = Counter()
+        for ids in rare:
+            counts.update(ids)
+        if not counts and len(frequent) > 1:
+            counts.update(set.intersection(*sorted(frequent, key=len)))
+            frequent = []
+        for ids in frequent:
+            for product_id in counts:
+                if product_id in ids:
+                    counts[product_id] += 1
+
+        candidates = [
+            (hits, product_id) for product_id, hits in counts.items()
+            if hits >= self.MIN_TOKEN_OVERLAP * min(self._products[product_id][2], len(message_words))
+        ]
+        candidates.sort(reverse=True)
+        return [product_id for _, product_id in candidates[:self.MAX_FUZZY_CANDIDATES]]
+
+    def __len__(self):
+        return len(self._products)
@@ -373,48 +373,63 @@
 
 
 from typing import Dict, Any, List, Optional
-from django.db.models import Q
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.db.models import Q, OuterRef, Subquery
 from requests import session
 from core.models import Product, CartOrder, CartOrderProducts, Category
 from chatbot.models import ChatSession, ChatMessage
 from chatbot.v2.serializers import ProductSerializer, OrderSerializer
 from chatbot.services.nlp_service import NLPService
-from chatbot.services.llm_service import LLMService
+from chatbot.services.llm_service import LLMService, defer_llm_calls
+from chatbot.services.conversation_context import ConversationWindow
+from chatbot.utils import log_chat_analytics
+from chatbot.services.metrics import REQUEST_SECONDS, request_trace, span
+from chatbot.services.registry import get_transcript_queue, get_vector_store
+from chatbot.services.static_responses import category_suggestions, static_response
+from chatbot.services.order_lookup import resolve_order
+from core.search import search_product_ids, ranked_products
 
 class ChatService:
     """Main chat service that orchestrates NLP and response generation"""
 
-    def __init__(self):
-        self.nlp_service = NLPService()
-        self.llm_service = LLMService()
+    def __init__(self, nlp_service: Optional[NLPService] = None, llm_service: Optional[LLMService] = None,
+                 conversation: Optional[ConversationWindow] = None):
+        self.nlp_service = nlp_service or NLPService()
+        self.llm_service = llm_service or LLMService()
+        self.conversation = conversation or ConversationWindow()
 
     def process_message(self, message: str, session_id: Optional[str] = None, user_id: Optional[int] = None) -> Dict[str, Any]:
         """Process incoming chat message and generate response"""
+        # Every stage is timed into the metrics histograms and the request's trace
+        # (read by ChatAPIView for the Server-Timing header)
+        with request_trace() as trace:
+            return self._process_message(message, session_id, user_id, trace)
 
-        session = self._get_or_create_session(session_id, user_id)
+    def _process_message(self, message, session_id, user_id, trace) -> Dict[str, Any]:
+        with span('session'):
+            session = self._get_or_create_session(session_id, user_id)
 
-        user_message = ChatMessage.objects.create(
-            session=session,
-            message_type='user',
-            content=message
-        )
-
-        entities = self.nlp_service.extract_entities(message)
-        intent = self.nlp_service.classify_intent(message, entities)
-
-        user_message.metadata = {
-            'entities': entities,
-            'intent': intent
-        }
-        user_message.save()
+        with span('entities'):
+            entities = self.nlp_service.extract_entities(message)
+        with span('intent'):
+            intent = self.nlp_service.classify_intent(message, entities)
 
-        response_data = self._generate_response(message, intent, entities, session)
+        with span('handler'):
+            response_data = self._generate_response(message, intent, entities, session)
 
-        last_bot_msg = session.messages.filter(message_type='bot').last()
-        if last_bot_msg and last_bot_msg.content == response_data['message']:
-            response_data['message'] = "Let me know how else I can assist you."
+        response_data['message'] = self._avoid_repeat(session, response_data['message'])
 
-        bot_message = ChatMessage.objects.create(
+        user_message = ChatMessage(
+            session=session,
+            message_type='user',
+            content=message,
+            metadata={'entities': entities, 'intent': intent}
+        )
+        bot_message = ChatMessage(
             session=session,
             message_type='bot',
             content=response_data['message'],
@@ -424,6 +439,11 @@ class ChatService:
                 'data': response_data.get('data', {})
             }
         )
+        with span('persist'):
+            self._save_turn(session, [user_message, bot_message])
+
+        REQUEST_SECONDS.observe(trace.total_ms() / 1000, intent)
+        query_id = self._record_analytics(session, message, intent, entities, response_data, trace.timings())
 
         return {
             'message': response_data['message'],
@@ -433,22 +453,287 @@ class ChatService:
             'suggestions': response_data.get('suggestions', []),
             'metadata': {
                 'entities': entities,
-                'message_id': bot_message.id
+                'message_id': bot_message.id,
+                'query_id': query_id
             }
         }
 
+    def prepare_stream(self, message: str, session_id: Optional[str] = None, user_id: Optional[int] = None) -> Dict[str, Any]:
+        """Run everything up to the LLM call for a streamed reply.
+
+        The handler's LLM call (if any) is recorded rather than executed, so the
+        caller can stream it token by token and then call `finish_stream`.
+        """
+        started = time.perf_counter()
+        with span('session'):
+            session = self._get_or_create_session(session_id, user_id)
+        with span('entities'):
+            entities = self.nlp_service.extract_entities(message)
+        with span('intent'):
+            intent = self.nlp_service.classify_intent(message, entities)
+
+        with span('handler'), defer_llm_calls() as llm_calls:
+            response_data = self._generate_response(message, intent, entities, session)
+        if not llm_calls:
+            # The handler's reply is final and streamed as is
+            response_data['message'] = self._avoid_repeat(session, response_data['message'])
+
+        return {
+            'session': session,
+            'message': message,
+            'intent': intent,
+            'entities': entities,
+            'response': response_data,
+            'llm_call': llm_calls[0] if llm_calls else None,
+            'started': started,
+        }
+
+    def stream_meta(self, turn: Dict[str, Any]) -> Dict[str, Any]:
+        """Everything the client can render before the reply text arrives"""
+        return {
+            'session_id': turn['session'].session_id,
+            'intent': turn['intent'],
+            'data': turn['response'].get('data'),
+            'suggestions': turn['response'].get('suggestions', []),
+            'metadata': {'entities': turn['entities']},
+        }
+
+    def finish_stream(self, turn: Dict[str, Any], reply: str) -> Dict[str, Any]:
+        """Persist a streamed turn once the full reply is known"""
+        session = turn['session']
+        # Same rule as process_message; the `done` event carries the reply actually stored
+        reply = self._avoid_repeat(session, reply or turn['response']['message'])
+
+        user_message = ChatMessage(
+            session=session,
+            message_type='user',
+            content=turn['message'],
+            metadata={'entities': turn['entities'], 'intent': turn['intent']}
+        )
+        bot_message = ChatMessage(
+            session=session,
+            message_type='bot',
+            content=reply,
+            metadata={
+                'intent': turn['intent'],
+                'entities': turn['entities'],
+                'data': turn['response'].get('data', {})
+            }
+        )
+        self._save_turn(session, [user_message, bot_message])
+
+        total = time.perf_counter() - turn['started'] if 'started' in turn else None
+        if total is not None:
+            REQUEST_SECONDS.observe(total, turn['intent'])
+        query_id = self._record_analytics(
+            session, turn['message'], turn['intent'], turn['entities'], turn['response'],
+            {'total': round(total * 1000, 2)} if total is not None else None
+        )
+
+        return {
+            'message': reply,
+            'session_id': session.session_id,
+            'message_id': bot_message.id,
+            'query_id': query_id,
+        }
+
+    def process_messages(self, messages: List[Dict[str, Any]], batch_size: Optional[int] = None, n_process: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Process a batch of chat messages (dicts with `message` and optional `session_id`/`user_id`).
+
+        Entities are extracted in one `nlp.pipe` pass, sessions are loaded with a
+        single query and the whole transcript is written with one bulk insert.
+        """
+        if not messages:
+            return []
+
+        # Write queued turns first so they can't overwrite this batch's session metadata later
+        transcript_queue = get_transcript_queue()
+        if transcript_queue is not None:
+            transcript_queue.flush()
+
+        with span('session'):
+            sessions = self._get_or_create_sessions(messages)
+        with span('entities'):
+            all_entities = self.nlp_service.extract_entities_batch(
+                [item['message'] for item in messages], batch_size=batch_size, n_process=n_process
+            )
+        with span('intent'):
+            all_intents = self.nlp_service.classify_intent_batch([item['message'] for item in messages], all_entities)
+
+        turns = []
+        transcript = []
+        for item, session, entities, intent in zip(messages, sessions, all_entities, all_intents):
+            message = item['message']
+            with span('handler') as handler:
+                response_data = self._generate_response(message, intent, entities, session)
+            handler_ms = handler.elapsed_ms
+
+            response_data['message'] = self._avoid_repeat(session, response_data['message'])
+            session.metadata['last_bot_message'] = response_data['message']
+            self.conversation.append(session, message, response_data['message'], intent, save=False)
+
+            bot_message = ChatMessage(
+                session=session,
+                message_type='bot',
+                content=response_data['message'],
+                metadata={
+                    'intent': intent,
+                    'entities': entities,
+                    'data': response_data.get('data', {})
+                }
+            )
+            transcript.append(ChatMessage(
+                session=session,
+                message_type='user',
+                content=message,
+                metadata={'entities': entities, 'intent': intent}
+            ))
+            transcript.append(bot_message)
+            turns.append((session, intent, entities, response_data, bot_message, message, handler_ms))
+
+        # Handlers may have changed session metadata (e.g. product search paging)
+        now = timezone.now()
+        changed_sessions = list({id(session): session for session in sessions}.values())
+        for session in changed_sessions:
+            session.updated_at = now
+
+        with span('persist'), transaction.atomic():
+            ChatSession.objects.bulk_update(changed_sessions, ['metadata', 'updated_at'])
+            ChatMessage.objects.bulk_create(transcript)
+        self.conversation.save_many(changed_sessions)
+
+        return [
+            {
+                'message': response_data['message'],
+                'session_id': session.session_id,
+                'intent': intent,
+                'data': response_data.get('data'),
+                'suggestions': response_data.get('suggestions', []),
+                'metadata': {
+                    'entities': entities,
+                    'message_id': bot_message.id,
+                    'query_id': self._record_analytics(session, message, intent, entities, response_data, {'handler': handler_ms})
+                }
+            }
+            for session, intent, entities, response_data, bot_message, message, handler_ms in turns
+        ]
+
+    def _get_or_create_sessions(self, messages: List[Dict[str, Any]]) -> List[ChatSession]:
+        """Resolve the session of every message in one query, creating missing ones in bulk"""
+        requested = {item.get('session_id') for item in messages if item.get('session_id')}
+        last_bot_content = ChatMessage.objects.filter(
+            session=OuterRef('pk'), message_type='bot'
+        ).order_by('-timestamp').values('content')[:1]
+
+        found = {
+            session.session_id: session
+            for session in ChatSession.objects.filter(
+                session_id__in=requested, is_active=True
+            ).select_related('user').annotate(last_bot_content=Subquery(last_bot_content))
+        }
+
+        sessions = []
+        new_sessions = []
+        for item in messages:
+            session = found.get(item.get('session_id'))
+            if session is None:
+                session = ChatSession(user_id=item.get('user_id') or None)
+                session.last_bot_content = None
+                session._conversation_window = ConversationWindow.empty()
+                new_sessions.append(session)
+                if item.get('session_id'):
+                    # Later messages in the batch for the same unknown id share the new session
+                    found[item['session_id']] = session
+            if not isinstance(session.metadata, dict):
+                session.metadata = {}
+            sessions.append(session)
+
+        if new_sessions:
+            ChatSession.objects.bulk_create(new_sessions)
+
+        return sessions
+
     def _get_or_create_session(self, session_id: Optional[str], user_id: Optional[int]) -> ChatSession:
+        """Load the session, or build a new one that `_save_turn` inserts with the turn"""
         if session_id:
             try:
-                return ChatSession.objects.get(session_id=session_id, is_active=True)
+                session = ChatSession.objects.select_related('user').get(session_id=session_id, is_active=True)
+                if not isinstance(session.metadata, dict):
+                    session.metadata = {}
+                transcript_queue = get_transcript_queue()
+                if transcript_queue is not None:
+                    transcript_queue.apply_pending(session)
+                return session
             except ChatSession.DoesNotExist:
                 pass
-        return ChatSession.objects.create(user_id=user_id if user_id else None)
+        return ChatSession(user_id=user_id if user_id else None)
+
+    def _avoid_repeat(self, session: ChatSession, reply: str) -> str:
+        """`reply`, unless it would repeat the session's previous bot message word for word"""
+        if self._last_bot_content(session) == reply:
+            return "Let me know how else I can assist you."
+        return reply
+
+    def _last_bot_content(self, session: ChatSession) -> Optional[str]:
+        """Previous bot reply of the session, cached in its metadata by `_save_turn`"""
+        if 'last_bot_message' in session.metadata:
+            return session.metadata['last_bot_message']
+        if hasattr(session, 'last_bot_content'):
+            # Annotated by _get_or_create_sessions
+            return session.last_bot_content
+        if session.pk is None:
+            return None
+        # Session started before replies were cached in metadata
+        return session.messages.filter(message_type='bot').values_list('content', flat=True).last()
+
+    def _save_turn(self, session: ChatSession, transcript: List[ChatMessage]):
+        """Write a turn in one transaction: the session row plus one bulk insert of its messages"""
+        session.metadata['last_bot_message'] = transcript[-1].content
+        # Read before a new session is saved, while the window is known to be empty
+        self.conversation.load(session)
+
+        transcript_queue = get_transcript_queue()
+        if transcript_queue is not None and session.pk is not None:
+            # Write-behind: the flush thread inserts the turn in a later batch
+            transcript_queue.enqueue(session, transcript)
+        else:
+            with transaction.atomic():
+                if session.pk is None:
+                    session.save()
+                else:
+                    ChatSession.objects.filter(pk=session.pk).update(
+                        metadata=session.metadata,
+                        updated_at=timezone.now()
+                    )
+                ChatMessage.objects.bulk_create(transcript)
+
+        user_message, bot_message = transcript[0], transcript[-1]
+        self.conversation.append(session, user_message.content, bot_message.content, bot_message.metadata.get('intent'))
+
+    def _record_analytics(self, session: ChatSession, message: str, intent: str, entities: Dict[str, Any],
+                          response_data: Dict[str, Any], timings: Optional[Dict[str, float]] = None) -> Optional[str]:
+        """Buffer the turn for analytics; returns the query id the client reports product clicks against"""
+        data = response_data.get('data') or {}
+        results_count = response_data.get('results_count', len(data.get('products') or data.get('stock_info') or []))
+        return log_chat_analytics(
+            session.session_id, intent, entities,
+            query_text=message, results_count=results_count, timings=timings
+        )
+
+    def _with_history(self, session: ChatSession, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Add the session's conversation window to an LLM context.
+
+        Such turns bypass the LLM response cache and request coalescing (see ResponseCache).
+        """
+        history = self.conversation.prompt_history(session)
+        if history:
+            context['history'] = history
+        return context
 
     def _generate_response(self, message: str, intent: str, entities: Dict[str, Any], session: ChatSession) -> Dict[str, Any]:
         try:
             if message.strip().lower() == "show more products":
-                return self._search_products_by_entities(message, {}, session)
+                return self._handle_product_search(message, entities, session)
 
             if intent == 'product_search':
                 return self._handle_product_search(message, entities, session)
@@ -559,9 +844,6 @@ class ChatService:
     #         }
     
     def _handle_product_search(self, message, entities, session):
-        from core.models import Product
-        from django.db.models import Q
-
         limit = 4
         is_show_more = message.strip().lower() == "show more products"
 
@@ -577,51 +859,37 @@ class ChatService:
             session.metadata["product_search_terms"] = (
                 products + colors + categories + brands
             ) or message.split()
-            session.metadata["shown_product_count"] = 0
-
-        search_terms = session.metadata.get("product_search_terms", [])
-        shown = session.metadata.get("shown_product_count", 0)
+            session.metadata.pop("product_cursor", None)
 
-        query = Q(product_status="published", status=True)
+        with span('search'):
+            product_ids, cursor = self._product_result_page(session, limit)
+            shown = cursor["offset"]
+            products = list(ranked_products(product_ids).filter(product_status="published", status=True))
 
-        if entities.get('products'):  # Try exact product title first
-            for product_title in entities['products']:
-                query &= Q(title__iexact=product_title)
-        else:
-            for term in search_terms:
-                query &= (
-                    Q(title__icontains=term) |
-                    Q(description__icontains=term) |
-                    Q(tags__name__icontains=term) |
-                    Q(category__title__icontains=term)
-                )
-
-        all_products = Product.objects.filter(query).distinct()
+        if products:
+            with span('serialize'):
+                serialized = ProductSerializer(products, many=True).data
 
-        total_products = all_products.count()
-        products = all_products[shown:shown + limit]
-
-        if products.exists():
-            serialized = ProductSerializer(products, many=True).data
-
-            session.metadata["shown_product_count"] = shown + len(products)
-            session.save()
+            # Persisted with the rest of the turn by _save_turn
+            cursor["offset"] = shown + len(product_ids)
+            session.metadata["product_cursor"] = cursor
 
             response_text = (
-                f"🛍️ I found {total_products} product(s). Here are some:"
+                f"🛍️ I found {cursor['total']} product(s). Here are some:"
                 if shown == 0 else
                 "🧾 Here are more products you might like:"
             )
 
             suggestions = (
-                ["Show more products"] if session.metadata["shown_product_count"] < total_products
+                ["Show more products"] if cursor["offset"] < cursor["cached"]
                 else ["🗂️ Browse categories", "More Products", "📞 Get help"]
             )
 
             return {
                 "message": response_text,
                 "data": {"products": serialized},
-                "suggestions": suggestions
+                "suggestions": suggestions,
+                "results_count": cursor["total"]
             }
 
         return {
@@ -633,6 +901,38 @@ class ChatService:
 
 
 
+    def _product_result_page(self, session: ChatSession, limit: int):
+        """Next page of product ids for the session's search, plus its cursor.
+
+        The ranked ids of a search are cached for CHATBOT_PRODUCT_CURSOR_SECONDS, so
+        "show more products" is a slice of that list and a primary-key lookup
+        instead of a new search and count. Once the cursor expires the search is
+        run again from the stored terms and continues at the same offset.
+        """
+        cursor = session.metadata.get("product_cursor") or {"offset": 0}
+        cache_key = f"chatbot:product_results:{session.session_id}"
+
+        product_ids = None
+        if cursor.get("expires_at", 0) > time.time():
+            product_ids = cache.get(cache_key)
+
+        if product_ids is None:
+            timeout = getattr(settings, 'CHATBOT_PRODUCT_CURSOR_SECONDS', 15 * 60)
+            max_results = getattr(settings, 'CHATBOT_PRODUCT_CURSOR_MAX_RESULTS', 200)
+
+            # Ranked by relevance, so an exact product title comes first
+            all_ids = search_product_ids(" ".join(session.metadata.get("product_search_terms", [])))
+            product_ids = all_ids[:max_results]
+            cache.set(cache_key, product_ids, timeout)
+            cursor.update({
+                "total": len(all_ids),
+                "cached": len(product_ids),
+                "expires_at": time.time() + timeout,
+            })
+
+        offset = cursor["offset"]
+        return product_ids[offset:offset + limit], cursor
+
     def _handle_order_inquiry(self, message: str, entities: Dict[str, Any], session: ChatSession) -> Dict[str, Any]:
         order_ids = entities.get('order_ids', [])
 
@@ -646,24 +946,15 @@ class ChatService:
                 ]
             }
 
-        order = None
-        for order_id in order_ids:
-            clean_id = order_id.replace('#', '').replace('ORDER', '').replace('ORD', '').replace('BUY', '')
-            order = CartOrder.objects.filter(
-                Q(oid__icontains=clean_id) |
-                Q(tracking_id__icontains=clean_id) |
-                Q(sku__icontains=clean_id)
-            ).first()
-            if order:
-                break
+        order = resolve_order(order_ids)
 
         if order:
             serialized_order = OrderSerializer(order).data
-            context = {
+            context = self._with_history(session, {
                 'intent': 'order_inquiry',
                 'entities': entities,
                 'order': serialized_order
-            }
+            })
             llm_response = self.llm_service.generate_response(message, context)
             return {
                 'message': llm_response if llm_response else f"Here's the information for your order:",
@@ -738,22 +1029,12 @@ class ChatService:
 
     def _handle_category_browse(self, message, entities, session):
         try:
-            from core.models import Category
-            categories = Category.objects.all()
+            suggestions = category_suggestions()
 
-            if not categories.exists():
-                return {
-                    "message": "❗ No categories available at the moment.",
-                    "suggestions": ["Search products", "Help"]
-                }
+            if not suggestions:
+                return static_response('no_categories')
 
-            # Use set to prevent duplicates
-            suggestions = list(set([f"Show {cat.title.strip()}" for cat in categories]))[:6]
-
-            return {
-                "message": "🗂️ Here are our available product categories:",
-                "suggestions": suggestions
-            }
+            return dict(static_response('category_browse'), suggestions=suggestions)
 
         except Exception as e:
             print("[Chatbot] Category browse error:", e)
@@ -769,34 +1050,19 @@ class ChatService:
         # Try to get user's name from session.user if it exists
         user_name = session.user.first_name if session.user and hasattr(session.user, 'first_name') and session.user.first_name else "there"
 
-        return {
-            'message': (
-                f"👋 Hi {user_name}! I'm your shopping assistant. <br>"
-                "🤖 Here’s how I can help you today: <br><br>"
-                
-                "📞 <b>You can reach our support team anytime:</b> <br>"
-                '📧 Email: <a href="mailto:support@example.com" style="color:#3366cc; text-decoration:underline;">support@example.com</a><br>'
-                '💬 WhatsApp: <a href="https://wa.me/923001234567" target="_blank" style="color:#3366cc;">+92 300 1234567</a><br>'
-                '🌐 Help Center: <a href="/contact/" target="_blank" style="color:#3366cc;">Visit here</a><br>'
-
-                "🕒 Hours: Mon–Fri, 9am–6pm (PKT) <br><br>"
-                
-                "❓ You can also ask general shopping questions or try options below: <br>"
-            ),
-            'suggestions': [
-                "🔍 Find products",
-                "📦 Track my order",
-                "🗂️ Browse categories",
-                "💸 Check deals",
-            ]
-        }
+        return static_response('help_request', user_name=user_name)
 
 
     def _handle_general_inquiry(self, message: str, entities: Dict[str, Any], session: ChatSession) -> Dict[str, Any]:
-        context = {
+        context = self._with_history(session, {
             'intent': 'general_inquiry',
             'entities': entities
-        }
+        })
+
+        # Ground the answer in the catalog: descriptions of the closest products
+        snippets = self._product_snippets(message)
+        if snippets:
+            context['snippets'] = snippets
 
         llm_response = self.llm_service.generate_response(message, context)
 
@@ -835,7 +1101,6 @@ class ChatService:
         }
 
     def _search_products_by_entities(self, entities: Dict[str, Any], fallback_text: str = "") -> Any:
-        query = Q(product_status='published', status=True)
         search_terms = []
 
         if entities.get('colors'):
@@ -848,15 +1113,24 @@ class ChatService:
         if not search_terms and fallback_text:
             search_terms = fallback_text.split()
 
-        for term in search_terms:
-            query &= (
-                Q(title__icontains=term) |
-                Q(description__icontains=term) |
-                Q(tags__name__icontains=term) |
-                Q(category__title__icontains=term)
-            )
+        # Most relevant first; callers only ever show the top few
+        with span('search'):
+            return ranked_products(search_product_ids(" ".join(search_terms), limit=50))
 
-        return Product.objects.filter(query).distinct()
+    def _product_snippets(self, message: str) -> List[Dict[str, Any]]:
+        store = get_vector_store()
+        if not store.available:
+            return []
+        try:
+            with span('retrieval'):
+                return store.snippets(
+                    message,
+                    k=getattr(settings, 'CHATBOT_RAG_TOP_K', 3),
+                    min_score=getattr(settings, 'CHATBOT_RAG_MIN_SCORE', 0.2),
+                )
+        except Exception as e:
+            print("[Chatbot] Product retrieval error:", e)
+            return []
 
     def _handle_popular_items(self, message: str, entities: Dict[str, Any], session: ChatSession) -> Dict[str, Any]:
         """Handle requests for popular or best-selling items"""
@@ -868,11 +1142,11 @@ class ChatService:
 
         if popular_products.exists():
             serialized = ProductSerializer(popular_products, many=True).data
-            context = {
+            context = self._with_history(session, {
                 'intent': 'popular_items',
                 'entities': entities,
                 'products': serialized
-            }
+            })
             llm_response = self.llm_service.generate_response(message, context)
 
             return {
@@ -898,22 +1172,5 @@ class ChatService:
     
     def _handle_return_policy(self, message: str, entities: Dict[str, Any], session: ChatSession) -> Dict[str, Any]:
         """Provide return policy information"""
-        return {
-            'message': (
-                "🔁 Our Return Policy: <br>"
-                "• You can return items within **7 days** of delivery. <br>"
-                "• Items must be unused, in original packaging. <br>"
-                "• To initiate a return, go to your order history and click 'Request Return'. <br>"
-                "• For more details, please visit our [Return Policy page](https://yourwebsite.com/returns). <br>"
-                "Would you like help returning a product or tracking an order?"
-            ),
-            'suggestions': [
-                "Return a product",
-                "Track my order",
-                "Contact support",
-                "Go to homepage",
-                "📞 Get help"
-            ],
-            'data': {}
-        }
+        return static_response('return_policy')
 
@@ -0,0 +1,143 @@
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.html import strip_tags
+
+KEY_PREFIX = 'chatbot:context'
+
+# A session whose window was evicted from the cache is re-seeded from this many of its latest messages
+SEED_MESSAGES = 20
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English), good enough for budgeting"""
+    return max(1, len(text) // 4) if text else 0
+
+
+def clip(text: str, max_tokens: int) -> str:
+    """Plain-text version of a message cut to about `max_tokens` tokens"""
+    text = WHITESPACE_RE.sub(' ', strip_tags(text or '')).strip()
+    limit = max_tokens * 4
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(' ', 1)[0] + '…'
+
+
+class ConversationWindow:
+    """Rolling prompt context of each chat session, kept in the cache instead of re-read from ChatMessage.
+
+    A window holds the latest turns verbatim plus a summary of older ones. When
+    the turns exceed the token budget the oldest turn is folded into the summary
+    as a one-line note under its intent; the summary keeps only its newest notes
+    within its own budget. Folding is plain string work, so no LLM call is spent on it
+    and the prompt stays bounded however long the conversation runs.
+    """
+
+    def __init__(self, token_budget: int = None, summary_budget: int = None, turn_tokens: int = None, timeout: int = None):
+        self.token_budget = token_budget or getattr(settings, 'CHATBOT_CONTEXT_TOKEN_BUDGET', 600)
+        self.summary_budget = summary_budget or getattr(settings, 'CHATBOT_CONTEXT_SUMMARY_TOKENS', 150)
+        self.turn_tokens = turn_tokens or getattr(settings, 'CHATBOT_CONTEXT_TURN_TOKENS', 120)
+        self.timeout = timeout or getattr(settings, 'CHATBOT_CONTEXT_SECONDS', 24 * 60 * 60)
+
+    @staticmethod
+    def key(session_id: str) -> str:
+        return f"{KEY_PREFIX}:{session_id}"
+
+    @staticmethod
+    def empty() -> Dict[str, Any]:
+        return {'summary': [], 'turns': []}
+
+    # ----------------- Reading -----------------
+    def load(self, session) -> Dict[str, Any]:
+        """The session's window; loaded once per request and kept on the session object"""
+        window = getattr(session, '_conversation_window', None)
+        if window is not None:
+            return window
+
+        if session.pk is None:
+            window = self.empty()
+        else:
+            window = cache.get(self.key(session.session_id))
+            if window is None:
+                window = self._seed(session)
+        session._conversation_window = window
+        return window
+
+    def _seed(self, session) -> Dict[str, Any]:
+        """Rebuild an evicted window from the session's latest messages"""
+        rows = list(
+            session.messages.filter(message_type__in=['user', 'bot'])
+            .order_by('-timestamp', '-id')
+            .values_list('message_type', 'content', 'metadata')[:SEED_MESSAGES]
+        )
+        window = self.empty()
+        pending_user = None
+        for message_type, content, metadata in reversed(rows):
+            if message_type == 'user':
+                pending_user = (content, (metadata or {}).get('intent'))
+            elif pending_user is not None:
+                self._append(window, pending_user[0], content, pending_user[1])
+                pending_user = None
+        return window
+
+    def prompt_history(self, session) -> Optional[Dict[str, Any]]:
+        """What the LLM prompt gets: summary notes and recent turns (None for a new conversation)"""
+        window = self.load(session)
+        if not window['summary'] and not window['turns']:
+            return None
+        return {
+            'summary': [f"{intent}: {'; '.join(notes)}" for intent, notes in window['summary']],
+            'turns': [{'user': user, 'bot': bot} for user, bot, _ in window['turns']],
+        }
+
+    # ----------------- Updating -----------------
+    def append(self, session, user_text: str, bot_text: str, intent: Optional[str] = None, save: bool = True):
+        window = self.load(session)
+        self._append(window, user_text, bot_text, intent)
+        if save:
+            cache.set(self.key(session.session_id), window, self.timeout)
+
+    def save_many(self, sessions: Iterable[Any]):
+        windows = {
+            self.key(session.session_id): session._conversation_window
+            for session in sessions if getattr(session, '_conversation_window', None) is not None
+        }
+        if windows:
+            cache.set_many(windows, self.timeout)
+
+    def _append(self, window: Dict[str, Any], user_text: str, bot_text: str, intent: Optional[str]):
+        window['turns'].append([clip(user_text, self.turn_tokens), clip(bot_text, self.turn_tokens), intent or 'general_inquiry'])
+
+        # Keep at least the latest turn verbatim
+        while len(window['turns']) > 1 and self._turn_tokens(window['turns']) > self.token_budget:
+            self._fold(window, window['turns'].pop(0))
+
+    def _fold(self, window: Dict[str, Any], turn: List[str]):
+        user_text, _, intent = turn
+        note = clip(user_text, 12)
+        summary = window['summary']
+        if summary and summary[-1][0] == intent:
+            summary[-1][1].append(note)
+        else:
+            summary.append([intent, [note]])
+
+        while self._summary_tokens(summary) > self.summary_budget:
+            oldest = summary[0]
+            if len(oldest[1]) > 1:
+                oldest[1].pop(0)
+            elif len(summary) > 1:
+                summary.pop(0)
+            else:
+                break
+
+    @staticmethod
+    def _turn_tokens(turns: List[List[str]]) -> int:
+        return sum(estimate_tokens(user) + estimate_tokens(bot) for user, bot, _ in turns)
+
+    @staticmethod
+    def _summary_tokens(summary: List[List[Any]]) -> int:
+        return sum(estimate_tokens(intent) + sum(estimate_tokens(note) for note in notes) for intent, notes in summary)
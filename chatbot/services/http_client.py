@@ -0,0 +1,187 @@
+import asyncio
+import threading
+import time
+import weakref
+from contextlib import contextmanager, asynccontextmanager
+from typing import Any, Callable, Dict, Iterator, AsyncIterator
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the LLM server while the breaker is open"""
+
+
+class CircuitBreaker:
+    """Stops calling a failing server after `failure_threshold` consecutive errors.
+
+    While open every call short-circuits straight away; a background thread
+    probes the server every `reset_timeout` seconds and closes the breaker as
+    soon as a probe succeeds, so no user request has to pay for the check.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, probe: Callable[[], bool]):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._probe = probe
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._open = False
+
+    @property
+    def state(self) -> str:
+        return 'open' if self._open else 'closed'
+
+    def allow(self) -> bool:
+        return not self._open
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._open = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._open or self._failures < self.failure_threshold:
+                return
+            self._open = True
+
+        print(f"[LLM] Circuit opened after {self._failures} consecutive failures")
+        threading.Thread(target=self._probe_until_healthy, name='llm-breaker-probe', daemon=True).start()
+
+    def _probe_until_healthy(self):
+        while self._open:
+            time.sleep(self.reset_timeout)
+            try:
+                healthy = self._probe()
+            except Exception:
+                healthy = False
+            if healthy:
+                print("[LLM] Probe succeeded, closing circuit")
+                self.record_success()
+
+
+class LLMHttpClient:
+    """Keep-alive HTTP client for an OpenAI-compatible server, guarded by a circuit breaker.
+
+    The blocking `requests.Session` is shared by all threads of the process;
+    `httpx.AsyncClient`s are bound to an event loop, so one is kept per loop
+    and closed when that loop shuts down.
+    """
+
+    def __init__(self, base_url: str, connect_timeout: float = 2, read_timeout: float = 10,
+                 pool_size: int = 10, failure_threshold: int = 3, reset_timeout: float = 15):
+        self.base_url = base_url.rstrip('/')
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_size = pool_size
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._async_clients = weakref.WeakKeyDictionary()
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout, probe=self.ping)
+
+    @property
+    def timeout(self):
+        return (self.connect_timeout, self.read_timeout)
+
+    def _url(self, path: str) -> str:
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"LLM server {self.base_url} is unavailable")
+
+    def _record(self, status_code: int):
+        # 5xx means the server itself is unhealthy; 4xx is our request's fault
+        if status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def ping(self) -> bool:
+        """Cheap health check used by the breaker's background probe"""
+        response = self.session.get(self._url('models'), timeout=(self.connect_timeout, self.connect_timeout))
+        return response.status_code < 500
+
+    # ----------------- Blocking -----------------
+    def post_json(self, path: str, payload: Dict[str, Any]) -> requests.Response:
+        self._check_breaker()
+        try:
+            response = self.session.post(self._url(path), json=payload, timeout=self.timeout)
+        except requests.RequestException:
+            self.breaker.record_failure()
+            raise
+        self._record(response.status_code)
+        return response
+
+    @contextmanager
+    def stream_lines(self, path: str, payload: Dict[str, Any]) -> Iterator[Iterator[str]]:
+        """POST and yield an iterator over the response's lines (empty on HTTP errors)"""
+        self._check_breaker()
+        try:
+            response = self.session.post(self._url(path), json=payload, stream=True, timeout=self.timeout)
+        except requests.RequestException:
+            self.breaker.record_failure()
+            raise
+
+        with response:
+            self._record(response.status_code)
+            if response.status_code != 200:
+                yield iter(())
+                return
+            try:
+                yield response.iter_lines(decode_unicode=True)
+            except requests.RequestException:
+                self.breaker.record_failure()
+                raise
+
+    # ----------------- Async -----------------
+    async def _async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        entry = self._async_clients.get(loop)
+        if entry is None:
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+            )
+            # The loop finalises its pending async generators when it shuts down
+            # (`asyncio.run`, uvicorn, asgiref), which closes the client's connections
+            lifetime = _client_lifetime(client)
+            await lifetime.__anext__()
+            entry = self._async_clients[loop] = (client, lifetime)
+        return entry[0]
+
+    @asynccontextmanager
+    async def astream_lines(self, path: str, payload: Dict[str, Any]) -> AsyncIterator[AsyncIterator[str]]:
+        """Async version of `stream_lines`"""
+        self._check_breaker()
+        try:
+            client = await self._async_client()
+            async with client.stream('POST', self._url(path), json=payload) as response:
+                self._record(response.status_code)
+                if response.status_code != 200:
+                    yield _empty_lines()
+                    return
+                yield response.aiter_lines()
+        except httpx.HTTPError:
+            self.breaker.record_failure()
+            raise
+
+
+async def _client_lifetime(client: httpx.AsyncClient):
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+async def _empty_lines():
+    return
+    yield
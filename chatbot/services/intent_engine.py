@@ -0,0 +1,277 @@
+import os
+import re
+import threading
+import time
+import zlib
+from collections import namedtuple
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from core.versioned_index import VersionedIndex
+
+IntentPrediction = namedtuple('IntentPrediction', ['intent', 'confidence', 'source'])
+
+DEFAULT_INTENT = 'general_inquiry'
+DEFAULT_THRESHOLD = 0.7
+
+# The original keyword cascade, highest priority first. Active ChatIntent rows
+# with the same name replace these keywords; other active rows are appended.
+BUILTIN_INTENTS = [
+    ('order_inquiry', ['order', 'track', 'delivery', 'shipped', 'status']),
+    ('product_search', ['search', 'find', 'show', 'looking for', 'want', 'need', 'buy', 'purchase', 'like', 'products']),
+    ('stock_inquiry', ['stock', 'available', 'in stock', 'inventory']),
+    ('price_inquiry', ['price', 'cost', 'how much', 'expensive', 'cheap']),
+    ('category_browse', ['category', 'browse', 'section', 'department', 'browse categories']),
+    ('help_request', ['help', 'support', 'assist', 'question']),
+    ('return_policy', ['return', 'refund', 'return policy', 'return item', 'how to return', 'return product']),
+]
+
+# Entities that imply an intent on their own (e.g. a message containing an order id)
+ENTITY_INTENTS = {'order_ids': 'order_inquiry', 'products': 'product_search'}
+
+# Cache key bumped when ChatIntent rows change so other worker processes reload
+INTENT_VERSION_KEY = 'chatbot:intents:version'
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+# ----------------- Linear classifier -----------------
+def hashed_features(text: str, dim: int) -> np.ndarray:
+    """Bucket ids of the word unigrams, word bigrams and character trigrams of `text`"""
+    words = TOKEN_RE.findall(text.lower())
+    features = [f"w:{word}" for word in words]
+    features += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"<{word}>"
+        features += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    return np.unique(np.fromiter((zlib.crc32(f.encode('utf-8')) % dim for f in features), dtype=np.int64))
+
+
+class HashedIntentClassifier:
+    """Multinomial logistic regression over hashed n-gram features.
+
+    A prediction is a gather of ~50 weight rows and a softmax, so one core
+    classifies tens of thousands of messages per second.
+    """
+
+    def __init__(self, labels: Sequence[str], weights: np.ndarray, bias: np.ndarray):
+        self.labels = list(labels)
+        self.weights = weights
+        self.bias = bias
+        self.dim = weights.shape[0]
+
+    def _scores(self, feature_rows: List[np.ndarray]) -> np.ndarray:
+        scores = np.tile(self.bias, (len(feature_rows), 1))
+        for row, features in enumerate(feature_rows):
+            if len(features):
+                scores[row] += self.weights[features].sum(axis=0) / np.sqrt(len(features))
+        return scores
+
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        scores = self._scores([hashed_features(text, self.dim) for text in texts])
+        scores -= scores.max(axis=1, keepdims=True)
+        probs = np.exp(scores)
+        return probs / probs.sum(axis=1, keepdims=True)
+
+    def predict(self, text: str):
+        probs = self.predict_proba([text])[0]
+        best = int(probs.argmax())
+        return self.labels[best], float(probs[best])
+
+    @classmethod
+    def fit(cls, texts: Sequence[str], labels: Sequence[str], dim: int = 2 ** 18, epochs: int = 10,
+            learning_rate: float = 0.5, batch_size: int = 64, seed: int = 0):
+        """Train with mini-batch SGD on the softmax cross-entropy"""
+        classes = sorted(set(labels))
+        class_index = {label: i for i, label in enumerate(classes)}
+        y = np.array([class_index[label] for label in labels])
+        feature_rows = [hashed_features(text, dim) for text in texts]
+
+        model = cls(classes, np.zeros((dim, len(classes)), dtype=np.float32), np.zeros(len(classes), dtype=np.float32))
+        rng = np.random.default_rng(seed)
+
+        for epoch in range(epochs):
+            lr = learning_rate / (1 + epoch)
+            order = rng.permutation(len(feature_rows))
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                rows = [feature_rows[i] for i in batch]
+
+                scores = model._scores(rows)
+                scores -= scores.max(axis=1, keepdims=True)
+                probs = np.exp(scores)
+                probs /= probs.sum(axis=1, keepdims=True)
+                probs[np.arange(len(batch)), y[batch]] -= 1  # gradient of the loss w.r.t. the scores
+
+                for row, features in enumerate(rows):
+                    if len(features):
+                        model.weights[features] -= (lr / np.sqrt(len(features))) * probs[row]
+                model.bias -= lr * probs.mean(axis=0)
+
+        return model
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(str(path)) or '.', exist_ok=True)
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, labels=np.array(self.labels), weights=self.weights, bias=self.bias)
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as data:
+            return cls([str(label) for label in data['labels']], data['weights'], data['bias'])
+
+
+# ----------------- Engine -----------------
+class IntentEngine(VersionedIndex):
+    """Intent classification: compiled keyword rules first, then the optional classifier.
+
+    All keywords of all intents are compiled into a single regex that reports
+    every keyword occurring in the message (substring matching, like the old
+    cascade), and the highest-priority intent hit wins. When no rule fires, the
+    trained classifier (if CHATBOT_INTENT_MODEL_PATH exists) may pick an intent,
+    but only with at least that intent's `confidence_threshold`.
+    """
+
+    version_key = INTENT_VERSION_KEY
+    refresh_setting = 'CHATBOT_INTENT_REFRESH_SECONDS'
+    name = 'IntentEngine'
+    # Loading the rules is a single small query
+    rebuild_in_background = False
+
+    def __init__(self, model_path: Optional[str] = None):
+        super().__init__()
+        self._lock = threading.Lock()
+        self.model_path = str(model_path) if model_path else None
+        self.model: Optional[HashedIntentClassifier] = None
+        self._model_mtime = None
+        self._priorities: Dict[str, int] = {}
+        self._thresholds: Dict[str, float] = {}
+        self._keyword_intents: Dict[str, frozenset] = {}
+        self._pattern = None
+
+    # ----------------- Loading -----------------
+    def reload(self):
+        self.reload_rules()
+        self.reload_model()
+
+    def rebuild(self):
+        self.reload_rules()
+
+    def reload_rules(self):
+        version = cache.get(INTENT_VERSION_KEY)
+        intents = [(name, list(keywords), DEFAULT_THRESHOLD) for name, keywords in BUILTIN_INTENTS]
+
+        try:
+            from chatbot.models import ChatIntent
+            rows = list(ChatIntent.objects.order_by('id'))
+        except Exception as e:
+            # e.g. before migrations have run
+            print("[IntentEngine] Could not load ChatIntent rows, using built-in rules:", e)
+            rows = []
+
+        for row in rows:
+            position = next((i for i, (name, _, _) in enumerate(intents) if name == row.name), None)
+            if not row.is_active:
+                if position is not None:
+                    del intents[position]
+                continue
+            keywords = [str(k).lower() for k in (row.keywords or []) if str(k).strip()]
+            if position is not None:
+                intents[position] = (row.name, keywords or intents[position][1], row.confidence_threshold)
+            else:
+                intents.append((row.name, keywords, row.confidence_threshold))
+
+        keyword_intents: Dict[str, set] = {}
+        for name, keywords, _ in intents:
+            for keyword in keywords:
+                keyword_intents.setdefault(keyword, set()).add(name)
+
+        # A lookahead at every position reports the longest keyword starting there;
+        # shorter keywords starting at the same position are its prefixes, so each
+        # keyword also carries the intents of its prefixes.
+        expanded = {
+            keyword: frozenset().union(*(keyword_intents[k] for k in keyword_intents if keyword.startswith(k)))
+            for keyword in keyword_intents
+        }
+        alternatives = '|'.join(re.escape(k) for k in sorted(expanded, key=len, reverse=True))
+
+        with self._lock:
+            self._priorities = {name: i for i, (name, _, _) in enumerate(intents)}
+            self._thresholds = {name: threshold for name, _, threshold in intents}
+            self._keyword_intents = expanded
+            self._pattern = re.compile(f"(?=({alternatives}))") if alternatives else None
+            self._version = version
+            self._checked_at = time.monotonic()
+
+    def reload_model(self):
+        if not self.model_path or not os.path.exists(self.model_path):
+            self.model, self._model_mtime = None, None
+            return
+        mtime = os.path.getmtime(self.model_path)
+        if mtime == self._model_mtime:
+            return
+        try:
+            self.model = HashedIntentClassifier.load(self.model_path)
+            self._model_mtime = mtime
+        except Exception as e:
+            print("[IntentEngine] Could not load intent model:", e)
+
+    def ensure_fresh(self) -> bool:
+        """Reload rules when ChatIntent changed (in any process) and the model when its file changed"""
+        if not super().ensure_fresh():
+            return False
+        self.reload_model()
+        return True
+
+    # ----------------- Classifying -----------------
+    def _rule_intent(self, text: str, entities: Dict[str, Any]) -> Optional[str]:
+        hits = set()
+        if self._pattern is not None:
+            for match in self._pattern.finditer(text.lower()):
+                hits |= self._keyword_intents[match.group(1)]
+        for entity, intent in ENTITY_INTENTS.items():
+            if entities.get(entity):
+                hits.add(intent)
+
+        hits = [intent for intent in hits if intent in self._priorities]
+        return min(hits, key=self._priorities.get) if hits else None
+
+    def _model_prediction(self, intent: str, confidence: float) -> IntentPrediction:
+        if intent != DEFAULT_INTENT and confidence >= self._thresholds.get(intent, DEFAULT_THRESHOLD):
+            return IntentPrediction(intent, confidence, 'model')
+        return IntentPrediction(DEFAULT_INTENT, 0.0, 'default')
+
+    def classify(self, text: str, entities: Optional[Dict[str, Any]] = None) -> IntentPrediction:
+        intent = self._rule_intent(text, entities or {})
+        if intent:
+            return IntentPrediction(intent, 1.0, 'rules')
+        if self.model is not None:
+            return self._model_prediction(*self.model.predict(text))
+        return IntentPrediction(DEFAULT_INTENT, 0.0, 'default')
+
+    def classify_batch(self, texts: Sequence[str], entities: Sequence[Dict[str, Any]]) -> List[IntentPrediction]:
+        """Classify many messages; the classifier scores all rule misses in one pass"""
+        results: List[Optional[IntentPrediction]] = []
+        misses = []
+        for i, (text, ents) in enumerate(zip(texts, entities)):
+            intent = self._rule_intent(text, ents or {})
+            results.append(IntentPrediction(intent, 1.0, 'rules') if intent else None)
+            if not intent:
+                misses.append(i)
+
+        if misses and self.model is not None:
+            probs = self.model.predict_proba([texts[i] for i in misses])
+            for i, row in zip(misses, probs):
+                best = int(row.argmax())
+                results[i] = self._model_prediction(self.model.labels[best], float(row[best]))
+
+        return [result or IntentPrediction(DEFAULT_INTENT, 0.0, 'default') for result in results]
+
+
+def create_intent_engine() -> IntentEngine:
+    engine = IntentEngine(model_path=getattr(settings, 'CHATBOT_INTENT_MODEL_PATH', None))
+    engine.reload()
+    return engine
@@ -114,37 +114,119 @@
 #         return responses.get(intent, responses['general_inquiry'])
 
 
+import json
 import openai
-import requests
-from typing import Dict, Any, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, Iterator, AsyncIterator, List, Tuple
+from asgiref.sync import sync_to_async
 from django.conf import settings
 
+from chatbot.services.http_client import LLMHttpClient, CircuitOpenError
+from chatbot.services.response_cache import ResponseCache
+from chatbot.services.metrics import span
+from chatbot.services.admission import AdmissionGate, SingleFlight, coalesce_key
+
+# Reply when every LLM slot is taken and the wait queue is full (see AdmissionGate)
+BUSY_MESSAGE = (
+    "⏳ I'm answering a lot of questions right now. Please try again in a moment. "
+    "Meanwhile you can search products, browse categories or track an order."
+)
+
+# When set (see `defer_llm_calls`), generate_response records its arguments here
+# instead of calling the model, so a streaming caller can stream that call itself.
+_deferred_calls: ContextVar[Optional[List[Tuple[str, Dict[str, Any]]]]] = ContextVar('chatbot_deferred_llm_calls', default=None)
+
+
+@contextmanager
+def defer_llm_calls():
+    """Collect the LLM calls made inside the block instead of running them"""
+    calls: List[Tuple[str, Dict[str, Any]]] = []
+    token = _deferred_calls.set(calls)
+    try:
+        yield calls
+    finally:
+        _deferred_calls.reset(token)
+
 
 class LLMService:
     """Handle Large Language Model integrations"""
 
     def __init__(self):
         self.openai_client = None
+        self.response_cache = ResponseCache()
+
+        # Identical questions in flight at the same time share one model call, and
+        # at most CHATBOT_LLM_MAX_CONCURRENCY calls run at once per process
+        self.inflight = SingleFlight()
+        self.admission = AdmissionGate(
+            max_concurrency=getattr(settings, 'CHATBOT_LLM_MAX_CONCURRENCY', 4),
+            max_queue=getattr(settings, 'CHATBOT_LLM_MAX_QUEUE', 16),
+            timeout=getattr(settings, 'CHATBOT_LLM_QUEUE_TIMEOUT', 5),
+        )
 
         # Set OpenAI key if available (optional)
         if hasattr(settings, 'OPENAI_API_KEY') and settings.OPENAI_API_KEY:
             openai.api_key = settings.OPENAI_API_KEY
             self.openai_client = openai
 
+        # One keep-alive connection pool per process instead of a new TCP connection per message
+        self.http = None
+        if getattr(settings, 'LM_STUDIO_BASE_URL', None):
+            self.http = LLMHttpClient(
+                settings.LM_STUDIO_BASE_URL,
+                connect_timeout=getattr(settings, 'CHATBOT_LLM_CONNECT_TIMEOUT', 2),
+                read_timeout=getattr(settings, 'CHATBOT_LLM_READ_TIMEOUT', 10),
+                pool_size=getattr(settings, 'CHATBOT_LLM_POOL_SIZE', 10),
+                failure_threshold=getattr(settings, 'CHATBOT_LLM_BREAKER_THRESHOLD', 3),
+                reset_timeout=getattr(settings, 'CHATBOT_LLM_BREAKER_RESET_SECONDS', 15),
+            )
+
     def generate_response(self, user_message: str, context: Dict[str, Any]) -> str:
         """Generate response using available LLM"""
 
-        # Priority 1: Use OpenAI if key is available
-        if self.openai_client:
-            return self._openai_response(user_message, context)
+        deferred = _deferred_calls.get()
+        if deferred is not None:
+            # Streaming turn: the caller streams this call itself, handlers use their fallback text
+            deferred.append((user_message, context))
+            return None
+
+        # Repeated questions with the same context skip the model entirely
+        cached = self.response_cache.get(user_message, context)
+        if cached is not None:
+            return cached
+
+        # Like the cache, coalescing only applies to turns without conversation history
+        if context.get('history'):
+            return self._generate_uncached(user_message, context)
+        return self.inflight.do(coalesce_key(user_message, context), lambda: self._generate_uncached(user_message, context))
+
+    def _generate_uncached(self, user_message: str, context: Dict[str, Any]) -> str:
+        use_openai = bool(self.openai_client)
+        # LM Studio (local server) is skipped while its circuit breaker is open
+        use_lm_studio = not use_openai and self.http and self.http.breaker.allow()
+        if not (use_openai or use_lm_studio):
+            # Priority 3: Fallback response
+            return self._fallback_response(user_message, context)
+
+        with self.admission.admit() as admitted:
+            if not admitted:
+                return BUSY_MESSAGE
+
+            # Priority 1: Use OpenAI if key is available
+            if use_openai:
+                with span('llm'):
+                    response = self._openai_response(user_message, context)
+                self.response_cache.set(user_message, context, response)
+                return response
 
-        # Priority 2: Use LM Studio (local server)
-        if hasattr(settings, 'LM_STUDIO_BASE_URL'):
-            response = self._lm_studio_response(user_message, context)
+            # Priority 2: Use LM Studio (local server)
+            with span('llm'):
+                response = self._lm_studio_response(user_message, context)
             if response:
+                self.response_cache.set(user_message, context, response)
                 return response
 
-        # Priority 3: Fallback response
         return self._fallback_response(user_message, context)
 
     def _openai_response(self, user_message: str, context: Dict[str, Any]) -> str:
@@ -154,10 +236,7 @@ class LLMService:
 
             response = self.openai_client.ChatCompletion.create(
                 model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_message}
-                ],
+                messages=self._chat_messages(system_prompt, user_message, context),
                 max_tokens=200,
                 temperature=0.7
             )
@@ -170,29 +249,138 @@ class LLMService:
     def _lm_studio_response(self, user_message: str, context: Dict[str, Any]) -> Optional[str]:
         """Generate response using LM Studio local API"""
         try:
-            system_prompt = self._build_system_prompt(context)
-
-            response = requests.post(
-                f"{settings.LM_STUDIO_BASE_URL}/chat/completions",  # e.g. http://127.0.0.1:1234/v1/chat/completions
-                json={
-                    "model": "local-model",  # Change this if you're using a custom model name in LM Studio
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_message}
-                    ],
-                    "max_tokens": 200,
-                    "temperature": 0.7
-                },
-                timeout=10
+            response = self.http.post_json(
+                'chat/completions',  # e.g. http://127.0.0.1:1234/v1/chat/completions
+                self._lm_studio_payload(user_message, context)
             )
 
             if response.status_code == 200:
                 return response.json()['choices'][0]['message']['content'].strip()
+        except CircuitOpenError:
+            pass
         except Exception as e:
             print(f"LM Studio API error: {e}")
 
         return None
 
+    def _lm_studio_payload(self, user_message: str, context: Dict[str, Any], stream: bool = False) -> Dict[str, Any]:
+        """OpenAI-compatible chat completion request body"""
+        return {
+            "model": "local-model",  # Change this if you're using a custom model name in LM Studio
+            "messages": self._chat_messages(self._build_system_prompt(context), user_message, context),
+            "max_tokens": 200,
+            "temperature": 0.7,
+            "stream": stream
+        }
+
+    @staticmethod
+    def _chat_messages(system_prompt: str, user_message: str, context: Dict[str, Any]) -> List[Dict[str, str]]:
+        """System prompt, the session's recent turns (see ConversationWindow), then the new message"""
+        history = context.get('history') or {}
+        if history.get('summary'):
+            system_prompt += "\nEarlier in this conversation the customer asked about:\n" + "\n".join(
+                f"- {note}" for note in history['summary']
+            )
+
+        messages = [{"role": "system", "content": system_prompt}]
+        for turn in history.get('turns', []):
+            messages.append({"role": "user", "content": turn['user']})
+            messages.append({"role": "assistant", "content": turn['bot']})
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+    # ----------------- Streaming -----------------
+    def stream_response(self, user_message: str, context: Dict[str, Any]) -> Iterator[str]:
+        """Yield the reply piece by piece as the model produces it (blocking client)"""
+        cached = self.response_cache.get(user_message, context)
+        if cached is not None:
+            yield cached
+            return
+
+        if not self.openai_client and not self.http:
+            return
+
+        with self.admission.admit() as admitted:
+            if not admitted:
+                yield BUSY_MESSAGE
+                return
+
+            if self.openai_client:
+                # No token stream available: hand back the whole reply as one piece
+                response = self._openai_response(user_message, context)
+                if response:
+                    self.response_cache.set(user_message, context, response)
+                    yield response
+                return
+
+            try:
+                tokens = []
+                with self.http.stream_lines('chat/completions', self._lm_studio_payload(user_message, context, stream=True)) as lines:
+                    for line in lines:
+                        done, token = self._parse_stream_line(line)
+                        if done:
+                            self.response_cache.set(user_message, context, ''.join(tokens).strip())
+                            break
+                        if token:
+                            tokens.append(token)
+                            yield token
+            except CircuitOpenError:
+                pass
+            except Exception as e:
+                print(f"LM Studio streaming error: {e}")
+
+    async def astream_response(self, user_message: str, context: Dict[str, Any]) -> AsyncIterator[str]:
+        """Async version of `stream_response`; doesn't hold a thread while the model generates"""
+        cached = await sync_to_async(self.response_cache.get)(user_message, context)
+        if cached is not None:
+            yield cached
+            return
+
+        if not self.openai_client and not self.http:
+            return
+
+        async with self.admission.aadmit() as admitted:
+            if not admitted:
+                yield BUSY_MESSAGE
+                return
+
+            if self.openai_client:
+                response = await sync_to_async(self._openai_response)(user_message, context)
+                if response:
+                    await sync_to_async(self.response_cache.set)(user_message, context, response)
+                    yield response
+                return
+
+            try:
+                tokens = []
+                async with self.http.astream_lines('chat/completions', self._lm_studio_payload(user_message, context, stream=True)) as lines:
+                    async for line in lines:
+                        done, token = self._parse_stream_line(line)
+                        if done:
+                            await sync_to_async(self.response_cache.set)(user_message, context, ''.join(tokens).strip())
+                            break
+                        if token:
+                            tokens.append(token)
+                            yield token
+            except CircuitOpenError:
+                pass
+            except Exception as e:
+                print(f"LM Studio streaming error: {e}")
+
+    @staticmethod
+    def _parse_stream_line(line: str) -> Tuple[bool, Optional[str]]:
+        """Parse one server-sent event line of an OpenAI-style stream into (done, token)"""
+        if not line or not line.startswith('data:'):
+            return False, None
+        data = line[len('data:'):].strip()
+        if data == '[DONE]':
+            return True, None
+        try:
+            choice = json.loads(data)['choices'][0]
+        except (ValueError, KeyError, IndexError):
+            return False, None
+        return False, (choice.get('delta') or {}).get('content')
+
     def _build_system_prompt(self, context: Dict[str, Any]) -> str:
         """Build system prompt based on context"""
         base_prompt = (
@@ -250,6 +438,11 @@ class LLMService:
         if context.get('order'):
             base_prompt += f"\nOrder Information: Order found with status {context['order'].get('status', 'unknown')}"
 
+        if context.get('snippets'):
+            base_prompt += "\nRelevant Products (base your answer on these when they fit the question):"
+            for snippet in context['snippets']:
+                base_prompt += f"\n- {snippet['title']} ({snippet['url']}): {snippet['text']}"
+
         return base_prompt
 
     def _fallback_response(self, user_message: str, context: Dict[str, Any]) -> str:
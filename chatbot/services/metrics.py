@@ -0,0 +1,137 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; covers regex-only turns (~1 ms) up to slow LLM replies
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus text format (per process, no external client)"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], List] = {}  # labels -> [bucket counts, sum, count]
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            position = bisect.bisect_left(self.buckets, value)
+            if position < len(self.buckets):
+                series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for labels, (counts, total, count) in series:
+            label_text = ','.join(f'{name}="{value}"' for name, value in zip(self.labelnames, labels))
+            prefix = label_text + ',' if label_text else ''
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {count}')
+            suffix = f"{{{label_text}}}" if label_text else ''
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return lines
+
+
+STAGE_SECONDS = Histogram('chatbot_stage_seconds', 'Time spent in each stage of the chat pipeline', ['stage'])
+REQUEST_SECONDS = Histogram('chatbot_request_seconds', 'Time to answer a chat message', ['intent'])
+
+
+class Trace:
+    """Stage timings (milliseconds) of one chat request; a stage entered twice accumulates"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float):
+        self.spans[stage] = self.spans.get(stage, 0.0) + seconds * 1000
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def timings(self) -> Dict[str, float]:
+        timings = {stage: round(ms, 2) for stage, ms in self.spans.items()}
+        timings['total'] = round(self.total_ms(), 2)
+        return timings
+
+    def server_timing(self) -> str:
+        """Value of a `Server-Timing` response header"""
+        return ', '.join(f"{stage};dur={ms}" for stage, ms in self.timings().items())
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar('chatbot_trace', default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def request_trace() -> Iterator[Trace]:
+    """Trace the block as one request, or join the trace an outer caller (e.g. a view) started"""
+    trace = _current_trace.get()
+    if trace is not None:
+        yield trace
+        return
+
+    trace = Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+class Span:
+    __slots__ = ('elapsed',)
+
+    def __init__(self):
+        self.elapsed = 0.0
+
+    @property
+    def elapsed_ms(self) -> float:
+        return round(self.elapsed * 1000, 2)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[Span]:
+    """Time a pipeline stage into the stage histogram and the current request's trace"""
+    timer = Span()
+    started = time.perf_counter()
+    try:
+        yield timer
+    finally:
+        timer.elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(timer.elapsed, stage)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(stage, timer.elapsed)
+
+
+def render_metrics(load_timings: Optional[Dict[str, float]] = None) -> str:
+    """Every chatbot metric of this process in the Prometheus text exposition format"""
+    lines = STAGE_SECONDS.render() + REQUEST_SECONDS.render()
+    if load_timings:
+        lines += [
+            '# HELP chatbot_component_load_seconds Time this process spent loading each chatbot component',
+            '# TYPE chatbot_component_load_seconds gauge',
+        ]
+        lines += [f'chatbot_component_load_seconds{{component="{name}"}} {seconds}' for name, seconds in sorted(load_timings.items())]
+    return '\n'.join(lines) + '\n'
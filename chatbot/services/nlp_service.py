@@ -1,23 +1,46 @@
-import spacy
 import re
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Tuple, Any, Optional
 from django.conf import settings
 from core.models import Product, CartOrder
-from fuzzywuzzy import fuzz
 
 class NLPService:
     """Handle NLP processing using spaCy"""
     
-    def __init__(self):
-        try:
-            self.nlp = spacy.load("en_core_web_sm")
-        except OSError:
-            # If model not found, use basic tokenizer
-            print("Warning: spaCy model 'en_core_web_sm' not found. Please install it with: python -m spacy download en_core_web_sm")
-            self.nlp = None
+    def __init__(self, nlp=None, intent_engine=None):
+        # Reuse the process-wide pipeline; spacy.load() is far too slow to run per message
+        if nlp is None:
+            from chatbot.services.registry import get_spacy_pipeline
+            nlp = get_spacy_pipeline()
+        if intent_engine is None:
+            from chatbot.services.registry import get_intent_engine
+            intent_engine = get_intent_engine()
+        self.nlp = nlp
+        self.intent_engine = intent_engine
     
     def extract_entities(self, text: str) -> Dict[str, Any]:
         """Extract entities from user input"""
+        if not self.nlp:
+            return self._fallback_extraction(text)
+
+        return self._extract_from_doc(text, self.nlp(text.lower()))
+
+    def extract_entities_batch(self, texts: List[str], batch_size: Optional[int] = None, n_process: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Extract entities for many messages at once, streaming them through `nlp.pipe`.
+
+        `n_process` > 1 makes spaCy fork worker processes; only offline callers
+        (management commands) should ask for that, never a web request.
+        """
+        if not self.nlp:
+            return [self._fallback_extraction(text) for text in texts]
+
+        batch_size = batch_size or getattr(settings, 'CHATBOT_NLP_BATCH_SIZE', 64)
+        n_process = n_process or 1
+
+        docs = self.nlp.pipe((text.lower() for text in texts), batch_size=batch_size, n_process=n_process)
+        return [self._extract_from_doc(text, doc) for text, doc in zip(texts, docs)]
+
+    def _extract_from_doc(self, text: str, doc) -> Dict[str, Any]:
+        """Build the entity dict for `text` from its parsed spaCy `doc`"""
         entities = {
             'products': [],
             'order_ids': [],
@@ -28,11 +51,6 @@ class NLPService:
             'quantities': []
         }
 
-        if not self.nlp:
-            return self._fallback_extraction(text)
-
-        doc = self.nlp(text.lower())
-
         # Extract named entities
         for ent in doc.ents:
             if ent.label_ in ["PRODUCT", "ORG"]:
@@ -44,7 +62,7 @@ class NLPService:
 
         # Extract order IDs using regex
         order_patterns = [
-            r'\b(ORD|ORDER|BUY)\d+\b',
+            r'\b(?:ORD|ORDER|BUY|SKU)\d+\b',
             r'\b\d{5,10}\b',
             r'#\w+\d+',
         ]
@@ -61,26 +79,14 @@ class NLPService:
             if color in text.lower():
                 entities['colors'].append(color)
 
-        # Extract categories from DB
-        try:
-            from core.models import Category  # import here to avoid circular import
-            categories = Category.objects.values_list('title', flat=True)
-            for category in categories:
-                if category.lower() in text.lower():
-                    entities['categories'].append(category)
-        except Exception as e:
-            print("[NLPService] Failed to load categories:", e)
-
-        # ✅ Extract actual product titles from DB
+        # Match categories and product titles against the in-memory catalog index
         try:
-            from core.models import Product
-            product_titles = Product.objects.values_list('title', flat=True)
-            for title in product_titles:
-                score = fuzz.partial_ratio(title.lower(), text.lower())
-                if score >= 85:  # You can adjust this threshold if needed
-                    entities['products'].append(title)
+            from chatbot.services.registry import get_catalog_index  # import here to avoid circular import
+            catalog_matches = get_catalog_index().match(text)
+            entities['categories'].extend(catalog_matches['categories'])
+            entities['products'].extend(catalog_matches['products'])
         except Exception as e:
-            print("[NLPService] Failed to match product titles:", e)
+            print("[NLPService] Failed to match catalog entities:", e)
         return entities
 
     
@@ -98,7 +104,7 @@ class NLPService:
         
         # Simple regex-based extraction
         order_patterns = [
-            r'\b(ORD|ORDER|BUY)\d+\b',
+            r'\b(?:ORD|ORDER|BUY|SKU)\d+\b',
             r'\b\d{5,10}\b',
             r'#\w+\d+',
         ]
@@ -122,35 +128,14 @@ class NLPService:
     
     def classify_intent(self, text: str, entities: Dict[str, Any]) -> str:
         """Classify user intent based on text and entities"""
-        text_lower = text.lower()
-        
-        # Order-related intents
-        if any(keyword in text_lower for keyword in ['order', 'track', 'delivery', 'shipped', 'status']) or entities['order_ids']:
-            return 'order_inquiry'
-        
-        # Product search intents
-        if any(keyword in text_lower for keyword in ['search', 'find', 'show', 'looking for', 'want', 'need', 'buy', 'purchase', 'like', 'products' ]) or entities['products']:
-            return 'product_search'
-        
-        # Stock inquiry
-        if any(keyword in text_lower for keyword in ['stock', 'available', 'in stock', 'inventory']):
-            return 'stock_inquiry'
-        
-        # Price inquiry
-        if any(keyword in text_lower for keyword in ['price', 'cost', 'how much', 'expensive', 'cheap']):
-            return 'price_inquiry'
-        
-        # Category browsing
-        if any(keyword in text_lower for keyword in ['category', 'browse', 'section', 'department', 'browse categories']):
-            return 'category_browse'
-        
-        # Help/Support
-        if any(keyword in text_lower for keyword in ['help', 'support', 'assist', 'question']):
-            return 'help_request'
-        
-        if any(keyword in text_lower for keyword in ['return', 'refund', 'return policy', 'return item', 'how to return', 'return product']):
-            return 'return_policy'
+        return self.predict_intent(text, entities).intent
 
-        
-        # Default
-        return 'general_inquiry'
\ No newline at end of file
+    def predict_intent(self, text: str, entities: Dict[str, Any]):
+        """Intent with its confidence and source ('rules', 'model' or 'default')"""
+        self.intent_engine.ensure_fresh()
+        return self.intent_engine.classify(text, entities)
+
+    def classify_intent_batch(self, texts: List[str], entities: List[Dict[str, Any]]) -> List[str]:
+        """Classify many messages at once (the classifier scores them in one pass)"""
+        self.intent_engine.ensure_fresh()
+        return [prediction.intent for prediction in self.intent_engine.classify_batch(texts, entities)]
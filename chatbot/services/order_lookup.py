@@ -0,0 +1,95 @@
+import re
+from typing import Iterable, List, Optional, Tuple
+
+from django.db import transaction
+
+from chatbot.models import OrderLookup
+from core.models import CartOrder
+
+# Prefixes customers put in front of the numeric order ID ("ORD12345678"); SKUs keep theirs
+ORDER_PREFIX = re.compile(r'^(?:ORDER|ORD|BUY)(?=\d)')
+
+# When one reference matches several orders, prefer the strongest kind of match
+KIND_PRIORITY = {'oid': 0, 'sku': 1, 'tracking_id': 2}
+
+
+def normalize_reference(value: Optional[str]) -> str:
+    return (value or '').strip().lstrip('#').strip().upper()
+
+
+def lookup_entries(oid: Optional[str], tracking_id: Optional[str], sku: Optional[str]) -> List[Tuple[str, str]]:
+    """(reference, kind) rows an order with these fields is found by"""
+    entries = []
+    for kind, value in (('oid', oid), ('tracking_id', tracking_id), ('sku', sku)):
+        reference = normalize_reference(value)
+        if reference:
+            entries.append((reference[:100], kind))
+    return entries
+
+
+def sync_order_lookups(order: CartOrder):
+    """Bring the order's OrderLookup rows in line with its oid, tracking id and SKU"""
+    wanted = set(lookup_entries(order.oid, order.tracking_id, order.sku))
+    existing = set(OrderLookup.objects.filter(order=order).values_list('reference', 'kind'))
+    if wanted == existing:
+        return
+
+    with transaction.atomic():
+        OrderLookup.objects.filter(order=order).delete()
+        OrderLookup.objects.bulk_create([
+            OrderLookup(order=order, reference=reference, kind=kind) for reference, kind in wanted
+        ])
+
+
+def rebuild_order_lookups(batch_size: int = 2000) -> int:
+    """Recreate every lookup row, e.g. after orders were changed with `update()`, which sends no signals.
+
+    Runs in one transaction, so order tracking keeps seeing the old rows until
+    the new ones are committed, and a failed rebuild leaves them untouched.
+    """
+    created = 0
+    rows = []
+    with transaction.atomic():
+        OrderLookup.objects.all().delete()
+        for pk, oid, tracking_id, sku in CartOrder.objects.values_list('pk', 'oid', 'tracking_id', 'sku').iterator(chunk_size=batch_size):
+            rows.extend(OrderLookup(order_id=pk, reference=reference, kind=kind) for reference, kind in lookup_entries(oid, tracking_id, sku))
+            if len(rows) >= batch_size:
+                OrderLookup.objects.bulk_create(rows)
+                created += len(rows)
+                rows = []
+        OrderLookup.objects.bulk_create(rows)
+    return created + len(rows)
+
+
+def candidate_references(order_ids: Iterable[str]) -> List[str]:
+    """Normalized forms of the IDs the NLP service extracted, in the order they were mentioned"""
+    candidates = []
+    for order_id in order_ids:
+        reference = normalize_reference(order_id)
+        for candidate in (reference, ORDER_PREFIX.sub('', reference)):
+            if candidate and candidate not in candidates:
+                candidates.append(candidate)
+    return candidates
+
+
+def resolve_order(order_ids: Iterable[str]) -> Optional[CartOrder]:
+    """The order the first matching ID refers to, with its items prefetched.
+
+    All candidates are checked in a single indexed query, so the cost does not
+    grow with the size of the orders table.
+    """
+    candidates = candidate_references(order_ids)
+    if not candidates:
+        return None
+
+    matches = list(
+        OrderLookup.objects.filter(reference__in=candidates)
+        .select_related('order')
+        .prefetch_related('order__cartorderproducts_set')
+    )
+    if not matches:
+        return None
+
+    position = {reference: i for i, reference in enumerate(candidates)}
+    best = min(matches, key=lambda match: (position[match.reference], KIND_PRIORITY[match.kind], match.order_id))
+    return best.order
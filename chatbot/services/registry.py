@@ -0,0 +1,191 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+# Process-wide registry for the chatbot's heavy objects (spaCy pipeline, NLP/LLM
+# services). Everything is loaded at most once per process: once per gunicorn
+# worker, or once in the master when running with `gunicorn --preload`.
+_lock = threading.RLock()
+_instances: Dict[str, Any] = {}
+_load_timings: Dict[str, float] = {}
+
+
+def _get_or_load(name: str, factory: Callable[[], Any]) -> Any:
+    """Return the cached instance for `name`, building it on first use"""
+    if name in _instances:
+        return _instances[name]
+
+    with _lock:
+        # Another thread may have finished loading while we waited for the lock
+        if name in _instances:
+            return _instances[name]
+
+        started = time.perf_counter()
+        instance = factory()
+        elapsed = time.perf_counter() - started
+
+        _load_timings[name] = elapsed
+        _instances[name] = instance
+        logger.info("[chatbot] Loaded %s in %.1f ms", name, elapsed * 1000)
+
+    return instance
+
+
+def _load_spacy_pipeline():
+    import spacy
+
+    try:
+        return spacy.load("en_core_web_sm")
+    except OSError:
+        # If model not found, callers fall back to regex-based extraction
+        print("Warning: spaCy model 'en_core_web_sm' not found. Please install it with: python -m spacy download en_core_web_sm")
+        return None
+
+
+def _load_intent_engine():
+    from chatbot.services.intent_engine import create_intent_engine
+    return create_intent_engine()
+
+
+def _load_nlp_service():
+    from chatbot.services.nlp_service import NLPService
+    return NLPService(nlp=get_spacy_pipeline(), intent_engine=get_intent_engine())
+
+
+def _load_llm_service():
+    from chatbot.services.llm_service import LLMService
+    return LLMService()
+
+
+def _load_catalog_index():
+    from chatbot.services.catalog_index import CatalogIndex
+    index = CatalogIndex()
+    index.rebuild()
+    return index
+
+
+def _load_vector_store():
+    from chatbot.services.vector_store import create_vector_store
+    return create_vector_store()
+
+
+def _load_transcript_queue():
+    from chatbot.services.transcript_queue import create_transcript_queue
+    return create_transcript_queue()
+
+
+def _load_analytics_sink():
+    from chatbot.services.analytics import create_analytics_sink
+    return create_analytics_sink()
+
+
+def _load_chat_service():
+    from chatbot.services.chat_service import ChatService
+    return ChatService(nlp_service=get_nlp_service(), llm_service=get_llm_service())
+
+
+def get_spacy_pipeline():
+    """Shared spaCy `Language` object (or None when the model is not installed)"""
+    return _get_or_load('spacy_pipeline', _load_spacy_pipeline)
+
+
+def get_intent_engine():
+    """Shared intent engine (compiled ChatIntent rules + optional trained classifier)"""
+    engine = _get_or_load('intent_engine', _load_intent_engine)
+    engine.ensure_fresh()
+    return engine
+
+
+def get_nlp_service():
+    return _get_or_load('nlp_service', _load_nlp_service)
+
+
+def get_llm_service():
+    return _get_or_load('llm_service', _load_llm_service)
+
+
+def get_catalog_index():
+    """Shared in-memory index of category/product titles, kept current by chatbot.signals"""
+    index = _get_or_load('catalog_index', _load_catalog_index)
+    index.ensure_fresh()
+    return index
+
+
+def get_vector_store():
+    """Shared product embedding store used to ground LLM answers (empty until built)"""
+    store = _get_or_load('vector_store', _load_vector_store)
+    store.ensure_fresh()
+    return store
+
+
+def get_chat_service():
+    """Shared ChatService; it holds no per-request state so one instance serves all threads"""
+    return _get_or_load('chat_service', _load_chat_service)
+
+
+def get_transcript_queue():
+    """Write-behind transcript queue, or None unless CHATBOT_TRANSCRIPT_WRITE_BEHIND is on"""
+    return _get_or_load('transcript_queue', _load_transcript_queue)
+
+
+def get_analytics_sink():
+    """Buffered chat analytics writer, or None when CHATBOT_ANALYTICS_ENABLED is off"""
+    return _get_or_load('analytics_sink', _load_analytics_sink)
+
+
+def warm_up() -> Dict[str, float]:
+    """Load every component up front so the first chat message doesn't pay for it.
+
+    The database connections opened while loading are closed afterwards, so a
+    process that forks after warming up doesn't hand them to its children.
+    """
+    from django.db import connections
+    from core.search import get_search_backend
+
+    try:
+        get_chat_service()
+        get_catalog_index()
+        get_vector_store()
+        get_transcript_queue()
+        get_analytics_sink()
+        get_search_backend()
+    finally:
+        connections.close_all()
+    return get_load_timings()
+
+
+_warmed_up = False
+_warm_up_lock = threading.Lock()
+
+
+def warm_up_on_first_request(sender, **kwargs):
+    """`request_started` receiver: warm up once per process, i.e. in each worker after it was forked"""
+    global _warmed_up
+    with _warm_up_lock:
+        if _warmed_up:
+            return
+        _warmed_up = True
+    try:
+        warm_up()
+    except Exception as e:
+        # The request itself still works; components load lazily instead
+        print("[chatbot] Warm-up failed:", e)
+
+
+def is_loaded(name: str) -> bool:
+    return name in _instances
+
+
+def get_load_timings() -> Dict[str, float]:
+    """Seconds spent loading each component in this process (including its dependencies)"""
+    return dict(_load_timings)
+
+
+def reset():
+    """Drop every cached component (used when settings change, e.g. in tests)"""
+    with _lock:
+        _instances.clear()
+        _load_timings.clear()
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import re
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+TOKEN_RE = re.compile(r'\w+')
+
+# Words that don't change what is being asked ("what is your return policy" == "return policy?")
+STOP_WORDS = {
+    'a', 'an', 'the', 'is', 'are', 'was', 'what', 'whats', 'your', 'you', 'me', 'my', 'i',
+    'please', 'can', 'could', 'would', 'do', 'does', 'to', 'of', 'for', 'on', 'in', 'and',
+    'tell', 'about', 'hi', 'hello', 'hey', 'pls', 'plz',
+}
+
+KEY_PREFIX = 'chatbot:llm_reply'
+STATS_KEYS = ('hits', 'near_hits', 'misses')
+
+
+def normalize_message(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return ' '.join(TOKEN_RE.findall(text.lower()))
+
+
+def near_duplicate_text(text: str) -> str:
+    """Order-insensitive form of a message without filler words"""
+    words = set(TOKEN_RE.findall(text.lower()))
+    meaningful = words - STOP_WORDS
+    return ' '.join(sorted(meaningful or words))
+
+
+def context_fingerprint(context: Dict[str, Any]) -> str:
+    """Stable hash of everything the prompt is built from (intent, entities, products, order)"""
+    payload = json.dumps(context, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Cache of LLM replies keyed on the normalized message plus its prompt context.
+
+    Entries live in a Django cache (CHATBOT_RESPONSE_CACHE_ALIAS), so eviction is
+    the backend's: LRU + TTL for LocMemCache, `maxmemory-policy` + TTL for Redis.
+    Only real model output is stored; rule-based fallback replies never are.
+
+    Turns whose context carries conversation history are neither looked up nor
+    stored: the reply depends on the whole conversation, so keying on it would
+    make every entry unique (and hashing it costs more as the session grows),
+    while leaving it out would serve one conversation's follow-up answer to
+    another. Only self-contained first questions of a session are cached.
+    """
+
+    def __init__(self, alias: str = None, timeout: int = None, near_duplicates: bool = None):
+        self.alias = alias or getattr(settings, 'CHATBOT_RESPONSE_CACHE_ALIAS', 'default')
+        self.timeout = timeout if timeout is not None else getattr(settings, 'CHATBOT_RESPONSE_CACHE_SECONDS', 3600)
+        self.near_duplicates = (
+            near_duplicates if near_duplicates is not None
+            else getattr(settings, 'CHATBOT_RESPONSE_CACHE_NEAR_DUPLICATES', False)
+        )
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def enabled(self) -> bool:
+        return self.timeout > 0
+
+    def _key(self, kind: str, text: str, context: Dict[str, Any]) -> str:
+        digest = hashlib.sha1(f"{context.get('intent', '')}|{context_fingerprint(context)}|{text}".encode('utf-8')).hexdigest()
+        return f"{KEY_PREFIX}:{kind}:{digest}"
+
+    def cacheable(self, context: Dict[str, Any]) -> bool:
+        return self.enabled and not context.get('history')
+
+    def get(self, message: str, context: Dict[str, Any]) -> Optional[str]:
+        if not self.cacheable(context):
+            return None
+
+        reply = self.cache.get(self._key('exact', normalize_message(message), context))
+        if reply is not None:
+            self._count('hits')
+            return reply
+
+        if self.near_duplicates:
+            reply = self.cache.get(self._key('near', near_duplicate_text(message), context))
+            if reply is not None:
+                self._count('near_hits')
+                return reply
+
+        self._count('misses')
+        return None
+
+    def set(self, message: str, context: Dict[str, Any], reply: str):
+        if not self.cacheable(context) or not reply:
+            return
+
+        entries = {self._key('exact', normalize_message(message), context): reply}
+        if self.near_duplicates:
+            entries[self._key('near', near_duplicate_text(message), context)] = reply
+        self.cache.set_many(entries, self.timeout)
+
+    # ----------------- Stats -----------------
+    def _count(self, name: str):
+        key = f"{KEY_PREFIX}:stats:{name}"
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.set(key, 1, None)
+
+    def stats(self) -> Dict[str, Any]:
+        values = self.cache.get_many([f"{KEY_PREFIX}:stats:{name}" for name in STATS_KEYS])
+        counts = {name: values.get(f"{KEY_PREFIX}:stats:{name}", 0) for name in STATS_KEYS}
+        lookups = sum(counts.values())
+        counts['hit_rate'] = round((counts['hits'] + counts['near_hits']) / lookups, 4) if lookups else None
+        return counts
+
+    def reset_stats(self):
+        self.cache.delete_many([f"{KEY_PREFIX}:stats:{name}" for name in STATS_KEYS])
@@ -0,0 +1,93 @@
+import copy
+from typing import Any, Dict, List
+
+from django.core.cache import cache
+
+from core.versioned_index import bump_version
+
+# Category browse suggestions, stored under the current version; chatbot.signals
+# bumps the version whenever a Category changes, so every worker sharing the
+# cache rebuilds them. With a per-process cache other workers catch up when
+# their copy expires, hence the short timeout.
+CATEGORY_SUGGESTIONS_KEY = 'chatbot:static:category_suggestions:{}'
+CATEGORY_SUGGESTIONS_VERSION_KEY = 'chatbot:static:category_suggestions:version'
+CATEGORY_SUGGESTIONS_TIMEOUT = 5 * 60
+MAX_CATEGORY_SUGGESTIONS = 6
+
+HELP_MESSAGE = (
+    "👋 Hi {user_name}! I'm your shopping assistant. <br>"
+    "🤖 Here’s how I can help you today: <br><br>"
+
+    "📞 <b>You can reach our support team anytime:</b> <br>"
+    '📧 Email: <a href="mailto:support@example.com" style="color:#3366cc; text-decoration:underline;">support@example.com</a><br>'
+    '💬 WhatsApp: <a href="https://wa.me/923001234567" target="_blank" style="color:#3366cc;">+92 300 1234567</a><br>'
+    '🌐 Help Center: <a href="/contact/" target="_blank" style="color:#3366cc;">Visit here</a><br>'
+
+    "🕒 Hours: Mon–Fri, 9am–6pm (PKT) <br><br>"
+
+    "❓ You can also ask general shopping questions or try options below: <br>"
+)
+
+# Replies that never depend on the message or the database, built once at import
+STATIC_RESPONSES: Dict[str, Dict[str, Any]] = {
+    'help_request': {
+        'message': HELP_MESSAGE,
+        'suggestions': [
+            "🔍 Find products",
+            "📦 Track my order",
+            "🗂️ Browse categories",
+            "💸 Check deals",
+        ]
+    },
+    'return_policy': {
+        'message': (
+            "🔁 Our Return Policy: <br>"
+            "• You can return items within **7 days** of delivery. <br>"
+            "• Items must be unused, in original packaging. <br>"
+            "• To initiate a return, go to your order history and click 'Request Return'. <br>"
+            "• For more details, please visit our [Return Policy page](https://yourwebsite.com/returns). <br>"
+            "Would you like help returning a product or tracking an order?"
+        ),
+        'suggestions': [
+            "Return a product",
+            "Track my order",
+            "Contact support",
+            "Go to homepage",
+            "📞 Get help"
+        ],
+        'data': {}
+    },
+    'category_browse': {
+        "message": "🗂️ Here are our available product categories:",
+    },
+    'no_categories': {
+        "message": "❗ No categories available at the moment.",
+        "suggestions": ["Search products", "Help"]
+    },
+}
+
+
+def static_response(name: str, **params) -> Dict[str, Any]:
+    """A fresh copy of a precomputed reply (callers may edit it), with `params` filled into its message"""
+    response = copy.deepcopy(STATIC_RESPONSES[name])
+    if params:
+        response['message'] = response['message'].format(**params)
+    return response
+
+
+def category_suggestions() -> List[str]:
+    """"Show <category>" suggestions, from the cache unless a Category changed since they were built"""
+    key = CATEGORY_SUGGESTIONS_KEY.format(cache.get(CATEGORY_SUGGESTIONS_VERSION_KEY, 0))
+    suggestions = cache.get(key)
+    if suggestions is None:
+        from core.models import Category
+
+        # Fetch a few spare titles in case some only differ by surrounding whitespace
+        titles = Category.objects.order_by('title').values_list('title', flat=True).distinct()[:MAX_CATEGORY_SUGGESTIONS * 2]
+        suggestions = list(dict.fromkeys(f"Show {title.strip()}" for title in titles))[:MAX_CATEGORY_SUGGESTIONS]
+        cache.set(key, suggestions, CATEGORY_SUGGESTIONS_TIMEOUT)
+    return suggestions
+
+
+def invalidate_category_suggestions():
+    bump_version(CATEGORY_SUGGESTIONS_VERSION_KEY)
@@ -0,0 +1,301 @@
+import glob
+import json
+import os
+import uuid
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from chatbot.models import ChatSession, ChatMessage
+from chatbot.services.background_flush import BackgroundFlusher
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+SPOOL_PATTERNS = ('*.jsonl', '*.flushing', '*.recovering')
+
+
+class TranscriptQueue(BackgroundFlusher):
+    """Write-behind queue for chat transcripts.
+
+    `enqueue` appends the turn to this process's spool file and an in-memory
+    buffer and returns straight away; a background thread writes the buffer with
+    one transaction (session metadata `bulk_update` + messages `bulk_create`)
+    every `flush_size` turns or `flush_interval` seconds, then drops the spool.
+
+    If the process dies before a flush, its spool file is replayed by the next
+    process that starts a queue, or by `manage.py flush_chat_transcripts`.
+    Every queued message carries a `turn_id` in its metadata so a replay never
+    inserts a turn twice.
+
+    Spools are named `<pid>-<random token>` so a restarted worker that gets a
+    dead worker's PID never adopts its file, and the owner holds an exclusive
+    `flock` on every spool it has open: recovery treats a spool it can lock as
+    orphaned, which stays true when PIDs are reused. Without `flock` (Windows)
+    every other spool counts as orphaned, so use a single process there.
+
+    Reads of unflushed turns (`pending_messages`, `apply_pending`) only see this
+    process's buffer. A failed flush is retried with the next one.
+    """
+
+    name = 'TranscriptQueue'
+    thread_name = 'chat-transcript-flush'
+
+    def __init__(self, spool_dir: str, flush_size: int = 100, flush_interval: float = 0.5):
+        super().__init__(flush_size, flush_interval)
+        self.spool_dir = str(spool_dir)
+        self._pending: List[Dict[str, Any]] = []
+        self._in_flight: List[Dict[str, Any]] = []
+        self._spool = None
+        self._name = None
+
+        os.makedirs(self.spool_dir, exist_ok=True)
+
+    # ----------------- Writing -----------------
+    def enqueue(self, session: ChatSession, transcript: List[ChatMessage]):
+        """Queue a turn of an already saved session"""
+        turn_id = uuid.uuid4().hex
+        record = {
+            'turn_id': turn_id,
+            'session_pk': session.pk,
+            'session_id': session.session_id,
+            'metadata': session.metadata,
+            'queued_at': timezone.now().isoformat(),
+            'messages': [
+                {
+                    'message_type': message.message_type,
+                    'content': message.content,
+                    'metadata': dict(message.metadata or {}, turn_id=turn_id),
+                }
+                for message in transcript
+            ],
+        }
+        line = json.dumps(record, cls=DjangoJSONEncoder)
+
+        with self._lock:
+            self._ensure_started()
+            self._spool.write(line + '\n')
+            self._spool.flush()
+            self._pending.append(json.loads(line))
+            full = len(self._pending) >= self.flush_size
+
+        if full:
+            self._wake()
+
+    def _reset(self):
+        """Open this process's spool (the parent's turns stay in the parent's)"""
+        if self._spool is not None:
+            # The inherited handle would keep the parent's lock alive after the parent exits
+            self._spool.close()
+        self._pending = []
+        self._in_flight = []
+        self._name = f"{self._pid}-{uuid.uuid4().hex}"
+        self._spool = self._open_spool([])
+
+    def _spool_path(self, suffix: str = 'jsonl') -> str:
+        return os.path.join(self.spool_dir, f"{self._name}.{suffix}")
+
+    def _open_spool(self, records: List[Dict[str, Any]]):
+        """Create the spool holding `records`, locked before recovery can see it under its name"""
+        path = self._spool_path()
+        spool = open(path + '.open', 'w', encoding='utf-8')
+        _try_lock(spool)
+        spool.writelines(json.dumps(record, cls=DjangoJSONEncoder) + '\n' for record in records)
+        spool.flush()
+        os.replace(path + '.open', path)
+        return spool
+
+    def flush(self) -> int:
+        """Write every buffered turn to the database; returns the number of turns written"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending or self._pid != os.getpid():
+                    return 0
+                batch, self._pending = self._pending, []
+                self._in_flight = batch
+
+                # New turns go to a fresh spool while this batch is written; the old
+                # handle stays open, and locked, until the batch is in the database
+                flushing = self._spool
+                flushing_path = self._spool_path(f"{uuid.uuid4().hex[:8]}.flushing")
+                os.replace(self._spool_path(), flushing_path)
+                self._spool = self._open_spool([])
+
+            try:
+                write_turns(batch)
+            except Exception:
+                # Put the batch back in front of newer turns and spool them all again
+                with self._lock:
+                    self._pending = batch + self._pending
+                    self._in_flight = []
+                    spool, self._spool = self._spool, self._open_spool(self._pending)
+                    spool.close()
+                raise
+            else:
+                with self._lock:
+                    self._in_flight = []
+            finally:
+                os.remove(flushing_path)
+                flushing.close()
+            return len(batch)
+
+    # ----------------- Read-through -----------------
+    def _unflushed(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            if self._pid != os.getpid():
+                return []
+            return self._in_flight + self._pending
+
+    def apply_pending(self, session: ChatSession):
+        """Overlay the newest unflushed metadata of `session` (paging state, last reply)"""
+        for record in reversed(self._unflushed()):
+            if record['session_pk'] == session.pk:
+                session.metadata = record['metadata']
+                return
+
+    def pending_messages(self, session: ChatSession, flushed_turn_ids=()) -> List[ChatMessage]:
+        """Unsaved ChatMessage objects for turns of `session` not yet in the database"""
+        messages = []
+        for record in self._unflushed():
+            if record['session_pk'] != session.pk or record['turn_id'] in flushed_turn_ids:
+                continue
+            for item in record['messages']:
+                messages.append(ChatMessage(
+                    session=session,
+                    message_type=item['message_type'],
+                    content=item['content'],
+                    metadata=item['metadata'],
+                    timestamp=parse_datetime(record['queued_at']),
+                ))
+        return messages
+
+
+def write_turns(turns: List[Dict[str, Any]]):
+    """Insert queued turns in one transaction (turns of deleted sessions are dropped).
+
+    Messages keep the time they were queued, not the time of the flush, and a
+    session's metadata is only replaced if the row wasn't updated after the
+    turn was queued (a replayed spool must not undo newer state).
+    """
+    with transaction.atomic():
+        session_pks = {turn['session_pk'] for turn in turns}
+        updated_at = dict(
+            ChatSession.objects.select_for_update().filter(pk__in=session_pks).values_list('pk', 'updated_at')
+        )
+
+        latest: Dict[int, ChatSession] = {}
+        messages, timestamps = [], []
+        for turn in turns:
+            if turn['session_pk'] not in updated_at:
+                continue
+            queued_at = parse_datetime(turn['queued_at'])
+            if updated_at[turn['session_pk']] < queued_at:
+                latest[turn['session_pk']] = ChatSession(pk=turn['session_pk'], metadata=turn['metadata'], updated_at=queued_at)
+            for position, item in enumerate(turn['messages']):
+                messages.append(ChatMessage(session_id=turn['session_pk'], **item))
+                # Keeps the user message ahead of the reply under `ordering = ['timestamp']`
+                timestamps.append(queued_at + timedelta(microseconds=position))
+
+        ChatSession.objects.bulk_update(list(latest.values()), ['metadata', 'updated_at'])
+        # `timestamp` is auto_now_add, so the insert stamps the flush time; set the queued time afterwards
+        ChatMessage.objects.bulk_create(messages)
+        for message, timestamp in zip(messages, timestamps):
+            message.timestamp = timestamp
+        if messages and messages[0].pk is not None:
+            ChatMessage.objects.bulk_update(messages, ['timestamp'])
+        else:
+            # Backends that don't return ids from a bulk insert
+            for message, timestamp in zip(messages, timestamps):
+                ChatMessage.objects.filter(
+                    session_id=message.session_id, metadata__turn_id=message.metadata['turn_id'],
+                    message_type=message.message_type,
+                ).update(timestamp=timestamp)
+
+
+def _try_lock(spool) -> bool:
+    """Lock an open spool exclusively; False if another open handle (live process) holds it"""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(spool.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+def recover_spools(spool_dir: Optional[str] = None) -> int:
+    """Replay spool files left behind by processes that are no longer running.
+
+    A spool is claimed by locking it and renaming it to `.recovering` before
+    it is read, so concurrent recoveries (every worker runs one at start-up)
+    never replay the same file; a `.recovering` file left by a recovery that
+    died is picked up again.
+    """
+    spool_dir = str(spool_dir or settings.CHATBOT_TRANSCRIPT_SPOOL_DIR)
+    recovered = 0
+
+    paths = sorted(path for pattern in SPOOL_PATTERNS for path in glob.glob(os.path.join(spool_dir, pattern)))
+    for path in paths:
+        try:
+            spool = open(path, encoding='utf-8')
+        except FileNotFoundError:
+            continue  # flushed or claimed since the listing
+        with spool:
+            if not _try_lock(spool):
+                continue  # its process is still running, or another recovery has it
+            name = os.path.basename(path).split('.', 1)[0]
+            claimed = os.path.join(spool_dir, f"{name}.{uuid.uuid4().hex[:8]}.recovering")
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue  # another recovery finished it between our open and lock
+
+            # A crash mid-write can leave a truncated last line
+            turns = []
+            for line in spool:
+                try:
+                    turns.append(json.loads(line))
+                except ValueError:
+                    pass
+
+            if turns:
+                turn_ids = [turn['turn_id'] for turn in turns]
+                done = set(
+                    ChatMessage.objects.filter(metadata__turn_id__in=turn_ids)
+                    .values_list('metadata__turn_id', flat=True)
+                )
+                turns = [turn for turn in turns if turn['turn_id'] not in done]
+                write_turns(turns)
+                recovered += len(turns)
+
+            # Removed before the lock is released, so nobody can claim it again
+            os.remove(claimed)
+
+    return recovered
+
+
+def create_transcript_queue() -> Optional[TranscriptQueue]:
+    if not getattr(settings, 'CHATBOT_TRANSCRIPT_WRITE_BEHIND', False):
+        return None
+
+    spool_dir = settings.CHATBOT_TRANSCRIPT_SPOOL_DIR
+    os.makedirs(spool_dir, exist_ok=True)
+    # Before this process opens a spool of its own
+    try:
+        recovered = recover_spools(spool_dir)
+        if recovered:
+            print(f"[TranscriptQueue] Recovered {recovered} unflushed chat turns")
+    except Exception as e:
+        print("[TranscriptQueue] Spool recovery failed:", e)
+    return TranscriptQueue(
+        spool_dir,
+        flush_size=getattr(settings, 'CHATBOT_TRANSCRIPT_FLUSH_SIZE', 100),
+        flush_interval=getattr(settings, 'CHATBOT_TRANSCRIPT_FLUSH_MS', 500) / 1000,
+    )
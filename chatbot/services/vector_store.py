@@ -0,0 +1,268 @@
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.html import strip_tags
+
+# Bumped on every product change; `chatbot:product_vectors:changed:<version>` holds the product id
+VECTOR_VERSION_KEY = 'chatbot:product_vectors:version'
+CHANGED_KEY = 'chatbot:product_vectors:changed:{}'
+CHANGED_TIMEOUT = 24 * 60 * 60
+
+SNIPPET_LENGTH = 200
+
+
+def product_text(title: str, category: Optional[str], description: Optional[str], specifications: Optional[str]) -> str:
+    """Text a product is embedded from"""
+    return ' '.join(filter(None, [title, category, strip_tags(description or ''), strip_tags(specifications or '')]))
+
+
+def record_product_change(product_id: int) -> int:
+    """Tell other processes which product to re-embed; returns the new version"""
+    try:
+        version = cache.incr(VECTOR_VERSION_KEY)
+    except ValueError:
+        version = 1
+        cache.set(VECTOR_VERSION_KEY, version, None)
+    cache.set(CHANGED_KEY.format(version), product_id, CHANGED_TIMEOUT)
+    return version
+
+
+class TfidfSvdEmbedder:
+    """TF-IDF followed by truncated SVD (LSA): dense, L2-normalised vectors without a neural model"""
+
+    def __init__(self, dim: int = 128, max_features: int = 50000):
+        from sklearn.decomposition import TruncatedSVD
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        self.vectorizer = TfidfVectorizer(max_features=max_features, sublinear_tf=True, stop_words='english')
+        self.svd = TruncatedSVD(n_components=dim, random_state=0)
+
+    @property
+    def dim(self) -> int:
+        return self.svd.n_components
+
+    def fit_transform(self, texts: List[str]) -> np.ndarray:
+        tfidf = self.vectorizer.fit_transform(texts)
+        if tfidf.shape[1] <= self.svd.n_components:
+            self.svd.n_components = max(1, tfidf.shape[1] - 1)
+        return self._normalize(self.svd.fit_transform(tfidf))
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return self._normalize(self.svd.transform(self.vectorizer.transform(texts)))
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = vectors.astype(np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return vectors / norms
+
+
+class ProductVectorStore:
+    """Brute-force cosine search over product embeddings kept in a memory-mapped .npy matrix.
+
+    `build_product_vectors` writes a new version directory (vectors.npy, ids.npy,
+    embedder.pkl) and points CURRENT at it; every process maps the same file, so
+    the matrix is shared through the page cache rather than copied per worker.
+    Products saved since the build are re-embedded into a small in-memory
+    overlay, and their stale rows in the mapped matrix are masked out.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = str(directory)
+        self._lock = threading.Lock()
+        self._loaded_version = None
+        self._vectors: Optional[np.ndarray] = None
+        self._ids: Optional[np.ndarray] = None
+        self._rows: Dict[int, int] = {}
+        self._masked: Optional[np.ndarray] = None
+        self._overlay: Dict[int, np.ndarray] = {}
+        self.embedder: Optional[TfidfSvdEmbedder] = None
+        self._version = None
+        self._checked_at = 0.0
+
+    @property
+    def available(self) -> bool:
+        return self._vectors is not None
+
+    # ----------------- Loading -----------------
+    def _current_version(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.directory, 'CURRENT'), encoding='utf-8') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def load(self):
+        """Map the newest built version (no-op if it is already loaded)"""
+        version = self._current_version()
+        if version is None or version == self._loaded_version:
+            return
+
+        path = os.path.join(self.directory, version)
+        vectors = np.load(os.path.join(path, 'vectors.npy'), mmap_mode='r')
+        ids = np.load(os.path.join(path, 'ids.npy'))
+        with open(os.path.join(path, 'embedder.pkl'), 'rb') as f:
+            embedder = pickle.load(f)
+
+        with self._lock:
+            self._vectors = vectors
+            self._ids = ids
+            self._rows = {int(product_id): row for row, product_id in enumerate(ids)}
+            self._masked = np.zeros(len(ids), dtype=bool)
+            self._overlay = {}
+            self.embedder = embedder
+            self._loaded_version = version
+            self._version = cache.get(VECTOR_VERSION_KEY)
+
+    def ensure_fresh(self):
+        """Pick up a rebuilt matrix and products changed in other processes"""
+        interval = getattr(settings, 'CHATBOT_CATALOG_REFRESH_SECONDS', 30)
+        if time.monotonic() - self._checked_at < interval:
+            return
+        self._checked_at = time.monotonic()
+
+        self.load()
+        if not self.available:
+            return
+
+        version = cache.get(VECTOR_VERSION_KEY) or 0
+        seen = self._version or 0
+        if version <= seen:
+            return
+        changed = cache.get_many([CHANGED_KEY.format(v) for v in range(seen + 1, version + 1)])
+        self.refresh_products(set(changed.values()))
+        self._version = version
+
+    def mark_synced(self, version):
+        if version == (self._version or 0) + 1:
+            self._version = version
+
+    # ----------------- Incremental updates -----------------
+    def refresh_products(self, product_ids: Iterable[int]):
+        """Re-embed the given products from the database (deleted ones are dropped)"""
+        from core.models import Product
+
+        product_ids = set(product_ids)
+        if not self.available or not product_ids:
+            return
+
+        rows = list(Product.objects.filter(id__in=product_ids).values_list(
+            'id', 'title', 'category__title', 'description', 'specifications'
+        ))
+        vectors = self.embedder.embed([product_text(*row[1:]) for row in rows]) if rows else []
+
+        with self._lock:
+            for product_id in product_ids:
+                self._overlay.pop(product_id, None)
+                if product_id in self._rows:
+                    self._masked[self._rows[product_id]] = True
+            for (product_id, *_), vector in zip(rows, vectors):
+                self._overlay[product_id] = vector
+
+    # ----------------- Searching -----------------
+    def search(self, text: str, k: int = 3) -> List[Tuple[int, float]]:
+        """Top-k (product_id, cosine similarity) for `text`"""
+        if not self.available:
+            return []
+
+        query = self.embedder.embed([text])[0]
+        if not query.any():
+            return []
+
+        with self._lock:
+            scores = self._vectors @ query
+            scores[self._masked] = -1.0
+            candidates = []
+            if len(scores):
+                top = np.argpartition(scores, -k)[-k:] if len(scores) > k else np.arange(len(scores))
+                candidates = [(int(self._ids[row]), float(scores[row])) for row in top]
+            candidates += [(product_id, float(vector @ query)) for product_id, vector in self._overlay.items()]
+
+        candidates.sort(key=lambda item: item[1], reverse=True)
+        return candidates[:k]
+
+    def snippets(self, text: str, k: int = 3, min_score: float = 0.0) -> List[Dict[str, Any]]:
+        """Short descriptions of the published products most relevant to `text`, for the LLM prompt"""
+        from core.models import Product
+
+        hits = [(product_id, score) for product_id, score in self.search(text, k) if score >= min_score]
+        if not hits:
+            return []
+
+        products = Product.objects.filter(
+            id__in=[product_id for product_id, _ in hits], product_status='published', status=True
+        ).in_bulk()
+
+        snippets = []
+        for product_id, score in hits:
+            product = products.get(product_id)
+            if product is None:
+                continue
+            description = ' '.join(strip_tags(product.description or '').split())
+            snippets.append({
+                'title': product.title,
+                'text': description[:SNIPPET_LENGTH],
+                'url': f"/product/{product.pid}/",
+                'score': round(score, 3),
+            })
+        return snippets
+
+    def __len__(self):
+        base = int((~self._masked).sum()) if self._masked is not None else 0
+        return base + len(self._overlay)
+
+
+def build_vector_store(directory: str, dim: int = 128, max_features: int = 50000, keep_versions: int = 2) -> Dict[str, Any]:
+    """Embed every product and publish the result as the newest version in `directory`"""
+    from core.models import Product
+
+    rows = list(Product.objects.order_by('id').values_list(
+        'id', 'title', 'category__title', 'description', 'specifications'
+    ).iterator())
+    if not rows:
+        raise ValueError("No products to embed")
+
+    embedder = TfidfSvdEmbedder(dim=dim, max_features=max_features)
+    vectors = embedder.fit_transform([product_text(*row[1:]) for row in rows])
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+
+    version = time.strftime('%Y%m%d%H%M%S')
+    path = os.path.join(str(directory), version)
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, 'vectors.npy'), vectors)
+    np.save(os.path.join(path, 'ids.npy'), ids)
+    with open(os.path.join(path, 'embedder.pkl'), 'wb') as f:
+        pickle.dump(embedder, f)
+    meta = {'version': version, 'count': len(ids), 'dim': int(vectors.shape[1]), 'built_at': time.time()}
+    with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+    current = os.path.join(str(directory), 'CURRENT')
+    with open(current + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(current + '.tmp', current)
+
+    # Processes still mapping an old version keep working: unlinked files stay readable
+    versions = sorted(name for name in os.listdir(str(directory)) if name.isdigit())
+    for old in versions[:-keep_versions]:
+        shutil.rmtree(os.path.join(str(directory), old), ignore_errors=True)
+
+    return meta
+
+
+def create_vector_store() -> ProductVectorStore:
+    store = ProductVectorStore(settings.CHATBOT_VECTOR_STORE_DIR)
+    try:
+        store.load()
+    except Exception as e:
+        print("[VectorStore] Could not load product vectors:", e)
+    return store
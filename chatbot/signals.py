@@ -0,0 +1,77 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.models import Product, Category, CartOrder
+from core.versioned_index import publish_change
+from chatbot.models import ChatIntent
+from chatbot.services import registry
+from chatbot.services.catalog_index import CATALOG_VERSION_KEY
+from chatbot.services.intent_engine import INTENT_VERSION_KEY
+from chatbot.services.order_lookup import sync_order_lookups
+from chatbot.services.static_responses import invalidate_category_suggestions
+from chatbot.services.vector_store import record_product_change
+
+
+def _sync_catalog_index(apply):
+    index = registry.get_catalog_index() if registry.is_loaded('catalog_index') else None
+    publish_change(CATALOG_VERSION_KEY, index, apply)
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, update_fields=None, **kwargs):
+    # Only titles are indexed; stock and price saves (e.g. at checkout) don't bump the version
+    if instance.changed_fields('title', update_fields=update_fields):
+        _sync_catalog_index(lambda index: index.upsert_product(instance.id, instance.title))
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    _sync_catalog_index(lambda index: index.remove_product(instance.id))
+
+
+def _sync_product_vectors(product_id):
+    version = record_product_change(product_id)
+    if registry.is_loaded('vector_store'):
+        store = registry.get_vector_store()
+        store.refresh_products([product_id])
+        store.mark_synced(version)
+
+
+@receiver(post_save, sender=Product)
+def embed_product(sender, instance, update_fields=None, **kwargs):
+    # Only the text `product_text` embeds matters; stock and price saves keep the vector
+    if instance.changed_fields('title', 'category_id', 'description', 'specifications', update_fields=update_fields):
+        _sync_product_vectors(instance.id)
+
+
+@receiver(post_delete, sender=Product)
+def unembed_product(sender, instance, **kwargs):
+    _sync_product_vectors(instance.id)
+
+
+@receiver(post_save, sender=Category)
+def index_category(sender, instance, **kwargs):
+    _sync_catalog_index(lambda index: index.upsert_category(instance.id, instance.title))
+
+
+@receiver(post_delete, sender=Category)
+def unindex_category(sender, instance, **kwargs):
+    _sync_catalog_index(lambda index: index.remove_category(instance.id))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def refresh_category_suggestions(sender, instance, **kwargs):
+    invalidate_category_suggestions()
+
+
+@receiver(post_save, sender=CartOrder)
+def index_order_references(sender, instance, **kwargs):
+    sync_order_lookups(instance)
+
+
+@receiver(post_save, sender=ChatIntent)
+@receiver(post_delete, sender=ChatIntent)
+def reload_intent_rules(sender, instance, **kwargs):
+    engine = registry.get_intent_engine() if registry.is_loaded('intent_engine') else None
+    publish_change(INTENT_VERSION_KEY, engine, lambda engine: engine.reload_rules())
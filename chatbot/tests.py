@@ -1,3 +1,975 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.utils import timezone
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+
+from chatbot.bench.corpus import build_corpus
+from chatbot.bench.llm_stub import start_llm_stub, stub_base_url
+from chatbot.models import ChatAnalyticsRollup, ChatArchive, ChatMessage, ChatSession, ProductQuery
+from chatbot.services.admission import AdmissionGate, SingleFlight
+from chatbot.services.analytics import AnalyticsSink, result_bucket
+from chatbot.services.archive import archive_expired_sessions, archived_messages
+from chatbot.services.catalog_index import CatalogIndex
+from chatbot.services.conversation_context import ConversationWindow, clip, estimate_tokens
+from chatbot.services.http_client import CircuitBreaker, CircuitOpenError, LLMHttpClient
+from chatbot.services.llm_service import LLMService
+from chatbot.services.registry import get_chat_service
+from chatbot.services.response_cache import ResponseCache, near_duplicate_text, normalize_message
+from chatbot.services.intent_engine import IntentEngine
+from chatbot.services import chat_service, transcript_queue
+from chatbot.services.order_lookup import candidate_references, resolve_order
+from chatbot.services.transcript_queue import TranscriptQueue, create_transcript_queue, recover_spools
+from chatbot.services.vector_store import VECTOR_VERSION_KEY, ProductVectorStore, build_vector_store, record_product_change
+from chatbot.v2.throttles import ChatThrottle
+from core import search
+from core.models import CartOrder, Category, Product
+from core.search import BM25SearchBackend
+
+
+class CatalogIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.shoes = Category.objects.create(title='Shoes')
+        cls.runner = Product.objects.create(title='Kora Blue Runner', category=cls.shoes, base_price=10, max_price=20)
+        cls.tote = Product.objects.create(title='Zeal Gold Tote', base_price=10, max_price=20)
+
+    def setUp(self):
+        self.index = CatalogIndex()
+        self.index.rebuild()
+
+    def test_exact_mentions(self):
+        self.assertEqual(
+            self.index.match('Do you have the kora blue runner in shoe size 9?'),
+            {'categories': ['Shoes'], 'products': ['Kora Blue Runner']},
+        )
+        self.assertEqual(self.index.match('hello'), {'categories': [], 'products': []})
+
+    def test_misspelt_titles_match_fuzzily(self):
+        self.assertEqual(self.index.match('is the zeal gold totte back?')['products'], ['Zeal Gold Tote'])
+
+    def test_incremental_updates(self):
+        self.index.upsert_product(self.tote.id, 'Zeal Silver Clutch')
+        self.index.upsert_category(self.shoes.id, 'Sneakers')
+        self.assertEqual(self.index.match('zeal gold tote'), {'categories': [], 'products': []})
+        self.assertEqual(self.index.match('zeal silver clutch sneakers')['products'], ['Zeal Silver Clutch'])
+        self.assertEqual(self.index.match('sneakers')['categories'], ['Sneakers'])
+
+        self.index.remove_product(self.runner.id)
+        self.index.remove_category(self.shoes.id)
+        self.assertEqual(self.index.match('kora blue runner sneakers'), {'categories': [], 'products': []})
+
+    def test_changes_made_during_a_rebuild_survive_it(self):
+        upsert = CatalogIndex.upsert_product
+        index = self.index
+
+        def upsert_while_loading(snapshot, product_id, title):
+            # A save lands in the live index after the rebuild read the old titles
+            if snapshot is not index and product_id == self.tote.id:
+                index.upsert_product(999, 'Nova Desk Lamp')
+                index.remove_product(self.runner.id)
+            upsert(snapshot, product_id, title)
+
+        with mock.patch.object(CatalogIndex, 'upsert_product', autospec=True, side_effect=upsert_while_loading):
+            index.rebuild()
+
+        self.assertEqual(index.match('nova desk lamp')['products'], ['Nova Desk Lamp'])
+        self.assertEqual(index.match('kora blue runner')['products'], [])
+        self.assertEqual(len(index), 2)
+        self.assertIsNone(index._pending)
+
+
+class ResolveOrderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user(email='buyer@example.com', username='buyer', password='x')
+        # Saving an order writes its OrderLookup rows (chatbot.signals)
+        cls.first = CartOrder.objects.create(user=user, oid='11111111', sku='SKU22222222', tracking_id='TRK1')
+        cls.second = CartOrder.objects.create(user=user, oid='22222222', sku='SKU33333333', tracking_id='TRK2')
+        cls.third = CartOrder.objects.create(user=user, oid='33333333', sku='SKU44444444', tracking_id='22222222')
+
+    def test_candidates_keep_mention_order_and_strip_prefixes(self):
+        self.assertEqual(
+            candidate_references(['#ord22222222', 'TRK1', 'ORD22222222']),
+            ['ORD22222222', '22222222', 'TRK1'],
+        )
+
+    def test_first_mentioned_reference_wins(self):
+        self.assertEqual(resolve_order(['TRK2', '11111111']), self.second)
+        self.assertEqual(resolve_order(['11111111', 'TRK2']), self.first)
+
+    def test_order_id_beats_tracking_id_for_the_same_reference(self):
+        # "22222222" is the second order's oid and the third order's tracking id
+        self.assertEqual(resolve_order(['ORD22222222']), self.second)
+
+    def test_unknown_references(self):
+        self.assertIsNone(resolve_order(['99999999']))
+        self.assertIsNone(resolve_order([]))
+
+
+class IntentEngineTests(TestCase):
+    @staticmethod
+    def cascade(text, entities):
+        """The keyword cascade IntentEngine replaced, kept verbatim as the reference"""
+        text_lower = text.lower()
+        if any(keyword in text_lower for keyword in ['order', 'track', 'delivery', 'shipped', 'status']) or entities['order_ids']:
+            return 'order_inquiry'
+        if any(keyword in text_lower for keyword in ['search', 'find', 'show', 'looking for', 'want', 'need', 'buy', 'purchase', 'like', 'products']) or entities['products']:
+            return 'product_search'
+        if any(keyword in text_lower for keyword in ['stock', 'available', 'in stock', 'inventory']):
+            return 'stock_inquiry'
+        if any(keyword in text_lower for keyword in ['price', 'cost', 'how much', 'expensive', 'cheap']):
+            return 'price_inquiry'
+        if any(keyword in text_lower for keyword in ['category', 'browse', 'section', 'department', 'browse categories']):
+            return 'category_browse'
+        if any(keyword in text_lower for keyword in ['help', 'support', 'assist', 'question']):
+            return 'help_request'
+        if any(keyword in text_lower for keyword in ['return', 'refund', 'return policy', 'return item', 'how to return', 'return product']):
+            return 'return_policy'
+        return 'general_inquiry'
+
+    def test_rules_match_the_old_cascade(self):
+        engine = IntentEngine()
+        engine.reload_rules()
+
+        sample = {
+            'products': ['Kora Blue Runner', 'Zeal Gold Tote'],
+            'categories': ['Shoes', 'Bags'],
+            'colors': ['blue', 'gold'],
+            'orders': [('70000001', 'SKU0000001', 'TRK000000001')],
+        }
+        messages = [text for _, text in build_corpus(sample, 400, seed=1)] + [
+            'hello there', 'is the kettle in stock?', 'showroom hours', 'how much is shipping',
+            'I need help with a refund', 'returned', 'browse categories', 'statuses', '',
+        ]
+        entity_cases = [
+            {'order_ids': [], 'products': []},
+            {'order_ids': ['12345678'], 'products': []},
+            {'order_ids': [], 'products': ['Kettle']},
+            {'order_ids': ['12345678'], 'products': ['Kettle']},
+        ]
+        for text in messages:
+            for entities in entity_cases:
+                with self.subTest(text=text, entities=entities):
+                    self.assertEqual(engine.classify(text, entities).intent, self.cascade(text, entities))
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_calls_share_one_run(self):
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def work():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'reply'
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do('key', work)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(flight.do('key', work))) for _ in range(4)]
+        for thread in followers:
+            thread.start()
+        while flight.coalesced < 4:
+            time.sleep(0.01)
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['reply'] * 5)
+
+    def test_error_reaches_every_caller_and_the_key_is_released(self):
+        flight = SingleFlight()
+        with self.assertRaises(ValueError):
+            flight.do('key', mock.Mock(side_effect=ValueError))
+        self.assertEqual(flight.do('key', lambda: 'again'), 'again')
+
+
+class AdmissionGateTests(SimpleTestCase):
+    def test_rejects_when_the_queue_is_full(self):
+        gate = AdmissionGate(max_concurrency=1, max_queue=0, timeout=1)
+        with gate.admit() as first:
+            with gate.admit() as second:
+                self.assertTrue(first)
+                self.assertFalse(second)
+        self.assertEqual(gate.stats(), {'max_concurrency': 1, 'running': 0, 'waiting': 0, 'rejected': 1})
+
+    def test_queued_caller_times_out(self):
+        gate = AdmissionGate(max_concurrency=1, max_queue=1, timeout=0.05)
+        with gate.admit():
+            started = time.monotonic()
+            with gate.admit() as admitted:
+                self.assertFalse(admitted)
+            self.assertGreaterEqual(time.monotonic() - started, 0.05)
+        self.assertEqual(gate.rejected, 1)
+
+    def test_queued_caller_gets_the_freed_slot(self):
+        gate = AdmissionGate(max_concurrency=1, max_queue=1, timeout=5)
+        holding = threading.Event()
+
+        def hold():
+            with gate.admit():
+                holding.set()
+                time.sleep(0.05)
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        holding.wait(5)
+        with gate.admit() as admitted:
+            self.assertTrue(admitted)
+        holder.join(5)
+        self.assertEqual(gate.stats(), {'max_concurrency': 1, 'running': 0, 'waiting': 0, 'rejected': 0})
+
+
+@override_settings(CHATBOT_THROTTLE_RATES={'chat': (2, 0.5)})
+class TokenBucketThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = 1000.0
+        patcher = mock.patch('chatbot.v2.throttles.time.time', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request(self, session_id=None, ip='10.0.0.1'):
+        data = {'session_id': session_id} if session_id else {}
+        request = RequestFactory().post('/chatbot/chat/', data, content_type='application/json', REMOTE_ADDR=ip)
+        return Request(request, parsers=[JSONParser()])
+
+    def allow(self, **kwargs):
+        throttle = ChatThrottle()
+        return throttle.allow_request(self.request(**kwargs), None), throttle.wait()
+
+    def test_burst_then_refill(self):
+        self.assertEqual([self.allow()[0] for _ in range(3)], [True, True, False])
+        self.assertAlmostEqual(self.allow()[1], 2.0)
+
+        self.now += 1.0  # half a token
+        self.assertFalse(self.allow()[0])
+        self.now += 1.0
+        self.assertEqual([self.allow()[0] for _ in range(2)], [True, False])
+
+        self.now += 60  # refills to capacity, not beyond
+        self.assertEqual([self.allow()[0] for _ in range(3)], [True, True, False])
+
+    def test_clients_are_keyed_on_remote_addr(self):
+        forwarded = RequestFactory().post('/chatbot/chat/', {}, content_type='application/json',
+                                          REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='1.2.3.4')
+        self.assertEqual(ChatThrottle().get_ident(Request(forwarded)), '10.0.0.1')
+
+        self.allow(ip='10.0.0.1')
+        self.allow(ip='10.0.0.1')
+        self.assertFalse(self.allow(ip='10.0.0.1')[0])
+        self.assertTrue(self.allow(ip='10.0.0.2')[0])
+
+    def test_only_existing_sessions_get_a_bucket(self):
+        session = ChatSession.objects.create()
+        throttle = ChatThrottle()
+        self.assertEqual(len(throttle.bucket_keys(self.request(session_id='chat_made_up'))), 1)
+        self.assertEqual(len(throttle.bucket_keys(self.request(session_id=session.session_id))), 2)
+
+        # A session's bucket holds across client addresses
+        self.allow(session_id=session.session_id, ip='10.0.0.1')
+        self.allow(session_id=session.session_id, ip='10.0.0.2')
+        self.assertFalse(self.allow(session_id=session.session_id, ip='10.0.0.3')[0])
+
+
+class TranscriptQueueTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.spool_dir = directory.name
+        self.session = ChatSession.objects.create()
+
+    def queue(self):
+        return TranscriptQueue(self.spool_dir, flush_size=1000, flush_interval=3600)
+
+    def enqueue(self, queue, text):
+        queue.enqueue(self.session, [
+            ChatMessage(message_type='user', content=text),
+            ChatMessage(message_type='bot', content=f'reply to {text}'),
+        ])
+
+    def crash(self, queue):
+        """Leave the queue's spool behind the way a killed process would"""
+        queue._spool.close()
+        queue._pending = []
+
+    def contents(self):
+        return list(ChatMessage.objects.filter(session=self.session).values_list('content', flat=True))
+
+    def test_flush_writes_turns_in_order_and_drops_the_spool(self):
+        queue = self.queue()
+        self.enqueue(queue, 'first')
+        self.enqueue(queue, 'second')
+        self.assertEqual(len(queue.pending_messages(self.session)), 4)
+
+        self.assertEqual(queue.flush(), 2)
+        self.assertEqual(self.contents(), ['first', 'reply to first', 'second', 'reply to second'])
+        self.assertEqual(queue.pending_messages(self.session), [])
+        self.assertEqual(os.listdir(self.spool_dir), [os.path.basename(queue._spool_path())])
+        self.assertEqual(os.path.getsize(queue._spool_path()), 0)
+
+    def test_failed_flush_keeps_the_turns_spooled(self):
+        queue = self.queue()
+        self.enqueue(queue, 'first')
+        with mock.patch.object(transcript_queue, 'write_turns', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                queue.flush()
+        self.enqueue(queue, 'second')
+        with open(queue._spool_path(), encoding='utf-8') as spool:
+            self.assertEqual(len(spool.readlines()), 2)
+
+        self.assertEqual(queue.flush(), 2)
+        self.assertEqual(self.contents(), ['first', 'reply to first', 'second', 'reply to second'])
+
+    def test_live_spools_are_left_alone(self):
+        queue = self.queue()
+        self.enqueue(queue, 'first')
+        self.assertEqual(recover_spools(self.spool_dir), 0)
+        self.assertEqual(queue.flush(), 1)
+        self.assertEqual(len(self.contents()), 2)
+
+    def test_restarted_worker_with_the_same_pid_recovers_the_crashed_spool(self):
+        # Both queues live in this process, so the dead one's spool carries our own PID
+        crashed = self.queue()
+        self.enqueue(crashed, 'before the crash')
+        self.crash(crashed)
+
+        with override_settings(CHATBOT_TRANSCRIPT_WRITE_BEHIND=True, CHATBOT_TRANSCRIPT_SPOOL_DIR=self.spool_dir,
+                               CHATBOT_TRANSCRIPT_FLUSH_MS=3600 * 1000):
+            restarted = create_transcript_queue()
+        self.assertEqual(self.contents(), ['before the crash', 'reply to before the crash'])
+
+        self.enqueue(restarted, 'after the restart')
+        self.assertEqual(restarted.flush(), 1)
+        self.assertEqual(len(self.contents()), 4)
+        self.assertEqual(os.listdir(self.spool_dir), [os.path.basename(restarted._spool_path())])
+
+    def test_concurrent_recoveries_replay_each_spool_once(self):
+        for text in ('first', 'second'):
+            crashed = self.queue()
+            self.enqueue(crashed, text)
+            self.crash(crashed)
+
+        write_turns = transcript_queue.write_turns
+        nested = []
+
+        def write_during_another_recovery(turns):
+            # A second worker starts its recovery while the first is mid-write
+            if not nested:
+                nested.append(None)
+                nested[0] = recover_spools(self.spool_dir)
+            write_turns(turns)
+
+        with mock.patch.object(transcript_queue, 'write_turns', side_effect=write_during_another_recovery):
+            recovered = recover_spools(self.spool_dir)
+
+        self.assertEqual(recovered + nested[0], 2)
+        self.assertEqual(sorted(self.contents()), ['first', 'reply to first', 'reply to second', 'second'])
+        self.assertEqual(os.listdir(self.spool_dir), [])
+
+    def test_abandoned_recovery_is_picked_up_again(self):
+        crashed = self.queue()
+        self.enqueue(crashed, 'first')
+        self.crash(crashed)
+        path = crashed._spool_path()
+        os.rename(path, path.replace('.jsonl', '.0123abcd.recovering'))
+
+        self.assertEqual(recover_spools(self.spool_dir), 1)
+        self.assertEqual(recover_spools(self.spool_dir), 0)
+        self.assertEqual(len(self.contents()), 2)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_opens_after_consecutive_failures_and_a_probe_closes_it(self):
+        probed = threading.Event()
+
+        def probe():
+            probed.set()
+            return True
+
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.01, probe=probe)
+        breaker.record_failure()
+        breaker.record_success()  # resets the count
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'closed')
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        self.assertFalse(breaker.allow())
+
+        self.assertTrue(probed.wait(5))
+        deadline = time.monotonic() + 5
+        while not breaker.allow() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(breaker.state, 'closed')
+
+    def test_stays_open_while_probes_fail(self):
+        probes = []
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01, probe=lambda: probes.append(1) or False)
+        breaker.record_failure()
+        while len(probes) < 3:
+            time.sleep(0.01)
+        self.assertEqual(breaker.state, 'open')
+        breaker.record_success()
+
+
+class LLMHttpClientTests(SimpleTestCase):
+    payload = {'model': 'local-model', 'messages': [{'role': 'user', 'content': 'hi'}]}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = start_llm_stub(reply='Hello from the stub', latency=0, token_delay=0)
+        cls.addClassCleanup(cls.server.shutdown)
+
+    def setUp(self):
+        self.client = LLMHttpClient(stub_base_url(self.server), failure_threshold=2, reset_timeout=60)
+
+    def test_post_json(self):
+        response = self.client.post_json('chat/completions', self.payload)
+        self.assertEqual(response.json()['choices'][0]['message']['content'], 'Hello from the stub')
+        self.assertTrue(self.client.ping())
+
+    def test_stream_lines(self):
+        with self.client.stream_lines('chat/completions', dict(self.payload, stream=True)) as lines:
+            events = [line for line in lines if line]
+        self.assertEqual(len(events), 5)
+        self.assertEqual(events[-1], 'data: [DONE]')
+
+    def test_astream_lines_reuses_one_client_per_loop(self):
+        async def stream_twice():
+            events = []
+            for _ in range(2):
+                async with self.client.astream_lines('chat/completions', dict(self.payload, stream=True)) as lines:
+                    events.append([line async for line in lines if line])
+            return events, len(self.client._async_clients)
+
+        events, clients = asyncio.run(stream_twice())
+        self.assertEqual([len(lines) for lines in events], [5, 5])
+        self.assertEqual(clients, 1)
+
+    def test_unreachable_server_opens_the_breaker(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        client = LLMHttpClient(f'http://127.0.0.1:{port}/v1', failure_threshold=2, reset_timeout=60)
+        client.breaker._probe = lambda: False
+        self.addCleanup(client.breaker.record_success)  # stops the probe thread
+
+        for _ in range(2):
+            with self.assertRaises(Exception):
+                client.post_json('chat/completions', self.payload)
+        self.assertEqual(client.breaker.state, 'open')
+        with mock.patch.object(client.session, 'post') as post:
+            with self.assertRaises(CircuitOpenError):
+                client.post_json('chat/completions', self.payload)
+            with self.assertRaises(CircuitOpenError):
+                with client.stream_lines('chat/completions', self.payload):
+                    pass
+        post.assert_not_called()
+
+        # A 4xx is the request's fault, not the server's
+        self.client.post_json('missing', self.payload)
+        self.assertEqual(self.client.breaker.state, 'closed')
+
+
+class ChatStreamTests(TestCase):
+    reply = 'Hello from the stub'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = start_llm_stub(reply=cls.reply, latency=0, token_delay=0)
+        cls.addClassCleanup(cls.server.shutdown)
+
+    def setUp(self):
+        cache.clear()
+        with override_settings(LM_STUDIO_BASE_URL=stub_base_url(self.server), OPENAI_API_KEY=''):
+            llm_service = LLMService()
+        patcher = mock.patch.object(get_chat_service(), 'llm_service', llm_service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def events(body):
+        events = []
+        for block in body.decode().split('\n\n'):
+            if block:
+                event, data = block.split('\n')
+                events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+        return events
+
+    def check_stream(self, events):
+        names = [name for name, _ in events]
+        self.assertEqual(names[0], 'meta')
+        self.assertEqual(names[-1], 'done')
+        self.assertEqual(set(names[1:-1]), {'token'})
+        self.assertEqual(len(names), 2 + len(self.reply.split(' ')))
+
+        streamed = ''.join(data['token'] for name, data in events if name == 'token')
+        done = events[-1][1]
+        self.assertEqual(streamed, self.reply)
+        self.assertEqual(done['message'], self.reply)
+        session = ChatSession.objects.get(session_id=events[0][1]['session_id'])
+        self.assertEqual(done['session_id'], session.session_id)
+        self.assertEqual(
+            list(session.messages.values_list('message_type', 'content')),
+            [('user', 'tell me about your store'), ('bot', self.reply)],
+        )
+
+    def test_wsgi_stream(self):
+        response = self.client.post('/chatbot/chat/stream/', {'message': 'tell me about your store'},
+                                    content_type='application/json')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.check_stream(self.events(b''.join(response.streaming_content)))
+
+    async def test_asgi_stream(self):
+        response = await self.async_client.post('/chatbot/chat/stream/', {'message': 'tell me about your store'},
+                                                content_type='application/json')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        await sync_to_async(self.check_stream)(self.events(body))
+
+    def test_cached_reply_is_streamed_as_one_token(self):
+        tokens = []
+        for _ in range(2):
+            # The reply is cached once the model's stream has been relayed in full
+            response = self.client.post('/chatbot/chat/stream/', {'message': 'tell me about your store'},
+                                        content_type='application/json')
+            events = self.events(b''.join(response.streaming_content))
+            tokens.append([data['token'] for name, data in events if name == 'token'])
+        self.assertEqual(tokens, [['Hello', ' from', ' the', ' stub'], [self.reply]])
+
+
+class ResponseCacheTests(SimpleTestCase):
+    context = {'intent': 'general_inquiry', 'entities': {'products': []}}
+
+    def setUp(self):
+        cache.clear()
+
+    def test_normalization(self):
+        self.assertEqual(normalize_message('  What IS your return-policy?! '), 'what is your return policy')
+        self.assertEqual(near_duplicate_text('What is your return policy?'), 'policy return')
+        self.assertEqual(near_duplicate_text('policy, return please'), 'policy return')
+        # Nothing but filler words: keep them rather than key on an empty string
+        self.assertEqual(near_duplicate_text('Hello, can you?'), 'can hello you')
+
+    def test_exact_lookup_is_keyed_on_message_and_context(self):
+        responses = ResponseCache(alias='default', timeout=60)
+        responses.set('What is your return policy?', self.context, '30 days')
+        self.assertEqual(responses.get('what is your RETURN policy', self.context), '30 days')
+        self.assertIsNone(responses.get('return policy', self.context))
+        self.assertIsNone(responses.get('What is your return policy?', dict(self.context, intent='return_policy')))
+        self.assertIsNone(responses.get('What is your return policy?', dict(self.context, entities={'products': ['Kettle']})))
+        self.assertEqual(responses.stats(), {'hits': 1, 'near_hits': 0, 'misses': 3, 'hit_rate': 0.25})
+
+    def test_near_duplicates(self):
+        responses = ResponseCache(alias='default', timeout=60, near_duplicates=True)
+        responses.set('What is your return policy?', self.context, '30 days')
+        self.assertEqual(responses.get('return policy please', self.context), '30 days')
+        self.assertIsNone(responses.get('return shipping policy', self.context))
+        self.assertEqual(responses.stats()['near_hits'], 1)
+
+    def test_history_and_fallbacks_are_not_cached(self):
+        responses = ResponseCache(alias='default', timeout=60)
+        with_history = dict(self.context, history={'turns': [{'user': 'hi', 'bot': 'hello'}]})
+        responses.set('and shipping?', with_history, 'free over $50')
+        self.assertIsNone(responses.get('and shipping?', with_history))
+        self.assertIsNone(responses.get('and shipping?', self.context))
+
+        responses.set('shipping?', self.context, None)
+        self.assertIsNone(responses.get('shipping?', self.context))
+
+        disabled = ResponseCache(alias='default', timeout=0)
+        disabled.set('shipping?', self.context, 'free')
+        self.assertIsNone(disabled.get('shipping?', self.context))
+
+
+class SaveTurnTests(TestCase):
+    # Static replies, so the handler itself doesn't touch the database
+    message = 'what is your return policy'
+
+    def setUp(self):
+        cache.clear()
+        self.chat_service = get_chat_service()
+
+    def test_new_session_is_written_in_one_transaction(self):
+        # Inside the test's transaction the turn's transaction shows up as a savepoint
+        with self.assertNumQueries(4):  # SAVEPOINT, session INSERT, messages INSERT, RELEASE
+            result = self.chat_service.process_message(self.message)
+
+        session = ChatSession.objects.get(session_id=result['session_id'])
+        self.assertEqual(list(session.messages.values_list('message_type', flat=True)), ['user', 'bot'])
+        self.assertEqual(session.metadata['last_bot_message'], result['message'])
+
+    def test_follow_up_turn_is_one_read_and_one_write(self):
+        session_id = self.chat_service.process_message(self.message)['session_id']
+        with self.assertNumQueries(5):  # session SELECT, then SAVEPOINT, session UPDATE, messages INSERT, RELEASE
+            result = self.chat_service.process_message(self.message, session_id)
+
+        # The repeat check reads the previous reply from the session's metadata
+        self.assertEqual(result['message'], 'Let me know how else I can assist you.')
+        self.assertEqual(ChatMessage.objects.filter(session__session_id=session_id).count(), 4)
+
+    def test_failed_insert_leaves_no_half_written_turn(self):
+        with mock.patch.object(ChatMessage.objects, 'bulk_create', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.chat_service.process_message(self.message)
+        self.assertFalse(ChatSession.objects.exists())
+
+
+class ProductCursorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.lamps = [
+            Product.objects.create(title=f'Lamp {number}', base_price=10, max_price=20, product_status='published')
+            for number in range(10)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        backend = BM25SearchBackend()
+        backend.rebuild()
+        patcher = mock.patch.object(search, '_backend', backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.chat_service = get_chat_service()
+        searches = mock.patch.object(chat_service, 'search_product_ids', wraps=chat_service.search_product_ids)
+        self.searches = searches.start()
+        self.addCleanup(searches.stop)
+
+    def turn(self, message, session_id=None):
+        result = self.chat_service.process_message(message, session_id)
+        return result, [product['title'] for product in (result['data'] or {}).get('products', [])]
+
+    def test_pages_are_sliced_from_one_search(self):
+        result, first = self.turn('show me lamps')
+        self.assertEqual(result['intent'], 'product_search')
+        self.assertEqual(len(first), 4)
+        self.assertIn('Show more products', result['suggestions'])
+
+        pages = [first]
+        for _ in range(2):
+            result, page = self.turn('show more products', result['session_id'])
+            pages.append(page)
+        self.assertEqual([len(page) for page in pages], [4, 4, 2])
+        self.assertEqual(len({title for page in pages for title in page}), 10)
+        self.assertNotIn('Show more products', result['suggestions'])
+        self.assertEqual(self.searches.call_count, 1)
+
+    def test_expired_cursor_searches_again_at_the_same_offset(self):
+        result, first = self.turn('show me lamps')
+        session = ChatSession.objects.get(session_id=result['session_id'])
+        session.metadata['product_cursor']['expires_at'] = 0
+        session.save()
+        cache.clear()
+
+        result, second = self.turn('show more products', result['session_id'])
+        self.assertEqual(self.searches.call_count, 2)
+        self.assertEqual(len(second), 4)
+        self.assertFalse(set(first) & set(second))
+        self.assertEqual(ChatSession.objects.get(pk=session.pk).metadata['product_cursor']['offset'], 8)
+
+    @override_settings(CHATBOT_PRODUCT_CURSOR_MAX_RESULTS=6)
+    def test_paging_stops_at_the_cached_results(self):
+        result, _ = self.turn('show me lamps')
+        self.assertEqual(result['message'], '🛍️ I found 10 product(s). Here are some:')
+        result, page = self.turn('show more products', result['session_id'])
+        self.assertEqual(len(page), 2)
+        self.assertNotIn('Show more products', result['suggestions'])
+
+
+class ProductVectorStoreTests(TestCase):
+    descriptions = {
+        'Espresso Machine': 'Brews espresso coffee with a steam wand for milk',
+        'Yoga Mat': 'Non slip exercise mat for yoga and pilates',
+        'Hiking Boots': 'Waterproof leather boots for mountain trails',
+        'Desk Lamp': 'Bright adjustable reading light for the office',
+        'Cast Iron Pan': 'Heavy skillet for searing steak on the stove',
+        'Rain Jacket': 'Lightweight hooded jacket that keeps rain out',
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = {
+            title: Product.objects.create(title=title, description=description, base_price=10, max_price=20,
+                                          product_status='published')
+            for title, description in cls.descriptions.items()
+        }
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        build_vector_store(directory.name, dim=5)
+        self.store = ProductVectorStore(directory.name)
+        self.store.load()
+
+    def top(self, text):
+        return Product.objects.get(pk=self.store.search(text, k=1)[0][0]).title
+
+    def test_search(self):
+        self.assertEqual(len(self.store), 6)
+        self.assertEqual(self.top('espresso coffee'), 'Espresso Machine')
+        self.assertEqual(self.top('boots for the mountain'), 'Hiking Boots')
+        self.assertEqual(self.store.search('zzz unknown words'), [])
+
+    def test_changed_products_are_re_embedded(self):
+        lamp = self.products['Desk Lamp']
+        lamp.description = 'Brews espresso coffee with a steam wand for milk'
+        lamp.save()
+        self.store.refresh_products([lamp.id])
+
+        self.assertEqual(len(self.store), 6)
+        hits = dict(self.store.search('espresso coffee', k=2))
+        self.assertEqual(set(hits), {lamp.id, self.products['Espresso Machine'].id})
+        self.assertNotEqual(self.top('reading light office'), 'Desk Lamp')
+
+        pan_id = self.products['Cast Iron Pan'].id
+        Product.objects.filter(pk=pan_id).delete()
+        self.store.refresh_products([pan_id])
+        self.assertEqual(len(self.store), 5)
+        self.assertNotIn(pan_id, dict(self.store.search('skillet steak', k=6)))
+
+    @override_settings(CHATBOT_CATALOG_REFRESH_SECONDS=0)
+    def test_changes_from_other_processes(self):
+        jacket = self.products['Rain Jacket']
+        Product.objects.filter(pk=jacket.pk).update(product_status='draft', description='Non slip exercise mat for yoga')
+        record_product_change(jacket.id)
+
+        self.store.ensure_fresh()
+        self.assertEqual(set(dict(self.store.search('yoga mat', k=2))), {jacket.id, self.products['Yoga Mat'].id})
+        # Unpublished products never reach the prompt
+        self.assertEqual([snippet['title'] for snippet in self.store.snippets('yoga mat', k=2)], ['Yoga Mat'])
+
+    def test_only_embedded_fields_signal_a_change(self):
+        version = cache.get(VECTOR_VERSION_KEY)
+        boots = Product.objects.get(pk=self.products['Hiking Boots'].pk)
+        boots.stock_count = '2'
+        boots.save()
+        self.assertEqual(cache.get(VECTOR_VERSION_KEY), version)
+
+        boots.description = 'Insulated winter boots'
+        boots.save()
+        self.assertEqual(cache.get(VECTOR_VERSION_KEY), (version or 0) + 1)
+
+
+class ConversationWindowTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.window = ConversationWindow(token_budget=30, summary_budget=14, turn_tokens=10)
+
+    def test_clip(self):
+        self.assertEqual(estimate_tokens(''), 0)
+        self.assertEqual(estimate_tokens('abcdefgh'), 2)
+        self.assertEqual(clip('<p>Hello   <b>there</b></p>', 10), 'Hello there')
+        self.assertEqual(clip('one two three four five six', 3), 'one two…')
+
+    def test_old_turns_fold_into_a_bounded_summary(self):
+        session = ChatSession()
+        self.assertIsNone(self.window.prompt_history(session))
+
+        for number in range(8):
+            intent = 'product_search' if number < 6 else 'order_inquiry'
+            self.window.append(session, f'question {number} about lamps', f'answer {number} ' + 'x' * 30, intent, save=False)
+
+            window = self.window.load(session)
+            self.assertLessEqual(self.window._turn_tokens(window['turns']), 30)
+            self.assertLessEqual(self.window._summary_tokens(window['summary']), 14)
+            self.assertEqual(window['turns'][-1][0], f'question {number} about lamps')
+
+        history = self.window.prompt_history(session)
+        self.assertEqual(history['turns'], [
+            {'user': 'question 6 about lamps', 'bot': 'answer 6 ' + 'x' * 30},
+            {'user': 'question 7 about lamps', 'bot': 'answer 7 ' + 'x' * 30},
+        ])
+        # Consecutive turns of one intent share a line; the oldest notes were dropped to fit
+        self.assertEqual(history['summary'], [
+            'product_search: question 4 about lamps; question 5 about lamps',
+        ])
+
+    def test_prompt_messages(self):
+        history = {'summary': ['product_search: lamps'], 'turns': [{'user': 'any kettles?', 'bot': 'Two kettles.'}]}
+        messages = LLMService._chat_messages('You help shoppers.', 'the cheaper one?', {'history': history})
+        self.assertEqual(messages, [
+            {'role': 'system', 'content': 'You help shoppers.\nEarlier in this conversation the customer asked about:\n- product_search: lamps'},
+            {'role': 'user', 'content': 'any kettles?'},
+            {'role': 'assistant', 'content': 'Two kettles.'},
+            {'role': 'user', 'content': 'the cheaper one?'},
+        ])
+
+    def test_an_oversized_turn_is_clipped_but_kept(self):
+        session = ChatSession()
+        self.window.append(session, 'word ' * 100, 'reply ' * 100, save=False)
+        user, bot, intent = self.window.load(session)['turns'][0]
+        self.assertLessEqual(len(user), 41)
+        self.assertTrue(bot.endswith('…'))
+        self.assertEqual(intent, 'general_inquiry')
+
+    def test_window_is_cached_and_reseeded_after_eviction(self):
+        session = ChatSession.objects.create()
+        self.window.append(session, 'first', 'first reply', 'help_request')
+        ChatMessage.objects.bulk_create([
+            ChatMessage(session=session, message_type='user', content='first', metadata={'intent': 'help_request'}),
+            ChatMessage(session=session, message_type='bot', content='first reply'),
+        ])
+
+        with self.assertNumQueries(0):
+            turns = self.window.load(ChatSession(pk=session.pk, session_id=session.session_id))['turns']
+        self.assertEqual(turns, [['first', 'first reply', 'help_request']])
+
+        cache.clear()
+        fresh = ChatSession.objects.get(pk=session.pk)
+        with self.assertNumQueries(1):
+            turns = self.window.load(fresh)['turns']
+        self.assertEqual(turns, [['first', 'first reply', 'help_request']])
+
+
+class ChatArchiveTests(TestCase):
+    def setUp(self):
+        self.long_ago = timezone.now() - timedelta(days=3)
+
+    def make_session(self, turns, idle=True):
+        session = ChatSession.objects.create()
+        for number in range(turns):
+            ChatMessage.objects.bulk_create([
+                ChatMessage(session=session, message_type='user', content=f'question {number}', metadata={'intent': 'help_request'}),
+                ChatMessage(session=session, message_type='bot', content=f'answer {number} ✓'),
+            ])
+        if idle:
+            for position, message in enumerate(session.messages.order_by('id')):
+                ChatMessage.objects.filter(pk=message.pk).update(timestamp=self.long_ago + timedelta(seconds=position))
+            ChatSession.objects.filter(pk=session.pk).update(updated_at=self.long_ago)
+        return session
+
+    def test_expired_sessions_are_archived_and_rehydrated(self):
+        expired = self.make_session(2)
+        active = self.make_session(1, idle=False)
+        before = list(expired.messages.order_by('timestamp').values_list('id', 'message_type', 'content', 'metadata', 'timestamp'))
+
+        totals = archive_expired_sessions(hours=24)
+        self.assertEqual((totals['sessions'], totals['messages']), (1, 4))
+        self.assertFalse(ChatMessage.objects.filter(session=expired).exists())
+        self.assertEqual(ChatMessage.objects.filter(session=active).count(), 2)
+
+        expired.refresh_from_db()
+        self.assertFalse(expired.is_active)
+        self.assertEqual(expired.archive.message_count, 4)
+        self.assertEqual(
+            [(m.id, m.message_type, m.content, m.metadata, m.timestamp) for m in archived_messages(expired)],
+            before,
+        )
+        self.assertEqual(archived_messages(active), [])
+
+    def test_history_shows_archived_and_newer_messages(self):
+        session = self.make_session(1)
+        archive_expired_sessions(hours=24)
+        ChatMessage.objects.create(session=session, message_type='bot', content='late reply')
+
+        response = self.client.get(f'/chatbot/session/{session.session_id}/history/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([m['content'] for m in response.json()['messages']], ['question 0', 'answer 0 ✓', 'late reply'])
+
+    def test_a_failed_batch_leaves_sessions_untouched(self):
+        session = self.make_session(1)
+        with mock.patch.object(ChatArchive.objects, 'bulk_create', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                archive_expired_sessions(hours=24)
+        session.refresh_from_db()
+        self.assertTrue(session.is_active)
+        self.assertEqual(session.messages.count(), 2)
+
+    def test_batches_and_limit(self):
+        for _ in range(3):
+            self.make_session(1)
+        self.assertEqual(archive_expired_sessions(hours=24, batch_size=2, limit=2)['sessions'], 2)
+        self.assertEqual(archive_expired_sessions(hours=24, batch_size=2)['sessions'], 1)
+        self.assertEqual(ChatArchive.objects.count(), 3)
+        self.assertFalse(ChatMessage.objects.exists())
+
+
+class AnalyticsSinkTests(TestCase):
+    def setUp(self):
+        self.session = ChatSession.objects.create()
+        self.lamp = Product.objects.create(title='Desk Lamp', base_price=10, max_price=20)
+        self.chair = Product.objects.create(title='Office Chair', base_price=10, max_price=20)
+        # Flushed by hand; the background thread only wakes once an hour
+        self.sink = AnalyticsSink(flush_size=1000, flush_interval=3600)
+
+    def record(self, intent='product_search', results=0, total=10.0, session_id=None):
+        return self.sink.record(session_id or self.session.session_id, 'lamps', intent, {}, results, {'total': total})
+
+    def rollups(self):
+        return {
+            (r.intent, r.result_bucket): (r.queries, r.clicks, r.total_latency_ms)
+            for r in ChatAnalyticsRollup.objects.all()
+        }
+
+    def test_result_buckets(self):
+        self.assertEqual([result_bucket(n) for n in (0, 1, 4, 5, 19, 20, 500)], ['0', '1-4', '1-4', '5-19', '5-19', '20+', '20+'])
+
+    def test_queries_are_rolled_up_per_intent_and_bucket(self):
+        self.record(results=0, total=5)
+        self.record(results=7, total=10)
+        self.record(results=12, total=30)
+        self.record(intent='greeting', total=1)
+        self.record(session_id='gone')  # its session no longer exists
+
+        self.sink.flush()
+        self.assertEqual(ProductQuery.objects.count(), 4)
+        self.assertEqual(self.rollups(), {
+            ('product_search', '0'): (1, 0, 5.0),
+            ('product_search', '5-19'): (2, 0, 40.0),
+            ('greeting', '0'): (1, 0, 1.0),
+        })
+
+        # A later batch increments the same rows
+        self.record(results=7, total=20)
+        self.assertEqual(self.sink.flush(), 1)
+        self.assertEqual(self.rollups()[('product_search', '5-19')], (3, 0, 60.0))
+
+    def test_only_the_first_click_on_a_query_counts(self):
+        reference = self.record(results=7)
+        self.sink.record_click(reference, self.lamp.id)
+        self.sink.flush()
+        self.sink.record_click(reference, self.chair.id)
+        self.sink.flush()
+
+        self.assertEqual(ProductQuery.objects.get(reference=reference).clicked_product_id, self.lamp.id)
+        self.assertEqual(self.rollups()[('product_search', '5-19')], (1, 1, 10.0))
+
+    def test_early_clicks_are_retried_then_dropped(self):
+        # The click reached this worker before the query did
+        other = AnalyticsSink(flush_size=1000, flush_interval=3600)
+        reference = other.record(self.session.session_id, 'lamps', 'product_search', {}, 3)
+        self.sink.record_click(reference, self.lamp.id)
+        self.assertEqual(self.sink.flush(), 0)
+
+        other.flush()
+        self.assertEqual(self.sink.flush(), 1)
+        self.assertEqual(ProductQuery.objects.get(reference=reference).clicked_product_id, self.lamp.id)
+        self.assertEqual(self.rollups()[('product_search', '1-4')][1], 1)
+
+        self.sink.record_click('unknown', self.lamp.id)
+        for _ in range(AnalyticsSink.CLICK_RETRIES + 1):
+            self.sink.flush()
+        self.assertEqual(self.sink.dropped_clicks, 1)
+        self.assertEqual(self.sink.flush(), 0)
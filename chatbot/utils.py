@@ -79,19 +79,20 @@ def get_chat_suggestions(intent: str, context: Dict[str, Any]) -> List[str]:
         "Get help"
     ])
 
-def log_chat_analytics(session_id: str, intent: str, entities: Dict[str, Any]):
-    """Log chat analytics (placeholder for future analytics system)"""
-    analytics_data = {
-        'session_id': session_id,
-        'intent': intent,
-        'entities': entities,
-        'timestamp': timezone.now().isoformat()
-    }
-    
-    # Here you could send to analytics service, log to file, etc.
-    print(f"Analytics: {analytics_data}")
+def log_chat_analytics(session_id: str, intent: str, entities: Dict[str, Any], query_text: str = '',
+                       results_count: int = 0, timings: Dict[str, float] = None):
+    """Record a chat query in the buffered analytics sink; returns its reference, or None when analytics are off"""
+    from chatbot.services.registry import get_analytics_sink
+
+    sink = get_analytics_sink()
+    if sink is None:
+        return None
+    return sink.record(session_id, query_text, intent, entities, results_count=results_count, timings=timings)
+
+def session_expiry_cutoff(hours=24):
+    """Sessions last active before this time are expired"""
+    return timezone.now() - timedelta(hours=hours)
 
 def is_session_expired(session_created_at, hours=24):
     """Check if chat session is expired"""
-    expiry_time = session_created_at + timedelta(hours=hours)
-    return timezone.now() > expiry_time
\ No newline at end of file
+    return session_created_at < session_expiry_cutoff(hours)
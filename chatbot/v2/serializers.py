@@ -40,8 +40,8 @@ class OrderSerializer(serializers.ModelSerializer):
         ]
     
     def get_items(self, obj):
-        from core.models import CartOrderProducts
-        items = CartOrderProducts.objects.filter(order=obj)
+        # Served from the prefetch cache when the order came from `resolve_order`
+        items = obj.cartorderproducts_set.all()
         return [{
             'name': item.item,
             'quantity': item.qty,
@@ -58,6 +58,12 @@ class ChatRequestSerializer(serializers.Serializer):
     message = serializers.CharField(max_length=1000)
     session_id = serializers.CharField(max_length=25, required=False)
     user_id = serializers.IntegerField(required=False)
+    debug = serializers.BooleanField(required=False, default=False)  # include per-stage timings in the reply
+
+class ChatBatchRequestSerializer(serializers.Serializer):
+    """Serializer for batched chat requests"""
+    messages = ChatRequestSerializer(many=True, allow_empty=False, max_length=500)
+    batch_size = serializers.IntegerField(required=False, min_value=1, max_value=1000)
 
 class ChatResponseSerializer(serializers.Serializer):
     """Serializer for chat responses"""
@@ -0,0 +1,134 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from chatbot.models import ChatSession
+
+# Refills and takes a token from every bucket in KEYS, or none if one is empty.
+# Returns the seconds to wait as a string ('0' when the request may go ahead).
+TAKE_TOKEN_SCRIPT = """
+local capacity, rate, now, ttl = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local levels, wait = {}, 0
+for i, key in ipairs(KEYS) do
+    local bucket = redis.call('HMGET', key, 'tokens', 'updated')
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+    levels[i] = tokens
+    if tokens < 1 then
+        wait = math.max(wait, (1 - tokens) / rate)
+    end
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i, key in ipairs(KEYS) do
+    redis.call('HSET', key, 'tokens', tostring(levels[i] - 1), 'updated', tostring(now))
+    redis.call('EXPIRE', key, ttl)
+end
+return '0'
+"""
+
+# Serializes bucket updates in this process for caches without a server-side script
+_local_lock = threading.Lock()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Token bucket per client IP, plus one per chat session when the request names one.
+
+    CHATBOT_THROTTLE_RATES maps each `scope` to `(capacity, refill_per_second)`:
+    a client may burst `capacity` requests, then gets one more every
+    1 / refill_per_second seconds. A scope without a rate is not limited.
+    Buckets live in the CHATBOT_THROTTLE_CACHE_ALIAS cache. With Redis they are
+    shared between workers and updated by a Lua script, so concurrent requests
+    can't overdraw them; with other backends updates are serialized within the
+    process, which is enough for the per-process local memory cache.
+
+    The client IP is REMOTE_ADDR unless REST_FRAMEWORK['NUM_PROXIES'] says how
+    many proxies' X-Forwarded-For entries to trust.
+    """
+
+    scope = None
+
+    def __init__(self):
+        rate = getattr(settings, 'CHATBOT_THROTTLE_RATES', {}).get(self.scope)
+        self.capacity, self.refill_rate = rate if rate else (None, None)
+        self.cache = caches[getattr(settings, 'CHATBOT_THROTTLE_CACHE_ALIAS', 'default')]
+        self.retry_after = None
+
+    def get_ident(self, request):
+        if api_settings.NUM_PROXIES is None:
+            # Without a known proxy count X-Forwarded-For is client-controlled
+            return request.META.get('REMOTE_ADDR')
+        return super().get_ident(request)
+
+    def bucket_keys(self, request):
+        keys = [f"chatbot:throttle:{self.scope}:ip:{self.get_ident(request)}"]
+        session_id = request.data.get('session_id') if hasattr(request.data, 'get') else None
+        # The id is client-chosen; only a session that exists gets a bucket
+        if session_id and ChatSession.objects.filter(session_id=str(session_id), is_active=True).exists():
+            keys.append(f"chatbot:throttle:{self.scope}:session:{session_id}")
+        return keys
+
+    def allow_request(self, request, view):
+        # Only writes are limited; e.g. GET on the chat endpoint just renders the UI
+        if not self.capacity or request.method not in ('POST', 'PUT', 'PATCH', 'DELETE'):
+            return True
+
+        keys = self.bucket_keys(request)
+        # A full bucket refills completely within this many seconds, so it can expire then
+        timeout = int(self.capacity / self.refill_rate) + 1
+        if isinstance(self.cache, RedisCache):
+            wait = self._take_token_redis(keys, timeout)
+        else:
+            wait = self._take_token_local(keys, timeout)
+
+        if wait > 0:
+            self.retry_after = wait
+            return False
+        return True
+
+    def _take_token_redis(self, keys, timeout) -> float:
+        keys = [self.cache.make_and_validate_key(key) for key in keys]
+        client = self.cache._cache.get_client(keys[0], write=True)
+        script = client.register_script(TAKE_TOKEN_SCRIPT)
+        return float(script(keys=keys, args=[self.capacity, self.refill_rate, time.time(), timeout]))
+
+    def _take_token_local(self, keys, timeout) -> float:
+        with _local_lock:
+            now = time.time()
+            stored = self.cache.get_many(keys)
+            buckets = {}
+            for key in keys:
+                tokens, updated = stored.get(key, (self.capacity, now))
+                buckets[key] = min(self.capacity, tokens + (now - updated) * self.refill_rate)
+
+            if any(tokens < 1 for tokens in buckets.values()):
+                return max((1 - tokens) / self.refill_rate for tokens in buckets.values() if tokens < 1)
+
+            self.cache.set_many({key: (tokens - 1, now) for key, tokens in buckets.items()}, timeout)
+            return 0.0
+
+    def wait(self):
+        return self.retry_after
+
+
+class ChatThrottle(TokenBucketThrottle):
+    scope = 'chat'
+
+
+class SessionCreateThrottle(TokenBucketThrottle):
+    scope = 'session_create'
+
+
+class QuickSearchThrottle(TokenBucketThrottle):
+    scope = 'quick_search'
+
+
+class AnalyticsClickThrottle(TokenBucketThrottle):
+    scope = 'analytics_click'
@@ -1,11 +1,17 @@
 from django.urls import path
-from chatbot.v2.views import ChatAPIView, ChatHistoryAPIView, SessionCreateAPIView, quick_search
+from chatbot.v2.views import ChatAPIView, ChatBatchAPIView, ChatStreamAPIView, ChatHistoryAPIView, SessionCreateAPIView, ChatHealthAPIView, quick_search, track_click, analytics_dashboard, metrics_view
 
 app_name = 'chatbot'
 
 urlpatterns = [
     path('chat/', ChatAPIView.as_view(), name='chat'),
+    path('chat/batch/', ChatBatchAPIView.as_view(), name='chat_batch'),
+    path('chat/stream/', ChatStreamAPIView.as_view(), name='chat_stream'),
     path('session/create/', SessionCreateAPIView.as_view(), name='create_session'),
     path('session/<str:session_id>/history/', ChatHistoryAPIView.as_view(), name='chat_history'),
     path('search/quick/', quick_search, name='quick_search'),
+    path('health/', ChatHealthAPIView.as_view(), name='health'),
+    path('analytics/click/', track_click, name='track_click'),
+    path('analytics/', analytics_dashboard, name='analytics_dashboard'),
+    path('metrics/', metrics_view, name='metrics'),
 ]
\ No newline at end of file
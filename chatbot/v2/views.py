@@ -1,18 +1,36 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from rest_framework.permissions import AllowAny, IsAdminUser
 from django.shortcuts import render
 from rest_framework.renderers import JSONRenderer
 
-from chatbot.services.chat_service import ChatService
+from chatbot.services.registry import get_analytics_sink, get_chat_service, get_llm_service, get_load_timings, get_transcript_queue, is_loaded
 from chatbot.v2.serializers import (
     ChatRequestSerializer,
+    ChatBatchRequestSerializer,
     ChatResponseSerializer,
     ChatMessageSerializer,
 )
-from chatbot.models import ChatSession, ChatMessage
+from chatbot.models import ChatSession, ChatMessage, ChatAnalyticsRollup
+from chatbot.services.analytics import RESULT_BUCKETS
+from chatbot.services.metrics import render_metrics, request_trace
+from chatbot.v2.throttles import AnalyticsClickThrottle, ChatThrottle, QuickSearchThrottle, SessionCreateThrottle
+from django.http import HttpResponse, HttpResponseForbidden
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db.models import Sum
+from django.utils import timezone
+from datetime import timedelta
+from chatbot.services.archive import archived_messages
+from django.db.models import Q
 
 
 # ✅ Main Chat API View (GET for UI page, POST for messages)
@@ -55,6 +73,7 @@ from chatbot.models import ChatSession, ChatMessage
 class ChatAPIView(APIView):
     """Main chat API: Renders UI (GET) and handles chat (POST)."""
     permission_classes = [AllowAny]
+    throttle_classes = [ChatThrottle]
 
     def get(self, request):
         # Render chatbot UI
@@ -73,14 +92,21 @@ class ChatAPIView(APIView):
             )
 
         try:
-            chat_service = ChatService()
-            response_data = chat_service.process_message(
-                message=serializer.validated_data['message'],
-                session_id=serializer.validated_data.get('session_id'),
-                user_id=serializer.validated_data.get('user_id'),
-            )
-
-            return Response(response_data, status=status.HTTP_200_OK)
+            chat_service = get_chat_service()
+            with request_trace() as trace:
+                response_data = chat_service.process_message(
+                    message=serializer.validated_data['message'],
+                    session_id=serializer.validated_data.get('session_id'),
+                    user_id=serializer.validated_data.get('user_id'),
+                )
+
+            # `debug` (body or ?debug=1) returns the per-stage breakdown with the reply
+            if serializer.validated_data.get('debug') or request.query_params.get('debug') in ('1', 'true'):
+                response_data['timings'] = trace.timings()
+
+            response = Response(response_data, status=status.HTTP_200_OK)
+            response['Server-Timing'] = trace.server_timing()
+            return response
 
         except Exception as e:
             # Optional: log the error for debugging
@@ -96,14 +122,158 @@ class ChatAPIView(APIView):
             )
 
 
+# ✅ Streaming Chat API View (Server-Sent Events)
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _stream_events(chat_service, turn):
+    """SSE events for a turn, pulling tokens with the blocking client (WSGI)"""
+    yield _sse('meta', chat_service.stream_meta(turn))
+
+    reply = ''
+    if turn['llm_call']:
+        for token in chat_service.llm_service.stream_response(*turn['llm_call']):
+            reply += token
+            yield _sse('token', {'token': token})
+    if not reply:
+        reply = turn['response']['message']
+        yield _sse('token', {'token': reply})
+
+    yield _sse('done', chat_service.finish_stream(turn, reply))
+
+
+async def _astream_events(chat_service, turn):
+    """SSE events for a turn, awaiting tokens on the event loop (ASGI)"""
+    yield _sse('meta', chat_service.stream_meta(turn))
+
+    reply = ''
+    if turn['llm_call']:
+        async for token in chat_service.llm_service.astream_response(*turn['llm_call']):
+            reply += token
+            yield _sse('token', {'token': token})
+    if not reply:
+        reply = turn['response']['message']
+        yield _sse('token', {'token': reply})
+
+    yield _sse('done', await sync_to_async(chat_service.finish_stream)(turn, reply))
+
+
+class ChatStreamAPIView(APIView):
+    """Streams the reply as Server-Sent Events: `meta`, then `token`s, then `done`.
+
+    Served through ecomprj.asgi the tokens are relayed from the model on the event
+    loop, so slow generations don't hold a worker thread. Under WSGI the same
+    events are produced with a blocking client.
+    """
+    permission_classes = [AllowAny]
+    throttle_classes = [ChatThrottle]
+
+    def post(self, request):
+        serializer = ChatRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {
+                    'error': 'Invalid request data',
+                    'details': serializer.errors,
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        chat_service = get_chat_service()
+        try:
+            with request_trace() as trace:
+                turn = chat_service.prepare_stream(
+                    message=serializer.validated_data['message'],
+                    session_id=serializer.validated_data.get('session_id'),
+                    user_id=serializer.validated_data.get('user_id'),
+                )
+        except Exception as e:
+            import traceback
+            print("Error in ChatStreamAPIView:", traceback.format_exc())
+
+            return Response(
+                {
+                    'error': 'Internal server error',
+                    'message': 'Sorry, I encountered an error processing your request. Please try again.',
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+        if isinstance(request._request, ASGIRequest):
+            events = _astream_events(chat_service, turn)
+        else:
+            events = _stream_events(chat_service, turn)
+
+        response = StreamingHttpResponse(events, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # stop nginx from buffering the stream
+        response['Server-Timing'] = trace.server_timing()  # stages before the first token
+        return response
+
+
+# ✅ Batch Chat API View (analytics replay, load tests, queued messages)
+class ChatBatchAPIView(APIView):
+    permission_classes = [IsAdminUser]
+    renderer_classes = [JSONRenderer]
+
+    def post(self, request):
+        serializer = ChatBatchRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {
+                    'error': 'Invalid request data',
+                    'details': serializer.errors,
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            results = get_chat_service().process_messages(
+                serializer.validated_data['messages'],
+                batch_size=serializer.validated_data.get('batch_size'),
+            )
+
+            return Response(
+                {
+                    'results': results,
+                    'count': len(results),
+                },
+                status=status.HTTP_200_OK,
+            )
+
+        except Exception as e:
+            import traceback
+            print("Error in ChatBatchAPIView:", traceback.format_exc())
+
+            return Response(
+                {
+                    'error': 'Internal server error',
+                    'message': 'Sorry, the batch could not be processed. Please try again.',
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
 # ✅ Chat History API View
 class ChatHistoryAPIView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, session_id):
         try:
-            session = ChatSession.objects.get(session_id=session_id, is_active=True)
-            messages = ChatMessage.objects.filter(session=session).order_by('timestamp')
+            # Expired sessions stay readable once archive_chat_sessions has compressed them
+            session = ChatSession.objects.select_related('archive').get(
+                Q(is_active=True) | Q(archive__isnull=False), session_id=session_id
+            )
+            messages = archived_messages(session) if not session.is_active else []
+            messages += list(ChatMessage.objects.filter(session=session).order_by('timestamp'))
+
+            # Read through turns still waiting in the write-behind queue
+            transcript_queue = get_transcript_queue()
+            if transcript_queue is not None:
+                flushed_turn_ids = {message.metadata.get('turn_id') for message in messages if message.metadata}
+                messages += transcript_queue.pending_messages(session, flushed_turn_ids)
+
             serializer = ChatMessageSerializer(messages, many=True)
 
             return Response(
@@ -123,6 +293,7 @@ class ChatHistoryAPIView(APIView):
 # ✅ Session Create API View
 class SessionCreateAPIView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [SessionCreateThrottle]
     renderer_classes = [JSONRenderer]
 
     def post(self, request):
@@ -151,6 +322,7 @@ class SessionCreateAPIView(APIView):
 # ✅ Quick Search API Function View
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([QuickSearchThrottle])
 def quick_search(request):
     query = request.data.get('query', '')
 
@@ -161,14 +333,10 @@ def quick_search(request):
         )
 
     try:
-        from core.models import Product
+        from core.search import search_products
         from .serializers import ProductSerializer
 
-        products = Product.objects.filter(
-            title__icontains=query,
-            product_status='published',
-            status=True,
-        )[:5]
+        products = search_products(query, limit=5)
 
         serializer = ProductSerializer(products, many=True)
 
@@ -189,3 +357,132 @@ def quick_search(request):
             },
             status=status.HTTP_500_INTERNAL_SERVER_ERROR,
         )
+
+
+# ✅ Chatbot Health API View
+class ChatHealthAPIView(APIView):
+    """Reports which chatbot components are loaded and how long loading took"""
+    permission_classes = [AllowAny]
+    renderer_classes = [JSONRenderer]
+
+    def get(self, request):
+        timings = get_load_timings()
+        components = {
+            name: {
+                'loaded': is_loaded(name),
+                'load_seconds': round(timings[name], 4) if name in timings else None,
+            }
+            for name in ('spacy_pipeline', 'nlp_service', 'llm_service', 'chat_service')
+        }
+
+        return Response(
+            {
+                'ready': is_loaded('chat_service'),
+                'components': components,
+                'response_cache': get_llm_service().response_cache.stats() if is_loaded('llm_service') else None,
+                'llm_admission': dict(
+                    get_llm_service().admission.stats(), coalesced=get_llm_service().inflight.coalesced
+                ) if is_loaded('llm_service') else None,
+                'analytics_dropped_clicks': getattr(get_analytics_sink(), 'dropped_clicks', None)
+                if is_loaded('analytics_sink') else None,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+# ✅ Prometheus Metrics View
+def _metrics_allowed(request) -> bool:
+    """Staff users, the scrape token (CHATBOT_METRICS_TOKEN) or an allowed client address"""
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    token = getattr(settings, 'CHATBOT_METRICS_TOKEN', '')
+    if token and constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f"Bearer {token}"):
+        return True
+    return request.META.get('REMOTE_ADDR') in getattr(settings, 'CHATBOT_METRICS_ALLOWED_IPS', ())
+
+
+def metrics_view(request):
+    """Chat pipeline latency histograms of this process, in the Prometheus text format"""
+    if not _metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(get_load_timings()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# ✅ Product Click Tracking API Function View
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@throttle_classes([AnalyticsClickThrottle])
+def track_click(request):
+    """Record that a product shown for a chat query (its `query_id`) was clicked"""
+    query_id = request.data.get('query_id')
+    product_id = request.data.get('product_id')
+
+    if not query_id or not str(product_id).isdigit():
+        return Response(
+            {'error': 'query_id and product_id are required'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    from core.models import Product
+    if not Product.objects.filter(pk=product_id).exists():
+        return Response(
+            {'error': 'Product not found'},
+            status=status.HTTP_404_NOT_FOUND,
+        )
+
+    sink = get_analytics_sink()
+    if sink is not None:
+        sink.record_click(str(query_id), int(product_id))
+
+    return Response(status=status.HTTP_202_ACCEPTED)
+
+
+# ✅ Chat Analytics Dashboard (staff only)
+@staff_member_required
+def analytics_dashboard(request):
+    """Chat analytics for the last `days` days, read only from the hourly rollup table"""
+    try:
+        days = max(1, min(int(request.GET.get('days', 7)), 90))
+    except ValueError:
+        days = 7
+
+    rollups = ChatAnalyticsRollup.objects.filter(hour__gte=timezone.now() - timedelta(days=days))
+    sums = {'queries': Sum('queries'), 'clicks': Sum('clicks'), 'latency': Sum('total_latency_ms')}
+
+    def summarize(row):
+        queries = row['queries'] or 0
+        return {
+            **row,
+            'queries': queries,
+            'clicks': row['clicks'] or 0,
+            'ctr': round(100 * (row['clicks'] or 0) / queries, 1) if queries else 0,
+            'avg_latency': round((row['latency'] or 0) / queries, 1) if queries else 0,
+        }
+
+    totals = summarize(rollups.aggregate(**sums))
+    zero_results = rollups.filter(result_bucket='0').aggregate(n=Sum('queries'))['n'] or 0
+    totals['zero_result_rate'] = round(100 * zero_results / totals['queries'], 1) if totals['queries'] else 0
+
+    by_intent = [summarize(row) for row in rollups.values('intent').annotate(**sums).order_by('-queries')]
+    zero_by_intent = dict(rollups.filter(result_bucket='0').values_list('intent').annotate(n=Sum('queries')))
+    for row in by_intent:
+        row['zero_results'] = zero_by_intent.get(row['intent'], 0)
+
+    bucket_rows = {row['result_bucket']: summarize(row) for row in rollups.values('result_bucket').annotate(**sums)}
+    by_bucket = [
+        bucket_rows.get(label, summarize({'result_bucket': label, 'queries': 0, 'clicks': 0, 'latency': 0}))
+        for _, label in RESULT_BUCKETS
+    ]
+
+    hourly = [summarize(row) for row in rollups.values('hour').annotate(**sums).order_by('-hour')[:48]]
+    peak = max((row['queries'] for row in hourly), default=0)
+    for row in hourly:
+        row['bar'] = round(100 * row['queries'] / peak) if peak else 0
+
+    return render(request, 'chat_bot/analytics_dashboard.html', {
+        'days': days,
+        'totals': totals,
+        'by_intent': by_intent,
+        'by_bucket': by_bucket,
+        'hourly': hourly,
+    })
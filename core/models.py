@@ -184,12 +184,47 @@ class Product(models.Model):
         new_price = (self.price / self.old_price) * 100
         return new_price
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Values as loaded, so post_save handlers can tell which fields a save changed
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def changed_fields(self, *names, update_fields=None):
+        """Which of `names` (attnames, e.g. 'category_id') differ from the stored row.
+
+        Meant for post_save handlers, which use it to skip index updates for saves
+        that only touch stock or price. New instances, and instances that weren't
+        loaded from the database, report every name as changed.
+        """
+        names = set(names)
+        if update_fields is not None:
+            names &= {self._meta.get_field(name).attname for name in update_fields}
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return names
+        return {name for name in names if name not in loaded or getattr(self, name) != loaded[name]}
+
     def save(self, *args, **kwargs):
         # Set initial selling price as average if not set
         if not self.selling_price:
             self.selling_price = (self.base_price + self.max_price) / 2
         super().save(*args, **kwargs)
 
+        # Later saves are compared against what this one stored
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            deferred = self.get_deferred_fields()
+            self._loaded_values = {
+                field.attname: getattr(self, field.attname)
+                for field in self._meta.concrete_fields if field.attname not in deferred
+            }
+        elif hasattr(self, '_loaded_values'):
+            for name in update_fields:
+                attname = self._meta.get_field(name).attname
+                self._loaded_values[attname] = getattr(self, attname)
+
     def calculate_demand_score(self):
         """Calculate demand score based on current vs previous week sales"""
         if self.last_week_sales == 0:
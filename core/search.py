@@ -0,0 +1,296 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, IntegerField, Q, When
+from django.utils.html import strip_tags
+from django.utils.module_loading import import_string
+
+from core.versioned_index import VersionedIndex
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+STOP_WORDS = {
+    'a', 'an', 'and', 'any', 'are', 'do', 'find', 'for', 'have', 'i', 'in', 'is', 'it', 'me',
+    'my', 'of', 'on', 'or', 'please', 'show', 'some', 'the', 'to', 'want', 'with', 'you',
+}
+
+# Cache key bumped on every product change so other worker processes know to rebuild
+SEARCH_VERSION_KEY = 'core:product_search:version'
+
+
+def stem(token: str) -> str:
+    """Very light plural folding so "shirts" finds "shirt" and "dresses" finds "dress" """
+    if len(token) > 4 and token.endswith('ies'):
+        return token[:-3] + 'y'
+    if len(token) > 4 and token.endswith(('ses', 'xes', 'ches', 'shes')):
+        return token[:-2]
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def analyze(text: str) -> List[str]:
+    return [stem(token) for token in TOKEN_RE.findall((text or '').lower())]
+
+
+def query_terms(text: str) -> List[str]:
+    terms = [term for term in analyze(text) if term not in STOP_WORDS]
+    return list(dict.fromkeys(terms))
+
+
+class SearchBackend:
+    """Interface of a product search backend: ranked product ids for a query"""
+
+    def search(self, query: str, limit: Optional[int] = None, published_only: bool = True) -> List[int]:
+        raise NotImplementedError
+
+    def ensure_fresh(self):
+        pass
+
+    def index_product(self, product):
+        pass
+
+    def remove_product(self, product_id: int):
+        pass
+
+    def mark_synced(self, version):
+        pass
+
+
+class DatabaseSearchBackend(SearchBackend):
+    """Plain `icontains` matching in the database, newest first (no index to maintain)"""
+
+    def search(self, query, limit=None, published_only=True):
+        from core.models import Product
+
+        terms = query_terms(query) or (query or '').split()
+        if not terms:
+            return []
+
+        filters = Q(product_status='published', status=True) if published_only else Q()
+        for term in terms:
+            filters &= (
+                Q(title__icontains=term) |
+                Q(description__icontains=term) |
+                Q(tags__name__icontains=term) |
+                Q(category__title__icontains=term)
+            )
+
+        ids = Product.objects.filter(filters).order_by('-date').values_list('id', flat=True).distinct()
+        return list(ids[:limit] if limit else ids)
+
+
+class BM25SearchBackend(VersionedIndex, SearchBackend):
+    """In-memory inverted index over product title, tags, category and description, ranked with BM25.
+
+    Every query word must match (directly, or as a prefix of an indexed word, so
+    partial input like "sneak" still finds "sneakers"); words that appear in no
+    product, and stop words, are ignored. Kept in sync by core.signals.
+    """
+
+    version_key = SEARCH_VERSION_KEY
+    refresh_setting = 'PRODUCT_SEARCH_REFRESH_SECONDS'
+    name = 'ProductSearch'
+
+    K1 = 1.2
+    B = 0.75
+    FIELD_WEIGHTS = {'title': 3, 'tags': 2, 'category': 2, 'description': 1}
+    MIN_PREFIX = 3
+    MAX_PREFIX_EXPANSIONS = 20
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._doc_terms: Dict[int, Counter] = {}
+        self._doc_lengths: Dict[int, int] = {}
+        self._published: Dict[int, bool] = {}
+        self._vocabulary: List[str] = []  # sorted, for prefix lookups
+        self._total_length = 0
+
+    # ----------------- Building -----------------
+    def rebuild(self):
+        from core.models import Product
+
+        version = cache.get(SEARCH_VERSION_KEY)
+        tags = defaultdict(list)
+        for product_id, name in Product.objects.filter(tags__isnull=False).values_list('id', 'tags__name').iterator():
+            tags[product_id].append(name)
+
+        index = BM25SearchBackend()
+        rows = Product.objects.values_list(
+            'id', 'title', 'description', 'category__title', 'product_status', 'status'
+        ).iterator()
+        for product_id, title, description, category, product_status, status in rows:
+            index._add(product_id, {
+                'title': title,
+                'tags': ' '.join(tags.get(product_id, ())),
+                'category': category,
+                'description': strip_tags(description or ''),
+            }, product_status == 'published' and status)
+
+        with self._lock:
+            self._postings = index._postings
+            self._doc_terms = index._doc_terms
+            self._doc_lengths = index._doc_lengths
+            self._published = index._published
+            self._vocabulary = index._vocabulary
+            self._total_length = index._total_length
+            self._version = version
+            self._checked_at = time.monotonic()
+
+    def _add(self, product_id: int, fields: Dict[str, str], published: bool):
+        terms: Counter = Counter()
+        for field, text in fields.items():
+            for term in analyze(text):
+                terms[term] += self.FIELD_WEIGHTS[field]
+
+        length = sum(terms.values())
+        with self._lock:
+            self._remove(product_id)
+            for term, weight in terms.items():
+                postings = self._postings[term]
+                if not postings:
+                    bisect.insort(self._vocabulary, term)
+                postings[product_id] = weight
+            self._doc_terms[product_id] = terms
+            self._doc_lengths[product_id] = length
+            self._published[product_id] = published
+            self._total_length += length
+
+    def _remove(self, product_id: int):
+        with self._lock:
+            terms = self._doc_terms.pop(product_id, None)
+            if terms is None:
+                return
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                postings.pop(product_id, None)
+                if not postings:
+                    del self._postings[term]
+                    position = bisect.bisect_left(self._vocabulary, term)
+                    if position < len(self._vocabulary) and self._vocabulary[position] == term:
+                        del self._vocabulary[position]
+            self._total_length -= self._doc_lengths.pop(product_id, 0)
+            self._published.pop(product_id, None)
+
+    def index_product(self, product):
+        self._add(product.id, {
+            'title': product.title,
+            'tags': ' '.join(product.tags.names()),
+            'category': product.category.title if product.category_id else '',
+            'description': strip_tags(product.description or ''),
+        }, product.product_status == 'published' and product.status)
+
+    def remove_product(self, product_id: int):
+        self._remove(product_id)
+
+    # ----------------- Searching -----------------
+    def _expand(self, term: str) -> List[str]:
+        """Indexed words `term` stands for: itself, or words it is a prefix of"""
+        if term in self._postings:
+            return [term]
+        if len(term) < self.MIN_PREFIX:
+            return []
+        start = bisect.bisect_left(self._vocabulary, term)
+        matches = []
+        for word in self._vocabulary[start:start + self.MAX_PREFIX_EXPANSIONS]:
+            if not word.startswith(term):
+                break
+            matches.append(word)
+        return matches
+
+    def search(self, query, limit=None, published_only=True):
+        # Copy what the query needs under the lock and score without it, so
+        # concurrent searches and index updates don't queue behind the scoring
+        with self._lock:
+            expanded = [self._expand(term) for term in query_terms(query)]
+            expanded = [words for words in expanded if words]
+            if not expanded or not self._doc_lengths:
+                return []
+
+            postings_of = {word: dict(self._postings[word]) for words in expanded for word in words}
+            doc_count = len(self._doc_lengths)
+            avg_length = self._total_length / doc_count
+            # Read with .get below: documents may be removed while we score
+            doc_lengths, published = self._doc_lengths, self._published
+
+        scores: Optional[Dict[int, float]] = None
+        # Rarest term first so the candidate set shrinks as fast as possible
+        for words in sorted(expanded, key=lambda ws: sum(len(postings_of[w]) for w in ws)):
+            term_scores: Dict[int, float] = {}
+            for word in words:
+                postings = postings_of[word]
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                candidates = postings if scores is None else (pid for pid in scores if pid in postings)
+                for product_id in candidates:
+                    tf = postings[product_id]
+                    norm = self.K1 * (1 - self.B + self.B * doc_lengths.get(product_id, avg_length) / avg_length)
+                    score = idf * tf * (self.K1 + 1) / (tf + norm)
+                    if score > term_scores.get(product_id, 0):
+                        term_scores[product_id] = score
+
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {pid: scores[pid] + score for pid, score in term_scores.items()}
+            if not scores:
+                return []
+
+        if published_only:
+            scores = {pid: score for pid, score in scores.items() if published.get(pid)}
+
+        ranked = heapq.nlargest(limit, scores.items(), key=lambda item: item[1]) if limit \
+            else sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [product_id for product_id, _ in ranked]
+
+    def __len__(self):
+        return len(self._doc_lengths)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_search_backend(build: bool = True) -> Optional[SearchBackend]:
+    """The process-wide backend named by PRODUCT_SEARCH_BACKEND (built on first use)"""
+    global _backend
+    if _backend is None and build:
+        with _backend_lock:
+            if _backend is None:
+                backend = import_string(getattr(settings, 'PRODUCT_SEARCH_BACKEND', 'core.search.BM25SearchBackend'))()
+                if hasattr(backend, 'rebuild'):
+                    backend.rebuild()
+                _backend = backend
+    if _backend is not None:
+        _backend.ensure_fresh()
+    return _backend
+
+
+def search_product_ids(query: str, limit: Optional[int] = None, published_only: bool = True) -> List[int]:
+    return get_search_backend().search(query, limit=limit, published_only=published_only)
+
+
+def ranked_products(product_ids: List[int]):
+    """Product queryset in the given order"""
+    from core.models import Product
+
+    if not product_ids:
+        return Product.objects.none()
+    order = Case(*[When(pk=pk, then=position) for position, pk in enumerate(product_ids)], output_field=IntegerField())
+    return Product.objects.filter(pk__in=product_ids).order_by(order)
+
+
+def search_products(query: str, limit: Optional[int] = None, published_only: bool = True):
+    """Products matching `query`, most relevant first"""
+    return ranked_products(search_product_ids(query, limit=limit, published_only=published_only))
@@ -0,0 +1,51 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from taggit.models import Tag
+
+from core import search
+from core.models import Product, Category
+from core.versioned_index import publish_change
+
+# Product fields the search index is built from (tags are handled by the m2m receiver)
+INDEXED_FIELDS = ('title', 'description', 'category_id', 'product_status', 'status')
+
+
+def _sync_search_index(apply):
+    publish_change(search.SEARCH_VERSION_KEY, search.get_search_backend(build=False), apply)
+
+
+def _reindex(products):
+    def apply(backend):
+        for product in products:
+            backend.index_product(product)
+    _sync_search_index(apply)
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, update_fields=None, **kwargs):
+    # Stock and price saves (e.g. at checkout) leave the index and its version alone
+    if instance.changed_fields(*INDEXED_FIELDS, update_fields=update_fields):
+        _reindex([instance])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    _sync_search_index(lambda backend: backend.remove_product(instance.id))
+
+
+@receiver(m2m_changed, sender=Product.tags.through)
+def reindex_product_tags(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, Product):
+        _reindex([instance])
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created, **kwargs):
+    if not created:
+        _reindex(Product.objects.filter(category=instance).select_related('category'))
+
+
+@receiver(post_save, sender=Tag)
+def reindex_tag_products(sender, instance, created, **kwargs):
+    if not created:
+        _reindex(Product.objects.filter(tags=instance).select_related('category'))
@@ -1,3 +1,133 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import search
+from core.models import Category, Product, Vendor
+from core.search import BM25SearchBackend, SEARCH_VERSION_KEY
+
+
+def make_product(title, category=None, description='', product_status='published', **fields):
+    return Product.objects.create(
+        title=title, category=category, description=description,
+        base_price=10, max_price=20, product_status=product_status, **fields
+    )
+
+
+class ChangedFieldsTests(TestCase):
+    def setUp(self):
+        self.product = make_product('Desk Lamp')
+
+    def test_new_instances_report_every_field(self):
+        product = Product(title='Chair')
+        self.assertEqual(product.changed_fields('title', 'description'), {'title', 'description'})
+
+    def test_loaded_instance_reports_only_real_changes(self):
+        product = Product.objects.get(pk=self.product.pk)
+        product.stock_count = '3'
+        self.assertEqual(product.changed_fields('title', 'description', 'category_id'), set())
+
+        product.title = 'Floor Lamp'
+        self.assertEqual(product.changed_fields('title', 'description'), {'title'})
+        self.assertEqual(product.changed_fields('title', update_fields=['stock_count']), set())
+
+    def test_save_refreshes_the_snapshot(self):
+        product = Product.objects.get(pk=self.product.pk)
+        product.title = 'Floor Lamp'
+        product.save()
+        self.assertEqual(product.changed_fields('title'), set())
+
+
+class BM25SearchBackendTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.phones = Category.objects.create(title='Phones')
+        cls.iphone = make_product('iPhone 15 Case', cls.phones, 'Slim case')
+        cls.charger = make_product('Fast Charger', cls.phones, 'Charges any phone case accessory')
+        cls.dresses = make_product('Summer Dresses', description='Light cotton')
+        cls.hidden = make_product('Hidden Case', product_status='draft')
+
+    def setUp(self):
+        self.backend = BM25SearchBackend()
+        self.backend.rebuild()
+
+    def test_title_matches_rank_above_description_matches(self):
+        self.assertEqual(self.backend.search('case'), [self.iphone.id, self.charger.id])
+
+    def test_every_known_word_must_match(self):
+        self.assertEqual(self.backend.search('fast charger'), [self.charger.id])
+        self.assertEqual(self.backend.search('fast dresses'), [])
+        # Unknown words and stop words are ignored
+        self.assertEqual(self.backend.search('show me the fast xyzzy charger'), [self.charger.id])
+
+    def test_prefixes_and_plurals(self):
+        self.assertEqual(self.backend.search('charg'), [self.charger.id])
+        self.assertEqual(self.backend.search('dress'), [self.dresses.id])
+
+    def test_unpublished_products_on_request(self):
+        self.assertNotIn(self.hidden.id, self.backend.search('case'))
+        self.assertIn(self.hidden.id, self.backend.search('case', published_only=False))
+
+    def test_incremental_updates(self):
+        self.backend.index_product(Product(id=self.dresses.id, title='Winter Coat', product_status='published'))
+        self.assertEqual(self.backend.search('dress'), [])
+        self.assertEqual(self.backend.search('coat'), [self.dresses.id])
+        self.backend.remove_product(self.dresses.id)
+        self.assertEqual(self.backend.search('coat'), [])
+
+
+class SearchIndexSignalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = make_product('Desk Lamp')
+        self.backend = BM25SearchBackend()
+        self.backend.rebuild()
+        patcher = mock.patch.object(search, '_backend', self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_stock_and_price_saves_leave_the_index_alone(self):
+        version = cache.get(SEARCH_VERSION_KEY)
+        product = Product.objects.get(pk=self.product.pk)
+        product.stock_count = '1'
+        product.price = 12
+        product.save()
+        product.save(update_fields=['stock_count'])
+        self.assertEqual(cache.get(SEARCH_VERSION_KEY), version)
+
+    def test_title_change_patches_the_local_index(self):
+        product = Product.objects.get(pk=self.product.pk)
+        product.title = 'Reading Lamp'
+        product.save()
+        self.assertEqual(self.backend.search('reading'), [product.id])
+        # The local copy already has the change, so it won't rebuild for it
+        self.assertEqual(self.backend._version, cache.get(SEARCH_VERSION_KEY))
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class SearchViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        backend = BM25SearchBackend()
+        backend.rebuild()
+        patcher = mock.patch.object(search, '_backend', backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.vendor = Vendor.objects.create(title='Gadgets')
+
+    def test_results_are_ranked_by_relevance(self):
+        wallet = make_product('Leather Wallet', description='Fits any phone', vendor=self.vendor)
+        case = make_product('Phone Case', description='Slim phone case', vendor=self.vendor)
+        draft = make_product('Phone Stand', description='Adjustable aluminium desk stand', product_status='draft', vendor=self.vendor)
+        make_product('iPhone 15', vendor=self.vendor)  # word matches only, not infixes
+        make_product('Desk Lamp', vendor=self.vendor)
+
+        response = self.client.get(reverse('core:search'), {'q': 'phones'})
+        self.assertEqual(list(response.context['products']), [case, draft, wallet])
+
+    def test_missing_query(self):
+        make_product('Desk Lamp', vendor=self.vendor)
+        response = self.client.get(reverse('core:search'))
+        self.assertEqual(list(response.context['products']), [])
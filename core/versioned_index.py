@@ -0,0 +1,92 @@
+import threading
+import time
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def bump_version(key: str) -> int:
+    """Tell every process that the data behind `key` changed"""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+        return 1
+
+
+def publish_change(key: str, index: Optional['VersionedIndex'], apply: Callable[['VersionedIndex'], None]) -> int:
+    """Bump `key`, then patch `index`, this process's copy (None if nothing built it here).
+
+    Indexes are only patched in place once something has built them in this
+    process; other processes pick the change up from the bumped version.
+    """
+    version = bump_version(key)
+    if index is not None:
+        apply(index)
+        index.mark_synced(version)
+    return version
+
+
+class VersionedIndex:
+    """Base for per-process in-memory indexes kept in step across worker processes.
+
+    Every change bumps a shared cache version (`publish_change`). The process
+    that made the change patches its own copy and records the version with
+    `mark_synced`; other processes notice the new version in `ensure_fresh`, at
+    most every `refresh_setting` seconds, and `rebuild`. This needs a shared
+    cache backend (e.g. Redis) to work across workers.
+
+    Subclasses set `version_key`, `refresh_setting` and `name`, implement
+    `rebuild`, and set `_version` to the version read before loading.
+    """
+
+    version_key: str = ''
+    refresh_setting: str = ''
+    name = 'index'
+    # Rebuild on a daemon thread (serving the old copy meanwhile), or inline
+    rebuild_in_background = True
+
+    def __init__(self):
+        self._version = None
+        self._checked_at = 0.0
+        self._rebuilding = False
+
+    def rebuild(self):
+        raise NotImplementedError
+
+    def ensure_fresh(self) -> bool:
+        """Rebuild when another process changed the data; False if it was checked too recently"""
+        interval = getattr(settings, self.refresh_setting, 30)
+        now = time.monotonic()
+        if self._rebuilding or now - self._checked_at < interval:
+            return False
+        self._checked_at = now
+
+        if cache.get(self.version_key) == self._version:
+            return True
+        if not self.rebuild_in_background:
+            self.rebuild()
+            return True
+
+        self._rebuilding = True
+
+        def _run():
+            try:
+                self.rebuild()
+            except Exception as e:
+                print(f"[{self.name}] Background rebuild failed:", e)
+            finally:
+                self._rebuilding = False
+
+        threading.Thread(target=_run, name=f"{self.name}-rebuild", daemon=True).start()
+        return True
+
+    def mark_synced(self, version):
+        """Record that local incremental updates already cover `version`.
+
+        If the version moved by more than our own bump, another process changed
+        the data too and the next `ensure_fresh` must still rebuild.
+        """
+        if version == (self._version or 0) + 1:
+            self._version = version
@@ -44,6 +44,7 @@ from taggit.models import Tag
 from core.models import Coupon, Product, Category, Vendor, CartOrder, CartOrderProducts, ProductImages, ProductReview, wishlist_model, Address
 from userauths.models import ContactUs, Profile
 from core.forms import ProductReviewForm
+from core.search import search_products
 from django.template.loader import render_to_string
 from django.contrib import messages
 
@@ -216,7 +217,8 @@ def ajax_add_review(request, pid):
 def search_view(request):
     query = request.GET.get("q")
 
-    products = Product.objects.filter(title__icontains=query).order_by("-date")
+    # Most relevant first; like before, unpublished products are listed too
+    products = search_products(query, limit=500, published_only=False)
 
     context = {
         "products": products,
@@ -3,6 +3,10 @@ ASGI config for ecomprj project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve the site with an ASGI server (e.g. `daphne ecomprj.asgi:application`) to
+stream chatbot replies from /chatbot/chat/stream/ without tying up a worker
+thread for the whole generation.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 """
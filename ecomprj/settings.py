@@ -116,6 +116,25 @@ DATABASES = {
     }
 }
 
+# Cache: set REDIS_URL to share cached state (catalog version, LLM replies, ...) between
+# worker processes; otherwise every process keeps its own LRU in-memory cache.
+REDIS_URL = env.str("REDIS_URL", default="")
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -405,5 +424,134 @@ OPENAI_API_KEY = ""  # Leave blank if not using
 # Required: LM Studio
 LM_STUDIO_BASE_URL = "http://127.0.0.1:1234/v1"
 
+# Product search used by the shop search page, the chatbot and quick search:
+# 'core.search.BM25SearchBackend' (in-memory ranked index, kept current by core.signals)
+# or 'core.search.DatabaseSearchBackend' (plain icontains queries)
+PRODUCT_SEARCH_BACKEND = 'core.search.BM25SearchBackend'
+
+# How often (seconds) a worker checks whether another process changed products
+# and its search index needs a rebuild
+PRODUCT_SEARCH_REFRESH_SECONDS = 30
+
+# Trained model files (intent classifier, ...); not committed
+ML_ARTIFACTS_DIR = BASE_DIR / 'ml_artifacts'
+
+# Recommendations: collaborative filtering model trained offline by `manage.py train_recommender`
+# (run it from cron, or keep it running with --loop); workers reload it within
+# RECOMMENDER_MODEL_REFRESH_SECONDS of a new version being published
+RECOMMENDER_MODEL_DIR = ML_ARTIFACTS_DIR / 'recommender'
+RECOMMENDER_MODEL_REFRESH_SECONDS = 30
+
+# Content-based recommendations: each product's K most similar products, stored in
+# ProductNeighbor by `manage.py build_product_neighbors` (the TF-IDF index it publishes
+# in RECOMMENDER_NEIGHBORS_DIR is used to re-rank neighbours when a product is edited)
+RECOMMENDER_NEIGHBORS_DIR = ML_ARTIFACTS_DIR / 'product_neighbors'
+RECOMMENDER_NEIGHBORS_K = 20
+
+# Hybrid recommendations are cached per user + product: in-process LRU -> CACHES[ALIAS] ->
+# RecommendationCache table. Entries are fresh for CACHE_SECONDS, then served for up to
+# STALE_SECONDS more while recomputed in the background; reviews, wishlist changes and
+# product edits invalidate them. 0 disables the cache.
+# Invalidations reach other workers through CACHES[ALIAS], so it must be a shared backend
+# (Redis via REDIS_URL, memcached, database); with LocMemCache only the table is used.
+RECOMMENDER_CACHE_ALIAS = 'default'
+RECOMMENDER_CACHE_SECONDS = 15 * 60
+RECOMMENDER_CACHE_STALE_SECONDS = 60 * 60
+RECOMMENDER_CACHE_SIZE = 10
+RECOMMENDER_CACHE_LRU_SIZE = 10000
+
+# Chatbot: load the spaCy pipeline at startup (combine with `gunicorn --preload` to load it
+# once in the master) and the other chat services on each worker's first request,
+# instead of on the first chat message
+CHATBOT_WARMUP = env.bool("CHATBOT_WARMUP", default=False)
+
+# How often (seconds) a worker checks whether another process changed the catalog
+# and its in-memory entity index / product vectors need refreshing
+CHATBOT_CATALOG_REFRESH_SECONDS = 30
+
+# spaCy `nlp.pipe` batch size for the batch chat endpoint (/chatbot/chat/batch/); it always
+# parses in the web worker itself, never in forked spaCy processes
+CHATBOT_NLP_BATCH_SIZE = 64
+
+# Intent engine: active ChatIntent rows are compiled into keyword rules (reloaded within
+# CHATBOT_INTENT_REFRESH_SECONDS of a change); messages no rule matches go to the
+# classifier trained by `manage.py train_intent_classifier`, if the file exists
+CHATBOT_INTENT_MODEL_PATH = ML_ARTIFACTS_DIR / 'intent_classifier.npz'
+CHATBOT_INTENT_REFRESH_SECONDS = 30
+
+# Retrieval for LLM answers: product embeddings built by `manage.py build_product_vectors`;
+# the TOP_K products scoring at least MIN_SCORE (cosine) are added to the prompt
+CHATBOT_VECTOR_STORE_DIR = ML_ARTIFACTS_DIR / 'product_vectors'
+CHATBOT_RAG_TOP_K = 3
+CHATBOT_RAG_MIN_SCORE = 0.2
+
+# Conversation context sent to the LLM: the latest turns of a session within TOKEN_BUDGET
+# (estimated) tokens, older turns folded into a summary of at most SUMMARY_TOKENS.
+# Kept in the default cache for CONTEXT_SECONDS after the last turn.
+CHATBOT_CONTEXT_TOKEN_BUDGET = 600
+CHATBOT_CONTEXT_SUMMARY_TOKENS = 150
+CHATBOT_CONTEXT_TURN_TOKENS = 120
+CHATBOT_CONTEXT_SECONDS = 24 * 60 * 60
+
+# Chat analytics: each turn is buffered and written to ProductQuery (plus the hourly
+# ChatAnalyticsRollup behind /chatbot/analytics/) every FLUSH_SIZE events or FLUSH_MS milliseconds
+CHATBOT_ANALYTICS_ENABLED = env.bool("CHATBOT_ANALYTICS_ENABLED", default=True)
+CHATBOT_ANALYTICS_FLUSH_SIZE = 200
+CHATBOT_ANALYTICS_FLUSH_MS = 2000
+
+# /chatbot/metrics/ (Prometheus) is only served to staff users, to requests sending
+# "Authorization: Bearer <METRICS_TOKEN>" and to clients whose REMOTE_ADDR is in METRICS_ALLOWED_IPS
+CHATBOT_METRICS_TOKEN = env.str("CHATBOT_METRICS_TOKEN", default="")
+CHATBOT_METRICS_ALLOWED_IPS = env.list("CHATBOT_METRICS_ALLOWED_IPS", default=[])
+
+# Chat sessions idle for this many hours are deactivated by `manage.py archive_chat_sessions`,
+# which moves their messages into one compressed ChatArchive row per session
+CHATBOT_SESSION_TTL_HOURS = 24
+
+# Chat product search keeps the ranked result ids of the last search per session for
+# this long (seconds), so "show more products" pages through them without searching again
+CHATBOT_PRODUCT_CURSOR_SECONDS = 15 * 60
+CHATBOT_PRODUCT_CURSOR_MAX_RESULTS = 200
+
+# LM Studio HTTP client: keep-alive pool size, separate connect/read timeouts (seconds),
+# and a circuit breaker that skips the server after N consecutive failures and
+# probes it in the background every CHATBOT_LLM_BREAKER_RESET_SECONDS
+CHATBOT_LLM_POOL_SIZE = 10
+CHATBOT_LLM_CONNECT_TIMEOUT = 2
+CHATBOT_LLM_READ_TIMEOUT = 10
+CHATBOT_LLM_BREAKER_THRESHOLD = 3
+CHATBOT_LLM_BREAKER_RESET_SECONDS = 15
+
+# LLM admission: at most MAX_CONCURRENCY model calls per process; up to MAX_QUEUE more wait
+# QUEUE_TIMEOUT seconds for a slot, anyone else gets a "busy" reply. Identical questions
+# asked at the same time share one call.
+CHATBOT_LLM_MAX_CONCURRENCY = 4
+CHATBOT_LLM_MAX_QUEUE = 16
+CHATBOT_LLM_QUEUE_TIMEOUT = 5
+
+# Token-bucket rate limits of the public chat endpoints, per client IP and per chat
+# session: scope -> (burst capacity, tokens refilled per second); None disables a scope
+CHATBOT_THROTTLE_CACHE_ALIAS = 'default'
+CHATBOT_THROTTLE_RATES = {
+    'chat': (20, 0.5),
+    'session_create': (5, 1 / 60),
+    'quick_search': (30, 2),
+    'analytics_click': (60, 2),
+}
+
+# Cache of LLM replies keyed on the normalized message + prompt context (0 disables it).
+# NEAR_DUPLICATES also matches rephrasings with the same words in another order.
+CHATBOT_RESPONSE_CACHE_ALIAS = 'default'
+CHATBOT_RESPONSE_CACHE_SECONDS = 60 * 60
+CHATBOT_RESPONSE_CACHE_NEAR_DUPLICATES = False
+
+# Write-behind chat transcripts: turns are spooled to CHATBOT_TRANSCRIPT_SPOOL_DIR and
+# bulk-inserted by a background thread every FLUSH_SIZE turns or FLUSH_MS milliseconds.
+# Spools left by a crashed process are replayed on startup or by `manage.py flush_chat_transcripts`.
+CHATBOT_TRANSCRIPT_WRITE_BEHIND = env.bool("CHATBOT_TRANSCRIPT_WRITE_BEHIND", default=False)
+CHATBOT_TRANSCRIPT_SPOOL_DIR = BASE_DIR / 'chat_spool'
+CHATBOT_TRANSCRIPT_FLUSH_SIZE = 100
+CHATBOT_TRANSCRIPT_FLUSH_MS = 500
+
 STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
@@ -0,0 +1,309 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import IntegrityError, connection
+
+from recommendation.models import RecommendationCache
+
+KEY_PREFIX = 'recommendation:hybrid'
+USER_VERSION_KEY = 'recommendation:user_version:{}'
+PRODUCT_VERSION_KEY = 'recommendation:product_version:{}'
+# Minimum length of a recomputed home page row (the default of `precompute_recommendations --top-n`);
+# stored rows can be shorter once some of their products were deleted
+HOME_SIZE = 10
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+class LRUCache:
+    """Small thread-safe in-process LRU of recommendation entries"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: Dict[str, Any]):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RecommendationStore:
+    """Read-through cache of hybrid recommendations (product ids per user + product).
+
+    Lookups go in-process LRU -> Django cache (RECOMMENDER_CACHE_ALIAS; Redis when
+    REDIS_URL is set) -> RecommendationCache table -> `get_hybrid_recommendations`,
+    and every layer that missed is filled on the way back. An entry is fresh for
+    RECOMMENDER_CACHE_SECONDS; for RECOMMENDER_CACHE_STALE_SECONDS after that it is
+    still served while a background thread recomputes it.
+
+    Entries remember the user and product versions they were computed under; a
+    new review or wishlist change bumps the user's version, a product edit bumps
+    the versions of the products whose neighbour lists changed (and both delete
+    the matching table rows), so outdated entries stop matching in every layer.
+    A user's precomputed home page row is recomputed in the background instead
+    of deleted, so the home page never falls back to plain newest products.
+    A cache-wide lock per key (`cache.add`) plus a per-process single flight make
+    sure a key is computed once, however many requests miss it at the same time.
+
+    Versions only reach other worker processes through a shared cache backend.
+    With a process-local one (LocMemCache, the default without REDIS_URL) the
+    LRU and cache layers are skipped and entries come from the table, whose
+    rows every invalidation deletes.
+    """
+
+    def __init__(self, alias: str = None, timeout: int = None, stale_timeout: int = None,
+                 lru_size: int = None, lock_timeout: int = None, size: int = None):
+        self.alias = alias or _setting('RECOMMENDER_CACHE_ALIAS', 'default')
+        self.timeout = timeout if timeout is not None else _setting('RECOMMENDER_CACHE_SECONDS', 15 * 60)
+        self.stale_timeout = stale_timeout if stale_timeout is not None else _setting('RECOMMENDER_CACHE_STALE_SECONDS', 60 * 60)
+        self.lock_timeout = lock_timeout if lock_timeout is not None else _setting('RECOMMENDER_CACHE_LOCK_SECONDS', 10)
+        self.size = size if size is not None else _setting('RECOMMENDER_CACHE_SIZE', 10)
+        self.lru = LRUCache(lru_size if lru_size is not None else _setting('RECOMMENDER_CACHE_LRU_SIZE', 10000))
+        self._flight_lock = threading.Lock()
+        self._flights: Dict[str, threading.Event] = {}
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix='recommendation-refresh')
+        self.stats = {'lru': 0, 'cache': 0, 'table': 0, 'computed': 0, 'stale': 0}
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def enabled(self) -> bool:
+        return self.timeout > 0
+
+    @property
+    def shared(self) -> bool:
+        """Whether the cache, and so version bumps, are seen by every worker process"""
+        return not isinstance(self.cache, (LocMemCache, DummyCache))
+
+    # ----------------- Versions -----------------
+    def _versions(self, user_id: int, product_id: int) -> Tuple[int, int]:
+        if not self.shared:
+            return 0, 0  # entries are only read from the table, which has no versions
+        keys = [USER_VERSION_KEY.format(user_id), PRODUCT_VERSION_KEY.format(product_id)]
+        values = self.cache.get_many(keys)
+        for key in keys:
+            if key not in values:
+                # A version lost to eviction must not match entries made under an earlier one
+                self.cache.add(key, time.time_ns(), None)
+                values[key] = self.cache.get(key)
+        return values[keys[0]], values[keys[1]]
+
+    def _bump(self, keys: List[str]):
+        for key in keys:
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                self.cache.set(key, time.time_ns(), None)
+
+    def invalidate_user(self, user_id: int):
+        RecommendationCache.objects.filter(user_id=user_id, product__isnull=False).delete()
+        self._bump([USER_VERSION_KEY.format(user_id)])
+
+        home = RecommendationCache.objects.filter(user_id=user_id, product__isnull=True).values_list(
+            'recommended_products', flat=True
+        ).first()
+        if home is not None:
+            self._refresher.submit(self._recompute_home, user_id, max(len(home), HOME_SIZE))
+
+    def _recompute_home(self, user_id: int, top_n: int):
+        from recommendation.precompute import precompute_chunk
+
+        try:
+            precompute_chunk([user_id], top_n)
+        except Exception as e:
+            print("[Recommendation] Could not recompute home recommendations:", e)
+        finally:
+            connection.close()
+
+    def invalidate_products(self, product_ids: Iterable[int]):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        RecommendationCache.objects.filter(product_id__in=product_ids).delete()
+        self._bump([PRODUCT_VERSION_KEY.format(product_id) for product_id in product_ids])
+
+    # ----------------- Lookup -----------------
+    def _age(self, entry: Dict[str, Any]) -> float:
+        return time.time() - entry['computed_at']
+
+    def _usable(self, entry: Optional[Dict[str, Any]], versions: Tuple[int, int]) -> bool:
+        return (
+            entry is not None and tuple(entry['versions']) == versions
+            and self._age(entry) < self.timeout + self.stale_timeout
+        )
+
+    def _from_table(self, user_id: int, product_id: int, versions: Tuple[int, int]) -> Optional[Dict[str, Any]]:
+        row = RecommendationCache.objects.filter(user_id=user_id, product_id=product_id).values_list(
+            'recommended_products', 'updated_at'
+        ).first()
+        if row is None:
+            return None
+        return {'ids': row[0], 'computed_at': row[1].timestamp(), 'versions': versions}
+
+    def _lookup(self, key: str, user_id: int, product_id: int, versions: Tuple[int, int]) -> Optional[Dict[str, Any]]:
+        shared = self.shared
+        if shared:
+            entry = self.lru.get(key)
+            if self._usable(entry, versions):
+                self.stats['lru'] += 1
+                return entry
+
+            entry = self.cache.get(key)
+            if self._usable(entry, versions):
+                self.stats['cache'] += 1
+                self.lru.set(key, entry)
+                return entry
+
+        entry = self._from_table(user_id, product_id, versions)
+        if self._usable(entry, versions):
+            self.stats['table'] += 1
+            if shared:
+                self.cache.set(key, entry, self.timeout + self.stale_timeout)
+                self.lru.set(key, entry)
+            return entry
+        return None
+
+    def get_ids(self, user_id: int, product_id: int, top_n: int = 5) -> List[int]:
+        # Entries hold the best `size` ids; longer lists are computed every time
+        if not self.enabled or top_n > self.size:
+            return self._compute_ids(user_id, product_id, top_n)
+
+        key = f"{KEY_PREFIX}:{user_id}:{product_id}"
+        versions = self._versions(user_id, product_id)
+        entry = self._lookup(key, user_id, product_id, versions)
+        if entry is not None:
+            if self._age(entry) >= self.timeout:
+                self.stats['stale'] += 1
+                self._refresh_in_background(key, user_id, product_id, versions)
+            return entry['ids'][:top_n]
+        return self._compute_once(key, user_id, product_id, versions)[:top_n]
+
+    def get(self, user_id: int, product_id: int, top_n: int = 5) -> list:
+        """Recommended Products, best first"""
+        from core.models import Product
+
+        ids = self.get_ids(user_id, product_id, top_n)
+        products = Product.objects.in_bulk(ids)
+        # Products deleted since the entry was computed are dropped
+        return [products[pid] for pid in ids if pid in products]
+
+    # ----------------- Computing -----------------
+    def _compute_ids(self, user_id: int, product_id: int, top_n: int) -> List[int]:
+        from recommendation.utils import get_hybrid_recommendations
+
+        self.stats['computed'] += 1
+        return [p.id for p in get_hybrid_recommendations(user_id, product_id, top_n)]
+
+    def _store(self, key: str, user_id: int, product_id: int, ids: List[int], versions: Tuple[int, int]) -> Dict[str, Any]:
+        try:
+            RecommendationCache.objects.update_or_create(
+                user_id=user_id, product_id=product_id, defaults={'recommended_products': ids},
+            )
+        except IntegrityError:
+            pass  # the product (or user) no longer exists; keep the entry in the caches only
+        entry = {'ids': ids, 'computed_at': time.time(), 'versions': versions}
+        if self.shared:
+            self.cache.set(key, entry, self.timeout + self.stale_timeout)
+            self.lru.set(key, entry)
+        return entry
+
+    def _compute_once(self, key: str, user_id: int, product_id: int, versions: Tuple[int, int]) -> List[int]:
+        """Compute a missing entry, unless another thread or process is already doing it"""
+        with self._flight_lock:
+            event = self._flights.get(key)
+            leader = event is None
+            if leader:
+                event = self._flights[key] = threading.Event()
+
+        if not leader:
+            event.wait(self.lock_timeout)
+            entry = self.lru.get(key) if self.shared else self._from_table(user_id, product_id, versions)
+            if self._usable(entry, versions):
+                return entry['ids']
+            return self._compute_ids(user_id, product_id, self.size)
+
+        try:
+            lock_key = f"{key}:lock"
+            if not self.cache.add(lock_key, 1, self.lock_timeout):
+                # Another process is computing it; wait for its result before doing the work ourselves
+                deadline = time.monotonic() + self.lock_timeout
+                while time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    if self.shared:
+                        entry = self.cache.get(key)
+                        if self._usable(entry, versions):
+                            self.lru.set(key, entry)
+                            return entry['ids']
+                    if self.cache.get(lock_key) is None:
+                        break
+            try:
+                ids = self._compute_ids(user_id, product_id, self.size)
+                self._store(key, user_id, product_id, ids, versions)
+                return ids
+            finally:
+                self.cache.delete(lock_key)
+        finally:
+            with self._flight_lock:
+                del self._flights[key]
+            event.set()
+
+    def _refresh_in_background(self, key: str, user_id: int, product_id: int, versions: Tuple[int, int]):
+        lock_key = f"{key}:lock"
+        if not self.cache.add(lock_key, 1, self.lock_timeout):
+            return  # already being refreshed
+
+        def refresh():
+            try:
+                self._store(key, user_id, product_id, self._compute_ids(user_id, product_id, self.size), versions)
+            except Exception as e:
+                print("[Recommendation] Background refresh failed:", e)
+            finally:
+                self.cache.delete(lock_key)
+                connection.close()
+
+        self._refresher.submit(refresh)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_recommendation_store() -> RecommendationStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = RecommendationStore()
+    return _store
+
+
+def get_cached_recommendations(user_id: int, product_id: int, top_n: int = 5) -> list:
+    return get_recommendation_store().get(user_id, product_id, top_n)
@@ -0,0 +1,240 @@
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+from django.conf import settings
+
+from recommendation.content_index import top_k
+
+MODEL_FILENAME = 'collaborative.npz'
+
+
+class CollaborativeModel:
+    """Biased matrix factorisation (Surprise's SVD) reduced to its factor matrices.
+
+    A rating estimate is `global_mean + bu[user] + bi[item] + qi[item] . pu[user]`,
+    clipped to the rating scale; users the model has not seen get
+    `global_mean + bi[item]`, as Surprise itself would predict. Scoring every item
+    for a batch of users is one matrix product, so requests never need Surprise
+    or pandas. Items a user rated or wishlisted at training time (`seen_*`, in
+    CSR layout over item rows) are never recommended back to them.
+    """
+
+    def __init__(self, user_ids, item_ids, pu, qi, bu, bi, global_mean: float,
+                 seen_indptr=None, seen_items=None, version: str = '', trained_at: float = 0.0, ratings: int = 0):
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.item_ids = np.asarray(item_ids, dtype=np.int64)
+        self.pu = np.asarray(pu, dtype=np.float32)
+        self.qi = np.asarray(qi, dtype=np.float32)
+        self.bu = np.asarray(bu, dtype=np.float32)
+        self.bi = np.asarray(bi, dtype=np.float32)
+        self.global_mean = float(global_mean)
+        self.seen_indptr = np.asarray(seen_indptr if seen_indptr is not None else np.zeros(len(self.user_ids) + 1), dtype=np.int64)
+        self.seen_items = np.asarray(seen_items if seen_items is not None else [], dtype=np.int64)
+        self.version = version
+        self.trained_at = trained_at
+        self.ratings = ratings
+        self._user_rows = {int(user_id): row for row, user_id in enumerate(self.user_ids)}
+        self._item_rows = {int(item_id): row for row, item_id in enumerate(self.item_ids)}
+
+    @classmethod
+    def from_surprise(cls, algo, trainset, **meta):
+        seen = [sorted(inner_iid for inner_iid, _ in trainset.ur[inner_uid]) for inner_uid in range(trainset.n_users)]
+        return cls(
+            user_ids=[trainset.to_raw_uid(inner) for inner in range(trainset.n_users)],
+            item_ids=[trainset.to_raw_iid(inner) for inner in range(trainset.n_items)],
+            pu=algo.pu, qi=algo.qi, bu=algo.bu, bi=algo.bi,
+            global_mean=trainset.global_mean,
+            seen_indptr=np.cumsum([0] + [len(items) for items in seen]),
+            seen_items=[item for items in seen for item in items],
+            **meta,
+        )
+
+    def scores(self, user_ids: Sequence[Optional[int]]) -> np.ndarray:
+        """Estimated ratings, one row per user and one column per item in `item_ids`"""
+        rows = np.array([self._user_rows.get(user_id, -1) for user_id in user_ids], dtype=np.int64)
+        known = rows >= 0
+        estimates = np.tile(self.global_mean + self.bi, (len(rows), 1))
+        if known.any():
+            estimates[known] += self.bu[rows[known], np.newaxis] + self.pu[rows[known]] @ self.qi.T
+        return np.clip(estimates, 1, 5)
+
+    def recommend_batch(self, user_ids: Sequence[Optional[int]], top_n: int = 5, exclude: Iterable[int] = (),
+                        seen: Optional[Dict[int, Iterable[int]]] = None) -> List[List[int]]:
+        """Ids of each user's `top_n` highest-estimated items, best first, skipping items they already interacted with.
+
+        `seen` adds items per user, e.g. their interactions since the model was trained.
+        """
+        scores = self.scores(user_ids)
+
+        excluded_rows = [self._item_rows[item_id] for item_id in exclude if item_id in self._item_rows]
+        scores[:, excluded_rows] = -np.inf
+        for position, user_id in enumerate(user_ids):
+            row = self._user_rows.get(user_id)
+            if row is not None:
+                scores[position, self.seen_items[self.seen_indptr[row]:self.seen_indptr[row + 1]]] = -np.inf
+            if seen and user_id in seen:
+                live_rows = [self._item_rows[item_id] for item_id in seen[user_id] if item_id in self._item_rows]
+                scores[position, live_rows] = -np.inf
+
+        columns, top_scores = top_k(scores, top_n)
+        return [
+            [int(self.item_ids[column]) for column, score in zip(row_columns, row_scores) if score > -np.inf]
+            for row_columns, row_scores in zip(columns, top_scores)
+        ]
+
+    def recommend(self, user_id: Optional[int], top_n: int = 5, exclude: Iterable[int] = (),
+                  seen: Optional[Iterable[int]] = None) -> List[int]:
+        return self.recommend_batch([user_id], top_n, exclude=exclude, seen={user_id: seen} if seen else None)[0]
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(str(path)) or '.', exist_ok=True)
+        with open(path, 'wb') as f:
+            np.savez(
+                f, user_ids=self.user_ids, item_ids=self.item_ids, pu=self.pu, qi=self.qi, bu=self.bu, bi=self.bi,
+                global_mean=self.global_mean, seen_indptr=self.seen_indptr, seen_items=self.seen_items,
+                version=self.version, trained_at=self.trained_at, ratings=self.ratings,
+            )
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as data:
+            # Models saved before seen items were stored recommend them back
+            seen = {name: data[name] for name in ('seen_indptr', 'seen_items') if name in data.files}
+            return cls(
+                data['user_ids'], data['item_ids'], data['pu'], data['qi'], data['bu'], data['bi'],
+                float(data['global_mean']), version=str(data['version']),
+                trained_at=float(data['trained_at']), ratings=int(data['ratings']), **seen,
+            )
+
+
+def training_ratings():
+    """(user_id, product_id, rating) rows: review ratings plus wishlist entries as implicit 5s"""
+    from core.models import ProductReview, wishlist_model
+
+    reviews = ProductReview.objects.exclude(rating=None).filter(user__isnull=False, product__isnull=False)
+    wishlist = wishlist_model.objects.filter(user__isnull=False, product__isnull=False)
+    rows = list(reviews.values_list('user_id', 'product_id', 'rating').iterator())
+    rows.extend((user_id, product_id, 5) for user_id, product_id in wishlist.values_list('user_id', 'product_id').iterator())
+    return rows
+
+
+def interacted_product_ids(user_ids: Iterable[int]) -> Dict[int, Set[int]]:
+    """Products each user has reviewed or wishlisted right now, in one query over both tables"""
+    from core.models import ProductReview, wishlist_model
+
+    user_ids = [user_id for user_id in user_ids if user_id is not None]
+    reviews = ProductReview.objects.filter(user_id__in=user_ids, product__isnull=False).values_list('user_id', 'product_id')
+    wishlist = wishlist_model.objects.filter(user_id__in=user_ids, product__isnull=False).values_list('user_id', 'product_id')
+    interactions: Dict[int, Set[int]] = {}
+    for user_id, product_id in reviews.union(wishlist):
+        interactions.setdefault(user_id, set()).add(product_id)
+    return interactions
+
+
+def train_collaborative_model(factors: int = 100, epochs: int = 20, seed: int = 0) -> Optional[CollaborativeModel]:
+    """Fit Surprise's SVD on every rating (slow; meant for `manage.py train_recommender`, never a request)"""
+    import pandas as pd
+    from surprise import SVD, Dataset, Reader
+
+    rows = training_ratings()
+    if not rows:
+        return None
+
+    data = pd.DataFrame(rows, columns=['user_id', 'product_id', 'rating'])
+    dataset = Dataset.load_from_df(data, Reader(rating_scale=(1, 5)))
+    trainset = dataset.build_full_trainset()
+    algo = SVD(n_factors=factors, n_epochs=epochs, random_state=seed)
+    algo.fit(trainset)
+
+    return CollaborativeModel.from_surprise(
+        algo, trainset, version=time.strftime('%Y%m%d%H%M%S'), trained_at=time.time(), ratings=len(rows),
+    )
+
+
+def publish_model(model: CollaborativeModel, directory: str, keep_versions: int = 3) -> str:
+    """Save `model` as a new version and make it the live MODEL_FILENAME; returns the live path.
+
+    The live file is swapped in with an atomic rename, which changes its mtime,
+    so every process picks the new model up on its next freshness check.
+    """
+    directory = str(directory)
+    versioned = os.path.join(directory, f"collaborative-{model.version}.npz")
+    model.save(versioned)
+
+    live = os.path.join(directory, MODEL_FILENAME)
+    shutil.copyfile(versioned, live + '.tmp')
+    os.replace(live + '.tmp', live)
+
+    versions = sorted(name for name in os.listdir(directory) if name.startswith('collaborative-') and name.endswith('.npz'))
+    for old in versions[:-keep_versions]:
+        os.remove(os.path.join(directory, old))
+    return live
+
+
+class ModelCache:
+    """Per-process copy of the published model, reloaded when the file's mtime changes"""
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self.model: Optional[CollaborativeModel] = None
+        self._mtime = None
+        self._checked_at = 0.0
+
+    def get(self) -> Optional[CollaborativeModel]:
+        interval = getattr(settings, 'RECOMMENDER_MODEL_REFRESH_SECONDS', 30)
+        if time.monotonic() - self._checked_at >= interval:
+            self.reload()
+        return self.model
+
+    def reload(self):
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                self.model, self._mtime = None, None
+                return
+            if mtime == self._mtime:
+                return
+            try:
+                self.model = CollaborativeModel.load(self.path)
+                self._mtime = mtime
+            except Exception as e:
+                # Keep serving the previous model
+                print("[Recommendation] Could not load collaborative model:", e)
+
+    def info(self) -> Dict[str, Any]:
+        model = self.model
+        if model is None:
+            return {'loaded': False}
+        return {
+            'loaded': True,
+            'version': model.version,
+            'trained_at': model.trained_at,
+            'users': len(model.user_ids),
+            'items': len(model.item_ids),
+            'ratings': model.ratings,
+        }
+
+
+_model_cache = None
+_model_cache_lock = threading.Lock()
+
+
+def get_model_cache() -> ModelCache:
+    global _model_cache
+    if _model_cache is None:
+        with _model_cache_lock:
+            if _model_cache is None:
+                _model_cache = ModelCache(os.path.join(str(settings.RECOMMENDER_MODEL_DIR), MODEL_FILENAME))
+    return _model_cache
+
+
+def get_collaborative_model() -> Optional[CollaborativeModel]:
+    """The latest published model, or None until `manage.py train_recommender` has run"""
+    return get_model_cache().get()
@@ -0,0 +1,339 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.html import strip_tags
+from scipy import sparse
+
+from recommendation.models import ProductNeighbor
+
+# Bumped whenever a process re-indexes products; `...:changed:<version>` holds their ids,
+# so other processes can bring their copy of the index up to date
+NEIGHBOR_VERSION_KEY = 'recommendation:product_neighbors:version'
+CHANGED_KEY = 'recommendation:product_neighbors:changed:{}'
+CHANGED_TIMEOUT = 24 * 60 * 60
+
+
+def product_text(title: Optional[str], description: Optional[str], category: Optional[str]) -> str:
+    """Text a product's TF-IDF vector is built from"""
+    return ' '.join(filter(None, [title, strip_tags(description or ''), category]))
+
+
+def text_fingerprint(title: Optional[str], description: Optional[str], category_id: Optional[int]) -> int:
+    """Cheap change check for the indexed fields, so saves that only touch stock or price are skipped"""
+    digest = hashlib.blake2b(f"{title}\x00{description}\x00{category_id}".encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little', signed=True)
+
+
+def record_neighbor_change(product_ids: Iterable[int]) -> int:
+    """Tell other processes which products were re-vectorised; returns the new version"""
+    try:
+        version = cache.incr(NEIGHBOR_VERSION_KEY)
+    except ValueError:
+        version = 1
+        cache.set(NEIGHBOR_VERSION_KEY, version, None)
+    cache.set(CHANGED_KEY.format(version), list(product_ids), CHANGED_TIMEOUT)
+    return version
+
+
+def _catalog_rows(product_ids: Optional[Iterable[int]] = None) -> List[Tuple]:
+    from core.models import Product
+
+    products = Product.objects.order_by('id')
+    if product_ids is not None:
+        products = products.filter(id__in=list(product_ids))
+    return list(products.values_list('id', 'title', 'description', 'category__title', 'category_id').iterator())
+
+
+def top_k(similarities: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Column indices and scores of the k largest values of each row, best first"""
+    k = min(k, similarities.shape[1])
+    if k <= 0:
+        empty = np.empty((similarities.shape[0], 0))
+        return empty.astype(np.int64), empty
+    top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    scores = np.take_along_axis(similarities, top, axis=1)
+    order = np.argsort(-scores, axis=1, kind='stable')
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+
+def _write_neighbors(neighbors: Dict[int, List[Tuple[int, float]]]):
+    """Replace the stored neighbour lists of the given products"""
+    with transaction.atomic():
+        ProductNeighbor.objects.filter(product_id__in=list(neighbors)).delete()
+        ProductNeighbor.objects.bulk_create([
+            ProductNeighbor(product_id=product_id, neighbor_id=neighbor_id, rank=rank, score=score)
+            for product_id, ranked in neighbors.items()
+            for rank, (neighbor_id, score) in enumerate(ranked)
+        ])
+
+
+def build_neighbor_index(directory: str, k: int = 20, chunk_size: int = 256, keep_versions: int = 2) -> Dict[str, Any]:
+    """Fit TF-IDF over the catalog, store every product's top-k neighbours and publish the index in `directory`.
+
+    Similarities are computed `chunk_size` products at a time (a sparse
+    chunk x N product), so memory stays O(chunk_size * N) instead of O(N^2).
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    rows = _catalog_rows()
+    if not rows:
+        raise ValueError("No products to index")
+
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    vectorizer = TfidfVectorizer(stop_words='english', dtype=np.float32)
+    matrix = vectorizer.fit_transform([product_text(*row[1:4]) for row in rows]).tocsr()
+    fingerprints = np.array([text_fingerprint(row[1], row[2], row[4]) for row in rows], dtype=np.int64)
+
+    transposed = matrix.T.tocsc()
+    stored = 0
+    for start in range(0, len(ids), chunk_size):
+        end = min(start + chunk_size, len(ids))
+        similarities = (matrix[start:end] @ transposed).toarray()
+        similarities[np.arange(end - start), np.arange(start, end)] = -1  # a product is not its own neighbour
+        columns, scores = top_k(similarities, k)
+
+        neighbors = {}
+        for offset, product_id in enumerate(ids[start:end]):
+            neighbors[int(product_id)] = [
+                (int(ids[column]), float(score)) for column, score in zip(columns[offset], scores[offset]) if score > 0
+            ]
+        _write_neighbors(neighbors)
+        stored += sum(len(ranked) for ranked in neighbors.values())
+
+    # Products deleted since the last build lose their rows through the foreign keys
+    version = time.strftime('%Y%m%d%H%M%S')
+    path = os.path.join(str(directory), version)
+    os.makedirs(path, exist_ok=True)
+    sparse.save_npz(os.path.join(path, 'tfidf.npz'), matrix)
+    np.save(os.path.join(path, 'ids.npy'), ids)
+    np.save(os.path.join(path, 'fingerprints.npy'), fingerprints)
+    with open(os.path.join(path, 'vectorizer.pkl'), 'wb') as f:
+        pickle.dump(vectorizer, f)
+    meta = {'version': version, 'count': len(ids), 'k': k, 'neighbors': stored, 'built_at': time.time()}
+    with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+    current = os.path.join(str(directory), 'CURRENT')
+    with open(current + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(current + '.tmp', current)
+
+    versions = sorted(name for name in os.listdir(str(directory)) if name.isdigit())
+    for old in versions[:-keep_versions]:
+        shutil.rmtree(os.path.join(str(directory), old), ignore_errors=True)
+
+    return meta
+
+
+class NeighborIndex:
+    """The published TF-IDF index, used to re-rank neighbours when products are saved.
+
+    Changed products are re-vectorised into an in-memory overlay (their rows in
+    the loaded matrix are masked out) until the next full build. Words the
+    vectoriser has not seen are ignored until then too.
+
+    The overlay is per process. The neighbour lists it produces are stored in
+    ProductNeighbor and shared, and the ids of re-indexed products go to a
+    cache change log (like the chatbot vector store's), which other processes
+    replay into their own overlay before they re-index anything. That needs a
+    shared cache backend; with a per-process cache, other workers compare
+    against the published vectors until the next `build_product_neighbors`.
+    """
+
+    def __init__(self, directory: str, k: int = 20):
+        self.directory = str(directory)
+        self.k = k
+        self._lock = threading.Lock()
+        self._loaded_version = None
+        self.vectorizer = None
+        self._matrix = None
+        self._ids: Optional[np.ndarray] = None
+        self._rows: Dict[int, int] = {}
+        self._masked: Optional[np.ndarray] = None
+        self._fingerprints: Dict[int, int] = {}
+        self._overlay: Dict[int, Any] = {}
+        self._version = None
+
+    @property
+    def available(self) -> bool:
+        return self._matrix is not None
+
+    def load(self):
+        """Load the newest published version (no-op if it is already loaded)"""
+        try:
+            with open(os.path.join(self.directory, 'CURRENT'), encoding='utf-8') as f:
+                version = f.read().strip() or None
+        except FileNotFoundError:
+            return
+        if version is None or version == self._loaded_version:
+            return
+
+        path = os.path.join(self.directory, version)
+        matrix = sparse.load_npz(os.path.join(path, 'tfidf.npz')).tocsr()
+        ids = np.load(os.path.join(path, 'ids.npy'))
+        fingerprints = np.load(os.path.join(path, 'fingerprints.npy'))
+        with open(os.path.join(path, 'vectorizer.pkl'), 'rb') as f:
+            vectorizer = pickle.load(f)
+
+        with self._lock:
+            self.vectorizer = vectorizer
+            self._matrix = matrix
+            self._ids = ids
+            self._rows = {int(product_id): row for row, product_id in enumerate(ids)}
+            self._masked = np.zeros(len(ids), dtype=bool)
+            self._fingerprints = {int(product_id): int(fp) for product_id, fp in zip(ids, fingerprints)}
+            self._overlay = {}
+            self._loaded_version = version
+            self._version = cache.get(NEIGHBOR_VERSION_KEY)
+
+    def _catch_up(self):
+        """Re-vectorise the products other processes re-indexed since this copy was loaded or synced"""
+        version = cache.get(NEIGHBOR_VERSION_KEY) or 0
+        seen = self._version or 0
+        if version <= seen:
+            return
+        changed = cache.get_many([CHANGED_KEY.format(v) for v in range(seen + 1, version + 1)])
+        product_ids = {product_id for ids in changed.values() for product_id in ids}
+        if product_ids:
+            self._overlay_rows([
+                (product_id, product_text(title, description, category), text_fingerprint(title, description, category_id))
+                for product_id, title, description, category, category_id in _catalog_rows(product_ids)
+            ])
+        self._version = version
+
+    def _overlay_rows(self, changed: List[Tuple[int, str, int]]):
+        """Put fresh vectors of (product id, text, fingerprint) into the overlay; call with `_lock` held"""
+        vectors = self.vectorizer.transform([text for _, text, _ in changed]).astype(np.float32)
+        for row, (product_id, _, fingerprint) in enumerate(changed):
+            if product_id in self._rows:
+                self._masked[self._rows[product_id]] = True
+            self._overlay[product_id] = vectors[row]
+            self._fingerprints[product_id] = fingerprint
+
+    def _similarities(self, vector) -> Tuple[np.ndarray, np.ndarray]:
+        """(product ids, cosine similarity to `vector`) over the matrix plus the overlay"""
+        scores = np.asarray((self._matrix @ vector.T).todense()).ravel()
+        scores[self._masked] = 0
+        ids = self._ids
+        if self._overlay:
+            overlay_ids = np.fromiter(self._overlay, dtype=np.int64, count=len(self._overlay))
+            overlay_scores = np.asarray((sparse.vstack(list(self._overlay.values())) @ vector.T).todense()).ravel()
+            ids = np.concatenate([ids, overlay_ids])
+            scores = np.concatenate([scores, overlay_scores])
+        return ids, scores
+
+    def reindex_products(self, product_ids: Iterable[int]) -> List[int]:
+        """Recompute the neighbours of changed products and patch them into the lists of similar products.
+
+        Only products whose indexed text changed are touched; returns the ids of
+        every product whose neighbour list was rewritten.
+        """
+        self.load()
+        if not self.available:
+            return []
+        with self._lock:
+            self._catch_up()
+
+        changed = []
+        for product_id, title, description, category, category_id in _catalog_rows(product_ids):
+            fingerprint = text_fingerprint(title, description, category_id)
+            if self._fingerprints.get(product_id) != fingerprint:
+                changed.append((product_id, product_text(title, description, category), fingerprint))
+        if not changed:
+            return []
+
+        with self._lock:
+            self._overlay_rows(changed)
+            version = record_neighbor_change([product_id for product_id, _, _ in changed])
+            if version == (self._version or 0) + 1:
+                self._version = version
+
+            updates = {}
+            for product_id, _, _ in changed:
+                ids, scores = self._similarities(self._overlay[product_id])
+                scores[ids == product_id] = -1
+                columns, best = top_k(scores[np.newaxis, :], self.k * 4)
+                ranked = [(int(ids[c]), float(s)) for c, s in zip(columns[0], best[0]) if s > 0]
+                updates[product_id] = (ranked[:self.k], dict(ranked))
+
+        return self._patch_lists(updates)
+
+    def _patch_lists(self, updates: Dict[int, Tuple[List[Tuple[int, float]], Dict[int, float]]]) -> List[int]:
+        """Store the changed products' lists and move them up/down/out of the lists that mention them"""
+        # Lists that may need patching: those already holding a changed product, and
+        # those of its closest candidates, which it may now enter
+        affected = set(ProductNeighbor.objects.filter(neighbor_id__in=list(updates)).values_list('product_id', flat=True))
+        for product_id, (_, candidates) in updates.items():
+            affected.update(candidates)
+        affected -= set(updates)
+
+        current: Dict[int, Dict[int, float]] = {product_id: {} for product_id in affected}
+        for product_id, neighbor_id, score in ProductNeighbor.objects.filter(product_id__in=affected).values_list(
+            'product_id', 'neighbor_id', 'score'
+        ):
+            current[product_id][neighbor_id] = score
+
+        # The loaded index may still hold products deleted since it was built
+        from core.models import Product
+        referenced = set(current) | {neighbor_id for _, candidates in updates.values() for neighbor_id in candidates}
+        existing = set(Product.objects.filter(id__in=referenced).values_list('id', flat=True)) | set(updates)
+
+        neighbors = {
+            product_id: [(neighbor_id, score) for neighbor_id, score in ranked if neighbor_id in existing]
+            for product_id, (ranked, _) in updates.items()
+        }
+        for product_id, entries in current.items():
+            if product_id not in existing:
+                continue
+            patched = dict(entries)
+            for changed_id, (_, candidates) in updates.items():
+                patched.pop(changed_id, None)
+                if candidates.get(product_id, 0) > 0:
+                    patched[changed_id] = candidates[product_id]
+            ranked = sorted(patched.items(), key=lambda item: -item[1])[:self.k]
+            if ranked != sorted(entries.items(), key=lambda item: -item[1])[:self.k]:
+                neighbors[product_id] = ranked
+        _write_neighbors(neighbors)
+        return list(neighbors)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_neighbor_index() -> NeighborIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = NeighborIndex(settings.RECOMMENDER_NEIGHBORS_DIR, k=getattr(settings, 'RECOMMENDER_NEIGHBORS_K', 20))
+    return _index
+
+
+def similar_products(product_id: int, top_n: int = 5) -> list:
+    """Most similar products, best first: one indexed read of ProductNeighbor joined to Product.
+
+    Until `manage.py build_product_neighbors` has run the table is empty, and
+    the newest products of the same category are returned instead.
+    """
+    rows = ProductNeighbor.objects.filter(product_id=product_id).select_related('neighbor').order_by('rank')[:top_n]
+    neighbors = [row.neighbor for row in rows]
+    if neighbors or ProductNeighbor.objects.exists():
+        return neighbors
+
+    from core.models import Product
+
+    category_id = Product.objects.filter(id=product_id).values_list('category_id', flat=True).first()
+    if category_id is None:
+        return []
+    return list(Product.objects.filter(category_id=category_id).exclude(id=product_id).order_by('-id')[:top_n])
@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recommendation.content_index import build_neighbor_index
+
+
+class Command(BaseCommand):
+    help = "Store every product's most similar products (TF-IDF cosine) for content-based recommendations"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', default=None, help='Defaults to RECOMMENDER_NEIGHBORS_DIR')
+        parser.add_argument('--k', type=int, default=None, help='Neighbours kept per product; defaults to RECOMMENDER_NEIGHBORS_K')
+        parser.add_argument('--chunk-size', type=int, default=256, help='Products compared against the catalog at a time')
+        parser.add_argument('--keep-versions', type=int, default=2, help='Older index builds to keep on disk')
+
+    def handle(self, *args, **options):
+        directory = options['output_dir'] or settings.RECOMMENDER_NEIGHBORS_DIR
+        k = options['k'] or getattr(settings, 'RECOMMENDER_NEIGHBORS_K', 20)
+
+        started = time.perf_counter()
+        try:
+            meta = build_neighbor_index(directory, k=k, chunk_size=options['chunk_size'], keep_versions=options['keep_versions'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {meta['neighbors']} neighbours for {meta['count']} products (k={k}) as version {meta['version']} "
+            f"in {time.perf_counter() - started:.1f}s"
+        ))
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recommendation.collaborative import get_collaborative_model
+from recommendation.precompute import Checkpoint, active_user_ids, precompute_recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        'Precompute every active user\'s recommendations with the published collaborative model and store them '
+        'in RecommendationCache, so home and product pages are served without scoring at request time'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Only users active in the last N days')
+        parser.add_argument('--top-n', type=int, default=10, help='Recommendations stored per user')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Users scored per batch')
+        parser.add_argument('--workers', type=int, default=1, help='Worker processes')
+        parser.add_argument('--checkpoint', default='recommendation-precompute.json', help='Progress file for --resume')
+        parser.add_argument('--resume', action='store_true', help='Skip users an interrupted run already finished')
+
+    def handle(self, *args, **options):
+        model = get_collaborative_model()
+        if model is None:
+            raise CommandError("No collaborative model published; run `manage.py train_recommender` first")
+
+        # A checkpoint only applies to a run with the same parameters and model
+        checkpoint = Checkpoint(options['checkpoint'], {
+            'days': options['days'], 'top_n': options['top_n'], 'model_version': model.version,
+        })
+        if options['resume'] and checkpoint.load():
+            self.stdout.write(f"Resuming: {len(checkpoint.done)} users already done")
+
+        user_ids = active_user_ids(options['days'])
+        self.stdout.write(
+            f"Precomputing {options['top_n']} recommendations for {len(user_ids)} users "
+            f"(model {model.version}, {options['workers']} workers)"
+        )
+        summary = precompute_recommendations(
+            user_ids, top_n=options['top_n'], chunk_size=options['chunk_size'], workers=options['workers'],
+            checkpoint=checkpoint, log=self.stdout.write,
+        )
+        checkpoint.clear()
+
+        stale = [version for version in summary['model_versions'] if version != model.version]
+        if stale:
+            self.stdout.write(self.style.WARNING(f"A new model was published during the run; some users used {', '.join(stale)}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored recommendations for {summary['users']} users ({summary['skipped']} skipped from the checkpoint) "
+            f"in {summary['chunks']} chunks, {summary['seconds']}s, {summary['users_per_second']} users/s"
+        ))
@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recommendation.collaborative import publish_model, train_collaborative_model
+
+
+class Command(BaseCommand):
+    help = (
+        'Fit the collaborative filtering model (Surprise SVD over review ratings and wishlists) and publish it '
+        'for the recommendation API, which reloads it without a restart'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', default=None, help='Defaults to RECOMMENDER_MODEL_DIR')
+        parser.add_argument('--factors', type=int, default=100)
+        parser.add_argument('--epochs', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keep-versions', type=int, default=3, help='Older models to keep on disk')
+        parser.add_argument('--loop', action='store_true', help='Keep retraining on a schedule')
+        parser.add_argument('--interval', type=float, default=6 * 60 * 60, help='Seconds between trainings with --loop')
+
+    def handle(self, *args, **options):
+        directory = options['output_dir'] or settings.RECOMMENDER_MODEL_DIR
+
+        while True:
+            started = time.perf_counter()
+            model = train_collaborative_model(factors=options['factors'], epochs=options['epochs'], seed=options['seed'])
+            if model is None:
+                self.stdout.write(self.style.WARNING("No ratings or wishlist entries to train on"))
+            else:
+                path = publish_model(model, directory, keep_versions=options['keep_versions'])
+                self.stdout.write(self.style.SUCCESS(
+                    f"Trained on {model.ratings} ratings ({len(model.user_ids)} users, {len(model.item_ids)} products) "
+                    f"in {time.perf_counter() - started:.1f}s; published version {model.version} to {path}"
+                ))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.2 on 2026-10-17 01:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendation', '0002_productneighbor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recommendationcache',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
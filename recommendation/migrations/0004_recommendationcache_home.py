@@ -0,0 +1,32 @@
+# Generated by Django 4.2.2 on 2026-10-17 01:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_cartorder_payment_method'),
+        ('recommendation', '0003_recommendationcache_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='recommendationcache',
+            unique_together=set(),
+        ),
+        migrations.AlterField(
+            model_name='recommendationcache',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.product'),
+        ),
+        migrations.AddConstraint(
+            model_name='recommendationcache',
+            constraint=models.UniqueConstraint(condition=models.Q(('product__isnull', False)), fields=('user', 'product'), name='recommendation_user_product_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='recommendationcache',
+            constraint=models.UniqueConstraint(condition=models.Q(('product__isnull', True)), fields=('user',), name='recommendation_user_home_unique'),
+        ),
+    ]
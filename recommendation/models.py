@@ -4,13 +4,42 @@ from core.models import Product
 
 class RecommendationCache(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    # None: the user's home page recommendations, precomputed by `manage.py precompute_recommendations`
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, null=True, blank=True)
     recommended_products = models.JSONField()  # Stores product IDs
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # when recommended_products was last computed
 
     class Meta:
-        unique_together = ('user', 'product')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'product'], condition=models.Q(product__isnull=False), name='recommendation_user_product_unique',
+            ),
+            models.UniqueConstraint(
+                fields=['user'], condition=models.Q(product__isnull=True), name='recommendation_user_home_unique',
+            ),
+        ]
         verbose_name_plural = "Recommendation Cache"
 
     def __str__(self):
-        return f"Recommendations for {self.user} - {self.product.title}"
+        return f"Recommendations for {self.user} - {self.product.title if self.product else 'home'}"
+
+
+class ProductNeighbor(models.Model):
+    """Precomputed content-based neighbours: the top-k most similar products of each product.
+
+    Built by `manage.py build_product_neighbors` and patched when a product is
+    saved; see recommendation/content_index.py.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='neighbors')
+    neighbor = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()  # 0 = most similar
+    score = models.FloatField()  # cosine similarity of the TF-IDF vectors
+
+    class Meta:
+        unique_together = ('product', 'rank')
+        ordering = ['product', 'rank']
+        verbose_name_plural = "Product Neighbors"
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.neighbor_id} ({self.score:.2f})"
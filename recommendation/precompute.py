@@ -0,0 +1,174 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+from recommendation.models import RecommendationCache
+
+
+def active_user_ids(days: Optional[int] = None) -> List[int]:
+    """Active users, or only those who logged in, reviewed, wishlisted or ordered in the last `days` days"""
+    from django.contrib.auth import get_user_model
+    from core.models import CartOrder, ProductReview, wishlist_model
+
+    users = get_user_model().objects.filter(is_active=True)
+    if days is None:
+        return sorted(users.values_list('id', flat=True))
+
+    since = timezone.now() - timedelta(days=days)
+    recent = set(users.filter(last_login__gte=since).values_list('id', flat=True))
+    recent.update(ProductReview.objects.filter(date__gte=since).values_list('user_id', flat=True))
+    recent.update(wishlist_model.objects.filter(date__gte=since).values_list('user_id', flat=True))
+    recent.update(CartOrder.objects.filter(order_date__gte=since).values_list('user_id', flat=True))
+    # Interactions of deactivated users don't count
+    return sorted(set(users.filter(id__in=recent).values_list('id', flat=True)))
+
+
+def precompute_chunk(user_ids: Sequence[int], top_n: int) -> Dict[str, Any]:
+    """Score `user_ids` in one batch and replace their home page rows in RecommendationCache"""
+    from core.models import Product
+    from recommendation.collaborative import get_collaborative_model, interacted_product_ids
+
+    started = time.perf_counter()
+    model = get_collaborative_model()
+    if model is None:
+        raise RuntimeError("No collaborative model published; run `manage.py train_recommender` first")
+
+    # Ask for a few spare ids in case some products were deleted since the model was trained
+    # Interactions since the model was trained are skipped as well
+    ranked = model.recommend_batch(list(user_ids), top_n + 10, seen=interacted_product_ids(user_ids))
+    existing = set(Product.objects.filter(id__in={pid for ids in ranked for pid in ids}).values_list('id', flat=True))
+    rows = [
+        RecommendationCache(user_id=user_id, product=None, recommended_products=[pid for pid in ids if pid in existing][:top_n])
+        for user_id, ids in zip(user_ids, ranked)
+    ]
+    with transaction.atomic():
+        RecommendationCache.objects.filter(user_id__in=list(user_ids), product__isnull=True).delete()
+        RecommendationCache.objects.bulk_create(rows)
+
+    return {
+        'first': user_ids[0], 'last': user_ids[-1], 'users': len(user_ids), 'user_ids': list(user_ids),
+        'model_version': model.version, 'seconds': time.perf_counter() - started,
+    }
+
+
+def _init_worker():
+    import django
+
+    django.setup()
+    # Connections inherited from the parent on fork must not be shared
+    connections.close_all()
+
+
+class Checkpoint:
+    """Users a precompute run has finished, appended after every chunk so an interrupted run can resume.
+
+    The file holds the run's parameters on its first line, then one JSON line
+    per finished chunk with its user ids. The ids themselves are recorded,
+    not id ranges, so users who became active inside a finished range since
+    are still scored when the run resumes.
+    """
+
+    def __init__(self, path: Optional[str], params: Dict[str, Any]):
+        self.path = path
+        self.params = params
+        self.done: Set[int] = set()
+        self._resumed = False
+        self._started = False
+
+    def load(self) -> bool:
+        """Pick up the users of an earlier run with the same parameters; False if there is none"""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        with open(self.path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        try:
+            header = json.loads(lines[0]) if lines else {}
+        except ValueError:
+            return False
+        if header.get('params') != self.params:
+            return False
+
+        for line in lines[1:]:
+            try:
+                self.done.update(json.loads(line)['done'])
+            except (ValueError, KeyError):
+                pass  # a crash mid-write can leave a truncated line; its chunk is simply redone
+        self._resumed = True
+        return True
+
+    def remaining(self, user_ids: Iterable[int]) -> List[int]:
+        """Sorted `user_ids` not finished yet"""
+        return sorted(user_id for user_id in user_ids if user_id not in self.done)
+
+    def add(self, user_ids: Sequence[int]):
+        self.done.update(user_ids)
+        if not self.path:
+            return
+        if not self._started:
+            self._started = True
+            if not self._resumed:
+                with open(self.path, 'w', encoding='utf-8') as f:
+                    f.write(json.dumps({'params': self.params}) + '\n')
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'done': list(user_ids), 'at': time.time()}) + '\n')
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def precompute_recommendations(user_ids: Sequence[int], top_n: int = 10, chunk_size: int = 500, workers: int = 1,
+                               checkpoint: Optional[Checkpoint] = None,
+                               log: Callable[[str], None] = print) -> Dict[str, Any]:
+    """Precompute the home page recommendations of `user_ids`, `chunk_size` users per batch over `workers` processes"""
+    checkpoint = checkpoint or Checkpoint(None, {})
+    pending = checkpoint.remaining(user_ids)
+    chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+    skipped = len(user_ids) - len(pending)
+
+    started = time.perf_counter()
+    done_users = 0
+    versions = set()
+
+    def finished(result):
+        nonlocal done_users
+        done_users += result['users']
+        versions.add(result['model_version'])
+        checkpoint.add(result['user_ids'])
+        elapsed = time.perf_counter() - started
+        log(
+            f"  users {result['first']}-{result['last']}: {result['users']} in {result['seconds']:.2f}s "
+            f"({done_users}/{len(pending)}, {done_users / elapsed:.0f} users/s)"
+        )
+
+    if workers <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            finished(precompute_chunk(chunk, top_n))
+    else:
+        # Workers open their own connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = [pool.submit(precompute_chunk, chunk, top_n) for chunk in chunks]
+            try:
+                for future in as_completed(futures):
+                    finished(future.result())
+            except BaseException:
+                # Finished chunks are checkpointed; don't start the rest
+                pool.shutdown(cancel_futures=True)
+                raise
+
+    elapsed = time.perf_counter() - started
+    return {
+        'users': done_users,
+        'skipped': skipped,
+        'chunks': len(chunks),
+        'seconds': round(elapsed, 2),
+        'users_per_second': round(done_users / elapsed, 1) if elapsed else 0.0,
+        'model_versions': sorted(versions),
+    }
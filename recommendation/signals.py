@@ -0,0 +1,36 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Product, ProductReview, wishlist_model
+from recommendation.cache import get_recommendation_store
+from recommendation.content_index import get_neighbor_index
+
+
+def _reindex(product_id):
+    try:
+        rewritten = get_neighbor_index().reindex_products([product_id])
+    except Exception as e:
+        print("[Recommendation] Could not re-index product neighbours:", e)
+        rewritten = []
+    # Cached recommendations for these products were built from their old neighbour lists
+    # (the saved product is among them only if its indexed text really changed)
+    if rewritten:
+        get_recommendation_store().invalidate_products(rewritten)
+
+
+@receiver(post_save, sender=Product)
+def reindex_product_neighbors(sender, instance, update_fields=None, **kwargs):
+    # Stock/price-only saves (e.g. checkout) can't change the neighbours; deletes cascade to ProductNeighbor
+    if instance.changed_fields('title', 'description', 'category_id', update_fields=update_fields):
+        transaction.on_commit(lambda: _reindex(instance.id))
+
+
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+@receiver(post_save, sender=wishlist_model)
+@receiver(post_delete, sender=wishlist_model)
+def invalidate_user_recommendations(sender, instance, **kwargs):
+    if instance.user_id is not None:
+        user_id = instance.user_id
+        transaction.on_commit(lambda: get_recommendation_store().invalidate_user(user_id))
@@ -0,0 +1,293 @@
+import os
+import tempfile
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.models import Product
+from recommendation.cache import RecommendationStore
+from recommendation.collaborative import CollaborativeModel
+from recommendation.content_index import NeighborIndex, build_neighbor_index
+from recommendation.models import ProductNeighbor, RecommendationCache
+from recommendation.precompute import Checkpoint, precompute_recommendations
+
+
+class CollaborativeModelTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        import pandas as pd
+        from surprise import SVD, Dataset, Reader
+
+        rng = np.random.default_rng(0)
+        ratings = pd.DataFrame({
+            'user_id': rng.integers(1, 40, 600),
+            'product_id': rng.integers(100, 160, 600),
+            'rating': rng.integers(1, 6, 600),
+        }).drop_duplicates(['user_id', 'product_id'])
+        cls.trainset = Dataset.load_from_df(ratings, Reader(rating_scale=(1, 5))).build_full_trainset()
+        cls.algo = SVD(n_factors=20, n_epochs=10, random_state=0)
+        cls.algo.fit(cls.trainset)
+        cls.model = CollaborativeModel.from_surprise(cls.algo, cls.trainset)
+
+    def test_scores_match_surprise_predictions(self):
+        users = [int(user_id) for user_id in self.model.user_ids[:10]] + [None, 999]
+        scores = self.model.scores(users)
+        expected = np.array([
+            [self.algo.predict(user_id, int(item_id)).est for item_id in self.model.item_ids]
+            for user_id in users
+        ])
+        np.testing.assert_allclose(scores, expected, atol=1e-5)
+
+    def test_rated_items_are_not_recommended_back(self):
+        user_id = int(self.model.user_ids[0])
+        rated = {self.trainset.to_raw_iid(inner) for inner, _ in self.trainset.ur[self.trainset.to_inner_uid(user_id)]}
+        recommended = self.model.recommend(user_id, top_n=len(self.model.item_ids))
+        self.assertEqual(len(recommended), len(self.model.item_ids) - len(rated))
+        self.assertFalse(rated & set(recommended))
+
+        live = recommended[:2]
+        self.assertFalse(set(live) & set(self.model.recommend(user_id, top_n=5, seen=live)))
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'model.npz')
+            self.model.save(path)
+            loaded = CollaborativeModel.load(path)
+        users = [int(self.model.user_ids[0]), None]
+        np.testing.assert_array_equal(loaded.scores(users), self.model.scores(users))
+        self.assertEqual(loaded.recommend(users[0]), self.model.recommend(users[0]))
+
+
+class CheckpointTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'checkpoint.jsonl')
+
+    def fake_chunk(self, user_ids, top_n):
+        return {'users': len(user_ids), 'first': user_ids[0], 'last': user_ids[-1], 'seconds': 0.0,
+                'model_version': 'v1', 'user_ids': list(user_ids)}
+
+    def test_remaining_skips_finished_users(self):
+        checkpoint = Checkpoint(None, {})
+        checkpoint.add([5, 1, 3])
+        self.assertEqual(checkpoint.remaining([6, 5, 4, 3, 2, 1]), [2, 4, 6])
+
+    def test_resume_only_with_the_same_parameters(self):
+        Checkpoint(self.path, {'top_n': 10}).add([1, 2])
+        Checkpoint(self.path, {'top_n': 10}).add([3])  # a fresh run starts the file over
+
+        resumed = Checkpoint(self.path, {'top_n': 10})
+        self.assertTrue(resumed.load())
+        self.assertEqual(resumed.done, {3})
+        resumed.add([4])
+
+        again = Checkpoint(self.path, {'top_n': 10})
+        self.assertTrue(again.load())
+        self.assertEqual(again.done, {3, 4})
+        self.assertFalse(Checkpoint(self.path, {'top_n': 20}).load())
+
+    def test_truncated_line_is_redone(self):
+        checkpoint = Checkpoint(self.path, {})
+        checkpoint.add([1, 2])
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write('{"done": [3, ')
+        resumed = Checkpoint(self.path, {})
+        self.assertTrue(resumed.load())
+        self.assertEqual(resumed.remaining([1, 2, 3]), [3])
+
+    def test_interrupted_run_resumes_new_users_inside_finished_ranges(self):
+        with mock.patch('recommendation.precompute.precompute_chunk', side_effect=self.fake_chunk) as chunk:
+            precompute_recommendations([10, 20, 30], chunk_size=2, checkpoint=Checkpoint(self.path, {}), log=lambda _: None)
+
+            checkpoint = Checkpoint(self.path, {})
+            checkpoint.load()
+            stats = precompute_recommendations([10, 15, 20, 30, 40], chunk_size=2, checkpoint=checkpoint,
+                                               log=lambda _: None)
+
+        self.assertEqual(stats['skipped'], 3)
+        self.assertEqual(chunk.call_args_list[-1].args[0], [15, 40])
+
+
+class RecommendationStoreTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email='shopper@example.com', username='shopper', password='x')
+        cls.product = Product.objects.create(title='Kettle', base_price=10, max_price=20)
+        cls.other = Product.objects.create(title='Toaster', base_price=10, max_price=20)
+
+    def setUp(self):
+        # A file cache is shared by every worker process on the host, like Redis
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        caches = override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'recommendations': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory.name},
+        })
+        caches.enable()
+        self.addCleanup(caches.disable)
+
+        self.store = self.make_store()
+        self.computed = []
+
+        def compute(user_id, product_id, top_n):
+            self.computed.append((user_id, product_id))
+            return [len(self.computed)]
+
+        patcher = mock.patch.object(RecommendationStore, '_compute_ids', side_effect=compute)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_store(self, alias='recommendations'):
+        return RecommendationStore(alias=alias, timeout=60, stale_timeout=60, lru_size=100, size=5)
+
+    def get(self, product=None):
+        return self.store.get_ids(self.user.id, (product or self.product).id)
+
+    def test_entries_are_reused_across_layers(self):
+        self.assertEqual(self.get(), [1])
+        self.assertEqual(self.get(), [1])
+        self.store.lru.clear()
+        self.assertEqual(self.get(), [1])
+        self.store.cache.clear()
+        self.store.lru.clear()
+        # Only the table is left; its row is served under freshly created versions
+        self.assertEqual(self.get(), [1])
+        self.assertEqual(len(self.computed), 1)
+        self.assertEqual(self.store.stats['lru'], 1)
+        self.assertEqual(self.store.stats['cache'], 1)
+        self.assertEqual(self.store.stats['table'], 1)
+
+    def test_invalidate_user(self):
+        self.get()
+        self.get(self.other)
+        self.store.invalidate_user(self.user.id)
+        self.assertFalse(RecommendationCache.objects.filter(user=self.user).exists())
+        self.assertEqual(self.get(), [3])
+        self.assertEqual(self.get(self.other), [4])
+
+    def test_invalidate_products_only_touches_those_products(self):
+        self.get()
+        self.get(self.other)
+        self.store.invalidate_products([self.other.id])
+        self.assertEqual(self.get(), [1])
+        self.assertEqual(self.get(self.other), [3])
+
+    def test_home_row_is_recomputed_not_deleted(self):
+        RecommendationCache.objects.create(user=self.user, product=None, recommended_products=[self.other.id])
+        with mock.patch.object(self.store._refresher, 'submit') as submit:
+            self.store.invalidate_user(self.user.id)
+        submit.assert_called_once_with(self.store._recompute_home, self.user.id, 10)
+        self.assertTrue(RecommendationCache.objects.filter(user=self.user, product=None).exists())
+
+    def test_invalidation_in_another_worker(self):
+        self.get()
+        self.make_store().invalidate_user(self.user.id)
+        self.assertEqual(self.get(), [2])
+
+    def test_process_local_cache_reads_the_table(self):
+        self.store = self.make_store(alias='default')
+        self.assertFalse(self.store.shared)
+        self.assertEqual(self.get(), [1])
+        self.assertEqual(self.get(), [1])
+        self.assertEqual(self.store.stats['table'], 1)
+
+        # Another worker's invalidation only reaches this one through the table
+        RecommendationCache.objects.filter(user=self.user).delete()
+        self.assertEqual(self.get(), [2])
+
+
+def make_product(title, description=''):
+    return Product.objects.create(title=title, description=description, base_price=10, max_price=20)
+
+
+class NeighborIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.kettle = make_product('Steel Kettle', 'Electric kettle for tea')
+        self.toaster = make_product('Steel Toaster', 'Two slice toaster')
+        self.wallet = make_product('Leather Wallet', 'Brown leather card wallet')
+        self.belt = make_product('Leather Belt', 'Brown leather belt')
+
+    def lists(self):
+        neighbors = {}
+        for product_id, neighbor_id, score in ProductNeighbor.objects.values_list('product_id', 'neighbor_id', 'score'):
+            neighbors.setdefault(product_id, []).append((neighbor_id, round(score, 2)))
+        return neighbors
+
+    def store(self, neighbors):
+        ProductNeighbor.objects.bulk_create([
+            ProductNeighbor(product_id=product.id, neighbor_id=neighbor.id, rank=rank, score=score)
+            for product, ranked in neighbors for rank, (neighbor, score) in enumerate(ranked)
+        ])
+
+    def test_patch_lists_moves_a_changed_product(self):
+        kettle, toaster, wallet, belt = self.kettle, self.toaster, self.wallet, self.belt
+        extra = make_product('Desk Lamp')
+        self.store([
+            (kettle, [(toaster, 0.8), (wallet, 0.5)]),
+            (toaster, [(kettle, 0.8), (belt, 0.3)]),
+            (wallet, [(kettle, 0.5)]),
+            (belt, [(toaster, 0.3)]),
+            (extra, [(kettle, 0.8), (wallet, 0.7)]),
+        ])
+
+        # The belt is now close to the kettle and the wallet, and no longer to the toaster
+        candidates = {kettle.id: 0.9, wallet.id: 0.4, extra.id: 0.1}
+        rewritten = NeighborIndex(self.directory, k=2)._patch_lists(
+            {belt.id: ([(kettle.id, 0.9), (wallet.id, 0.4)], candidates)}
+        )
+
+        self.assertEqual(set(rewritten), {belt.id, kettle.id, toaster.id, wallet.id})
+        self.assertEqual(self.lists(), {
+            belt.id: [(kettle.id, 0.9), (wallet.id, 0.4)],
+            kettle.id: [(belt.id, 0.9), (toaster.id, 0.8)],  # moved in; the wallet drops out at k=2
+            toaster.id: [(kettle.id, 0.8)],  # moved out
+            wallet.id: [(kettle.id, 0.5), (belt.id, 0.4)],
+            extra.id: [(kettle.id, 0.8), (wallet.id, 0.7)],  # too weak to enter, left alone
+        })
+
+    def test_patch_lists_skips_deleted_products(self):
+        gone = make_product('Old Kettle')
+        gone_id = gone.id
+        Product.objects.filter(id=gone_id).delete()
+
+        NeighborIndex(self.directory, k=2)._patch_lists(
+            {self.toaster.id: ([(gone_id, 0.9), (self.kettle.id, 0.6)], {gone_id: 0.9, self.kettle.id: 0.6})}
+        )
+        self.assertEqual(self.lists(), {
+            self.toaster.id: [(self.kettle.id, 0.6)],
+            self.kettle.id: [(self.toaster.id, 0.6)],
+        })
+
+    def test_reindex_products_after_an_edit(self):
+        build_neighbor_index(self.directory, k=2)
+        self.assertEqual([n for n, _ in self.lists()[self.kettle.id]], [self.toaster.id])
+        index = NeighborIndex(self.directory, k=2)
+        other = NeighborIndex(self.directory, k=2)
+        other.load()
+
+        # Saves that leave the indexed text alone change nothing
+        self.assertEqual(index.reindex_products([self.toaster.id]), [])
+
+        self.toaster.title = 'Leather Card Holder'
+        self.toaster.description = 'Brown leather card case'
+        self.toaster.save()
+        rewritten = index.reindex_products([self.toaster.id])
+
+        neighbors = self.lists()
+        self.assertIn(self.toaster.id, rewritten)
+        self.assertEqual(neighbors[self.toaster.id][0][0], self.wallet.id)
+        self.assertIn(self.toaster.id, [n for n, _ in neighbors[self.wallet.id]])
+        self.assertNotIn(self.kettle.id, neighbors)
+
+        # Another process replays the change before re-indexing anything itself
+        self.assertEqual(other.reindex_products([]), [])
+        self.assertIn(self.toaster.id, other._overlay)
@@ -81,83 +81,48 @@
 #     return final_recommendations
 
 
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import linear_kernel
-from surprise import Dataset, Reader, SVD
-from surprise.model_selection import train_test_split
-from core.models import Product, ProductReview, wishlist_model
+from core.models import Product
+from recommendation.collaborative import get_collaborative_model, interacted_product_ids
+from recommendation.content_index import similar_products
+from recommendation.models import RecommendationCache
 from django.db.models import Q
 
 # ----------------- Content-Based Recommendation -----------------
+# Neighbours are precomputed by `manage.py build_product_neighbors` (see recommendation/content_index.py)
 def get_content_based_recommendations(product_id, top_n=5):
-    products = Product.objects.all()
-    df = pd.DataFrame(list(products.values('id', 'title', 'description', 'category__title')))
-    df['description'] = df['description'].fillna('')
-    df['category__title'] = df['category__title'].fillna('')
-    
-    # Combine features for better similarity
-    df['combined'] = df['title'] + " " + df['description'] + " " + df['category__title']
-    
-    tfidf = TfidfVectorizer(stop_words='english')
-    tfidf_matrix = tfidf.fit_transform(df['combined'])
-    
-    cosine_sim = linear_kernel(tfidf_matrix, tfidf_matrix)
-    idx = df.index[df['id'] == product_id][0]
-    sim_scores = list(enumerate(cosine_sim[idx]))
-    sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-    
-    similar_product_ids = [df['id'][i[0]] for i in sim_scores[1:top_n+1]]
-    return list(Product.objects.filter(id__in=similar_product_ids))
+    return similar_products(product_id, top_n)
 
 # ----------------- Collaborative Filtering with Wishlist -----------------
-def train_collaborative_model():
-    reviews = ProductReview.objects.exclude(rating=None)
-    wishlist = wishlist_model.objects.all()
-
-    # Combine reviews and wishlist into a single dataset
-    review_data = pd.DataFrame(list(reviews.values('user_id', 'product_id', 'rating')))
-    wishlist_data = pd.DataFrame(list(wishlist.values('user_id', 'product_id')))
-    
-    if not review_data.empty:
-        combined_data = review_data
-    else:
-        combined_data = pd.DataFrame(columns=['user_id', 'product_id', 'rating'])
-
-    if not wishlist_data.empty:
-        wishlist_data['rating'] = 5  # Implicit positive feedback
-        combined_data = pd.concat([combined_data, wishlist_data], ignore_index=True)
-
-    if combined_data.empty:
-        return None
-
-    reader = Reader(rating_scale=(1, 5))
-    dataset = Dataset.load_from_df(combined_data[['user_id', 'product_id', 'rating']], reader)
-    
-    trainset, _ = train_test_split(dataset, test_size=0.2)
-    algo = SVD()
-    algo.fit(trainset)
-    
-    return algo
-
-def get_collaborative_recommendations(user_id, algo, top_n=5):
-    products = Product.objects.all()
-    predictions = [
-        (product.id, algo.predict(user_id, product.id).est)
-        for product in products
-    ]
-    
-    predictions.sort(key=lambda x: x[1], reverse=True)
-    recommended_ids = [pid for pid, _ in predictions[:top_n]]
-    return list(Product.objects.filter(id__in=recommended_ids))
+# The model is fitted offline by `manage.py train_recommender` (see recommendation/collaborative.py)
+def products_in_order(product_ids):
+    products = Product.objects.in_bulk(product_ids)
+    return [products[pid] for pid in product_ids if pid in products]
+
+def get_collaborative_recommendations(user_id, model, top_n=5, exclude=()):
+    # The model only knows interactions up to its training run; skip newer ones too
+    seen = interacted_product_ids([user_id]).get(user_id) if user_id is not None else None
+    return products_in_order(model.recommend(user_id, top_n, exclude=exclude, seen=seen))
+
+# ----------------- Precomputed Recommendations -----------------
+# Per-user rows with product=None, written by `manage.py precompute_recommendations` (see recommendation/precompute.py)
+def get_precomputed_recommendation_ids(user_id):
+    """The user's precomputed product ids, best first, or None if they have none yet"""
+    return RecommendationCache.objects.filter(user_id=user_id, product__isnull=True).values_list(
+        'recommended_products', flat=True
+    ).first()
 
 # ----------------- Hybrid Recommendation -----------------
 def get_hybrid_recommendations(user_id, product_id, top_n=5):
-    algo = train_collaborative_model()
-    
     content_recs = get_content_based_recommendations(product_id, top_n)
-    collab_recs = get_collaborative_recommendations(user_id, algo, top_n) if algo else []
-    
+
+    # Precomputed rows spare the model scoring; users without one are scored now
+    precomputed = get_precomputed_recommendation_ids(user_id)
+    if precomputed is not None:
+        collab_recs = products_in_order([pid for pid in precomputed if pid != product_id][:top_n])
+    else:
+        model = get_collaborative_model()
+        collab_recs = get_collaborative_recommendations(user_id, model, top_n, exclude=[product_id]) if model else []
+
     # Merge results without duplicates
     combined = {p.id: p for p in (content_recs + collab_recs)}
     
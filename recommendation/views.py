@@ -2,7 +2,8 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from core.models import Product
-from .utils import get_hybrid_recommendations
+from .cache import get_cached_recommendations
+from .utils import get_precomputed_recommendation_ids, products_in_order
 from .models import RecommendationCache
 from django.shortcuts import get_object_or_404
 from rest_framework.renderers import JSONRenderer
@@ -79,7 +80,7 @@ class HybridRecommendationAPIView(APIView):
         user = request.user
         logger.info("🔍 Running Hybrid Recommendation API for User %s, Product %s", user.id, product_id)
 
-        recommended_products = get_hybrid_recommendations(user.id, product_id)
+        recommended_products = get_cached_recommendations(user.id, product_id)
 
         logger.info("✅ View received recommendations: %s", [p.id for p in recommended_products])
 
@@ -99,10 +100,11 @@ class HomeRecommendationAPIView(APIView):
     renderer_classes = [JSONRenderer]
     def get(self, request):
         user = request.user if request.user.is_authenticated else None
-        # For demo: recommend top 8 products, or use a utility for general recommendations
-        if user:
-            # If you want to use hybrid logic for user, you can call get_hybrid_recommendations(user.id, None)
-            products = Product.objects.all().order_by('-id')[:8]
+        # Signed-in users get their precomputed recommendations (`manage.py precompute_recommendations`);
+        # everyone else, and users without a row yet, the newest products
+        recommended_ids = get_precomputed_recommendation_ids(user.id) if user else None
+        if recommended_ids:
+            products = products_in_order(recommended_ids[:8])
         else:
             products = Product.objects.all().order_by('-id')[:8]
         data = [